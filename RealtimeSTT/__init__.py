@@ -1,3 +1,25 @@
-from .audio_recorder import AudioToTextRecorder
-from .audio_recorder_client import AudioToTextRecorderClient
-from .audio_input import AudioInput
\ No newline at end of file
+# The classes are imported on first access, so e.g. a client only
+# application does not load the transcription backends.
+_LAZY_IMPORTS = {
+    "AudioToTextRecorder": ".audio_recorder",
+    "TranscriptionEngine": ".audio_recorder",
+    "ModelPool": ".model_pool",
+    "AudioToTextRecorderClient": ".audio_recorder_client",
+    "AudioInput": ".audio_input",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,226 @@
+"""
+Audio buffer helpers used by the recorder hot paths.
+
+AudioArena keeps the samples of the utterance that is currently being
+recorded as one contiguous float32 array. Every incoming int16 chunk is
+converted exactly once when it is appended, so readers (the realtime
+transcription worker, early transcription and wait_audio) can take a
+zero-copy view of the whole utterance instead of joining and converting
+all recorded frames again on every access.
+
+AudioChunker cuts an incoming byte stream into frames of exactly the size
+the VAD expects without re-slicing a growing bytearray for every frame.
+"""
+
+import threading
+import numpy as np
+
+INT16_MAX_ABS_VALUE = 32768.0
+
+# Initial capacity in seconds of 16 kHz audio. The arena doubles its
+# capacity whenever an append would overflow it.
+INIT_ARENA_SECONDS = 30
+SAMPLE_RATE = 16000
+
+# Ring capacity of AudioChunker in frames
+INIT_CHUNKER_FRAMES = 4
+
+
+class AudioArena:
+    """
+    A growable float32 arena holding the samples of one recording.
+
+    Views returned by view() stay valid after later appends: appends only
+    ever write behind the end of previously handed out views, and growing
+    or clearing the arena swaps in a new backing array instead of reusing
+    the old one.
+    """
+    def __init__(self, initial_capacity: int = INIT_ARENA_SECONDS * SAMPLE_RATE):
+        self._initial_capacity = max(1, int(initial_capacity))
+        self._lock = threading.Lock()
+        self._data = np.empty(self._initial_capacity, dtype=np.float32)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def _reserve(self, num_samples):
+        """Makes room for num_samples behind the current end."""
+        if self._end + num_samples <= len(self._data):
+            return
+        used = self._end - self._start
+        new_capacity = len(self._data)
+        while used + num_samples > new_capacity:
+            new_capacity *= 2
+        new_data = np.empty(new_capacity, dtype=np.float32)
+        new_data[:used] = self._data[self._start:self._end]
+        self._data = new_data
+        self._start = 0
+        self._end = used
+
+    def append(self, chunk):
+        """
+        Appends one chunk of raw 16-bit PCM audio (bytes, bytearray,
+        memoryview or int16 array), converting only the new samples to
+        float32 in the [-1, 1] range. Float arrays are taken as already
+        normalized samples and are copied as they are.
+        """
+        if isinstance(chunk, np.ndarray):
+            pcm = chunk.reshape(-1)
+            if pcm.dtype.kind != 'f':
+                pcm = pcm.astype(np.int16, copy=False)
+        else:
+            pcm = np.frombuffer(chunk, dtype=np.int16)
+        num_samples = len(pcm)
+        if not num_samples:
+            return
+        with self._lock:
+            self._reserve(num_samples)
+            target = self._data[self._end:self._end + num_samples]
+            if pcm.dtype.kind == 'f':
+                target[:] = pcm
+            else:
+                np.multiply(pcm, 1.0 / INT16_MAX_ABS_VALUE, out=target, casting='unsafe')
+            self._end += num_samples
+
+    def extend(self, chunks):
+        """Appends several raw 16-bit PCM chunks in order."""
+        for chunk in chunks:
+            self.append(chunk)
+
+    def drop_front(self, num_samples):
+        """
+        Discards up to num_samples from the start of the recording
+        (e.g. to cut out a detected wake word). Returns the number of
+        samples actually discarded.
+        """
+        with self._lock:
+            num_samples = max(0, min(int(num_samples), self._end - self._start))
+            self._start += num_samples
+            return num_samples
+
+    def view(self, start: int = 0):
+        """
+        Returns a zero-copy view of the recorded samples, optionally
+        starting at sample offset start. Callers must not modify it.
+        """
+        with self._lock:
+            begin = min(self._start + max(0, int(start)), self._end)
+            return self._data[begin:self._end]
+
+    def clear(self):
+        """
+        Starts a new, empty recording. Views handed out earlier keep
+        referencing the previous backing array and remain unchanged.
+        """
+        with self._lock:
+            self._data = np.empty(self._initial_capacity, dtype=np.float32)
+            self._start = 0
+            self._end = 0
+
+    def detach(self):
+        """
+        Returns a view of the recorded samples and clears the arena,
+        handing the ownership of the recorded audio to the caller.
+        """
+        with self._lock:
+            audio = self._data[self._start:self._end]
+            self._data = np.empty(self._initial_capacity, dtype=np.float32)
+            self._start = 0
+            self._end = 0
+        return audio
+
+
+class AudioChunker:
+    """
+    Cuts a byte stream into frames of exactly frame_bytes bytes.
+
+    Bytes that do not yet fill a frame wait in a fixed-capacity ring with
+    read and write cursors. Whenever the ring is empty, whole frames are
+    handed out as views of the fed data itself, so large chunks are never
+    copied, and frames taken from the ring are views of it unless they
+    wrap around its end. Frames are only valid until the next call of
+    feed(), callers that keep them have to copy them (bytes(frame)).
+    """
+    def __init__(self, frame_bytes: int, capacity: int = None):
+        self.frame_bytes = int(frame_bytes)
+        # Two frames at least, so the rest of the fed data never overwrites
+        # the frame completed from the ring in the same call
+        self.capacity = max(int(capacity or INIT_CHUNKER_FRAMES * self.frame_bytes), 2 * self.frame_bytes)
+        self._ring = bytearray(self.capacity)
+        self._ring_view = memoryview(self._ring)
+        self._wrapped = bytearray(self.frame_bytes)
+        self._read = 0
+        self._write = 0
+
+    def __len__(self):
+        """Number of buffered bytes that do not form a frame yet."""
+        return self._write - self._read
+
+    def _put(self, data, count):
+        start = self._write % self.capacity
+        self._write += count
+        if start + count <= self.capacity:
+            self._ring_view[start:start + count] = data[:count]
+            return
+        first = self.capacity - start
+        self._ring_view[start:] = data[:first]
+        self._ring_view[:count - first] = data[first:count]
+
+    def _take(self):
+        start = self._read % self.capacity
+        self._read += self.frame_bytes
+        if start + self.frame_bytes <= self.capacity:
+            return self._ring_view[start:start + self.frame_bytes]
+        # The frame wraps around the end of the ring
+        first = self.capacity - start
+        self._wrapped[:first] = self._ring_view[start:]
+        self._wrapped[first:] = self._ring_view[:self.frame_bytes - first]
+        return memoryview(self._wrapped)
+
+    def feed(self, data):
+        """
+        Adds data (bytes-like or a contiguous array) and returns the list
+        of every complete frame as a memoryview of frame_bytes bytes.
+        """
+        data = memoryview(data)
+        if data.format != "B" or data.ndim != 1:
+            data = data.cast("B")
+        frame_bytes = self.frame_bytes
+        size = len(data)
+        buffered = self._write - self._read
+        if buffered + size < frame_bytes:
+            # Not enough for a frame yet
+            self._put(data, size)
+            return []
+
+        frames = []
+        position = 0
+        if buffered:
+            # Complete the buffered frame from the ring
+            count = frame_bytes - buffered
+            self._put(data, count)
+            frames.append(self._take())
+            position = count
+        # Frames point into data directly
+        whole = (size - position) // frame_bytes * frame_bytes
+        frames.extend(data[start:start + frame_bytes]
+                      for start in range(position, position + whole, frame_bytes))
+        position += whole
+        if position < size:
+            self._put(data[position:], size - position)
+        return frames
+
+    def drain(self):
+        """Returns the buffered bytes of the incomplete frame and clears them."""
+        start = self._read % self.capacity
+        count = self._write - self._read
+        first = min(count, self.capacity - start)
+        remaining = bytes(self._ring_view[start:start + first]) + bytes(self._ring_view[:count - first])
+        self._read = self._write = 0
+        return remaining
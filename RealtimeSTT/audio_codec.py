@@ -0,0 +1,437 @@
+"""
+Compressed audio on the data websocket.
+
+Raw 16 bit PCM at 48 kHz is 768 kbit/s per stream. A client can instead
+announce one of the compressed formats in its audio_format handshake
+(see protocol.py) and send:
+
+- opus: raw Opus packets, one packet per binary message
+- ogg_opus: an Ogg Opus stream, split into messages anywhere
+- flac: a native FLAC stream, split into messages anywhere
+
+The server keeps one streaming decoder per session, which returns 16 bit
+mono PCM at the recorder's rate. Encoding and decoding use PyAV, an
+optional dependency (pip install av) that is only imported when a
+compressed format is used.
+"""
+
+import collections
+import threading
+import numpy as np
+
+from .protocol import COMPRESSED_FORMATS
+
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+OPUS_FRAME_SECONDS = 0.02
+DEFAULT_OPUS_BITRATE = 32000
+# Longest wait for the container decoder to catch up with fed data
+CONTAINER_DECODE_TIMEOUT = 1.0
+FLAC_STREAMINFO_SIZE = 34
+
+CONTAINER_FORMATS = {
+    "ogg_opus": "ogg",
+    "flac": "flac",
+}
+
+
+def _crc8(data):
+    # CRC-8 of FLAC frame headers, polynomial x^8 + x^2 + x + 1
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def _crc16_table():
+    # CRC-16 of whole FLAC frames, polynomial x^16 + x^15 + x^2 + 1
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def _crc16(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def _flac_frame_header_size(data, pos):
+    """
+    Returns the size of the FLAC frame header at pos, None if there is none
+    (a sync code inside the compressed data, or a header not complete yet).
+    """
+    if len(data) < pos + 5:
+        return None
+    if data[pos] != 0xFF or data[pos + 1] not in (0xF8, 0xF9):
+        return None
+    block_size_code, sample_rate_code = data[pos + 2] >> 4, data[pos + 2] & 0x0F
+    if block_size_code == 0 or sample_rate_code == 0x0F:
+        return None
+    if data[pos + 3] >> 4 > 10 or (data[pos + 3] >> 1) & 0x07 == 3 or data[pos + 3] & 0x01:
+        return None
+    # UTF-8 like coded frame or sample number
+    first = data[pos + 4]
+    length = 1
+    if first & 0x80:
+        length = next((n for n in range(2, 8) if not first & (0x80 >> n)), None)
+        if length is None or first & 0x40 == 0:
+            return None
+    size = 4 + length
+    size += {6: 1, 7: 2}.get(block_size_code, 0)
+    size += {12: 1, 13: 2, 14: 2}.get(sample_rate_code, 0)
+    if len(data) < pos + size + 1:
+        return None
+    if any(data[pos + i] & 0xC0 != 0x80 for i in range(5, 4 + length)):
+        return None
+    if _crc8(data[pos:pos + size]) != data[pos + size]:
+        return None
+    return size + 1
+
+
+def _import_av():
+    try:
+        import av
+    except ImportError:
+        raise ImportError(
+            "Compressed audio needs PyAV, install it with: pip install av")
+    return av
+
+
+class _PcmConverter:
+    """Converts decoded PyAV frames to 16 bit mono PCM bytes."""
+    def __init__(self, av, output_rate):
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=output_rate)
+
+    def convert(self, frames):
+        chunks = []
+        for frame in frames:
+            for resampled in self.resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().tobytes())
+        return b"".join(chunks)
+
+    def flush(self):
+        return b"".join(frame.to_ndarray().tobytes() for frame in self.resampler.resample(None))
+
+
+class OpusPacketDecoder:
+    """
+    Decodes raw Opus packets (one packet per message) to 16 bit mono PCM.
+    """
+    def __init__(self, channels=1, output_rate=16000):
+        av = _import_av()
+        self._av = av
+        self.codec = av.CodecContext.create("opus", "r")
+        self.codec.sample_rate = 48000
+        self.codec.layout = "stereo" if channels == 2 else "mono"
+        self.converter = _PcmConverter(av, output_rate)
+
+    def decode(self, data):
+        return self.converter.convert(self.codec.decode(self._av.Packet(bytes(data))))
+
+    def close(self):
+        """Returns the remaining PCM."""
+        return self.converter.flush()
+
+
+class _BlockingReader:
+    """
+    File-like object PyAV reads the fed bytes from. read() blocks until
+    data arrives; while it waits, the decoder has consumed everything fed
+    so far.
+    """
+    def __init__(self):
+        self.buffer = collections.deque()
+        self.condition = threading.Condition()
+        self.eof = False
+        self.waiting = False
+
+    def feed(self, data):
+        with self.condition:
+            self.buffer.append(bytes(data))
+            self.waiting = False
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.eof = True
+            self.condition.notify_all()
+
+    def wait_until_consumed(self, timeout):
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.waiting or self.eof, timeout=timeout)
+
+    def read(self, size=-1):
+        with self.condition:
+            while not self.buffer and not self.eof:
+                self.waiting = True
+                self.condition.notify_all()
+                self.condition.wait()
+            if not self.buffer:
+                return b""
+            data = self.buffer.popleft()
+            if 0 <= size < len(data):
+                self.buffer.appendleft(data[size:])
+                data = data[:size]
+            return data
+
+
+class ContainerStreamDecoder:
+    """
+    Decodes an Ogg Opus stream that arrives in arbitrary pieces.
+
+    PyAV demuxes from a blocking reader on a thread of its own. decode()
+    feeds the next piece, waits until the demuxer asks for more data and
+    returns the PCM decoded so far, so only the Ogg page that is still
+    arriving is held back. FLAC goes through FlacStreamDecoder, the FLAC
+    demuxer would hold back about a second.
+    """
+    def __init__(self, container_format, output_rate=16000):
+        self._av = _import_av()
+        self.container_format = CONTAINER_FORMATS[container_format]
+        self.output_rate = output_rate
+        self.reader = _BlockingReader()
+        self.output = collections.deque()
+        self.error = None
+        self.thread = threading.Thread(target=self._demux, daemon=True)
+        self.thread.start()
+
+    def _demux(self):
+        try:
+            with self._av.open(self.reader, mode="r", format=self.container_format) as container:
+                stream = container.streams.audio[0]
+                converter = _PcmConverter(self._av, self.output_rate)
+                for packet in container.demux(stream):
+                    pcm = converter.convert(packet.decode())
+                    if pcm:
+                        self.output.append(pcm)
+                pcm = converter.flush()
+                if pcm:
+                    self.output.append(pcm)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.reader.finish()
+
+    def _collect(self):
+        chunks = []
+        while self.output:
+            chunks.append(self.output.popleft())
+        if self.error is not None and not chunks:
+            raise self.error
+        return b"".join(chunks)
+
+    def decode(self, data):
+        self.reader.feed(data)
+        self.reader.wait_until_consumed(CONTAINER_DECODE_TIMEOUT)
+        return self._collect()
+
+    def close(self):
+        """Ends the stream and returns the remaining PCM."""
+        self.reader.finish()
+        self.thread.join(CONTAINER_DECODE_TIMEOUT)
+        return self._collect()
+
+
+class FlacStreamDecoder:
+    """
+    Decodes a native FLAC stream that arrives in arbitrary pieces.
+
+    The FLAC demuxer of FFmpeg only emits a frame after it has verified
+    the headers of about ten following ones, close to a second of audio.
+    This decoder splits the frames itself instead: a frame ends where the
+    next valid frame header (sync code and CRC-8) starts and the CRC-16
+    of the frame before it matches, so only the frame that is still
+    arriving is held back.
+    """
+    def __init__(self, output_rate=16000):
+        av = _import_av()
+        self._av = av
+        self.codec = None
+        self.buffer = bytearray()
+        # Where to look for the next frame header
+        self.search = 2
+        self.converter = _PcmConverter(av, output_rate)
+
+    def _read_metadata(self):
+        # "fLaC", then metadata blocks, the first one is STREAMINFO
+        if len(self.buffer) < 4:
+            return False
+        if self.buffer[:4] != b"fLaC":
+            raise ValueError("FLAC stream does not start with fLaC")
+        pos, streaminfo = 4, None
+        while True:
+            if len(self.buffer) < pos + 4:
+                return False
+            last, block_type = self.buffer[pos] & 0x80, self.buffer[pos] & 0x7F
+            length = int.from_bytes(self.buffer[pos + 1:pos + 4], "big")
+            if len(self.buffer) < pos + 4 + length:
+                return False
+            if block_type == 0:
+                streaminfo = bytes(self.buffer[pos + 4:pos + 4 + FLAC_STREAMINFO_SIZE])
+            pos += 4 + length
+            if last:
+                break
+        if streaminfo is None:
+            raise ValueError("FLAC stream has no STREAMINFO block")
+        self.codec = self._av.CodecContext.create("flac", "r")
+        self.codec.extradata = streaminfo
+        del self.buffer[:pos]
+        return True
+
+    def _decode_frame(self, frame):
+        return self.converter.convert(self.codec.decode(self._av.Packet(bytes(frame))))
+
+    def decode(self, data):
+        self.buffer += data
+        if self.codec is None and not self._read_metadata():
+            return b""
+        chunks = []
+        while True:
+            pos = self.buffer.find(b"\xff", self.search)
+            if pos < 0:
+                self.search = max(len(self.buffer), 2)
+                break
+            if _flac_frame_header_size(self.buffer, pos) is None:
+                if len(self.buffer) < pos + 16:
+                    # Possibly a header that is not complete yet
+                    self.search = pos
+                    break
+                self.search = pos + 1
+                continue
+            if _crc16(self.buffer[:pos]) != 0:
+                # The sync code is part of the compressed data
+                self.search = pos + 1
+                continue
+            chunks.append(self._decode_frame(self.buffer[:pos]))
+            del self.buffer[:pos]
+            self.search = 2
+        return b"".join(chunks)
+
+    def close(self):
+        """Ends the stream and returns the remaining PCM."""
+        chunks = []
+        if self.codec is not None:
+            if self.buffer:
+                chunks.append(self._decode_frame(self.buffer))
+                self.buffer = bytearray()
+            chunks.append(self.converter.convert(self.codec.decode(None)))
+        chunks.append(self.converter.flush())
+        return b"".join(chunks)
+
+
+def create_decoder(stream_format, output_rate=16000):
+    """
+    Returns the streaming decoder for a compressed StreamFormat.
+
+    Raises:
+        ImportError: If PyAV is not installed.
+    """
+    if stream_format.sample_format == "opus":
+        return OpusPacketDecoder(stream_format.channels, output_rate)
+    if stream_format.sample_format == "flac":
+        return FlacStreamDecoder(output_rate)
+    return ContainerStreamDecoder(stream_format.sample_format, output_rate)
+
+
+class StreamEncoder:
+    """
+    Encodes 16 bit mono PCM chunks for sending in a compressed format.
+    encode() returns the messages to send: one per Opus packet for opus,
+    pieces of the byte stream for ogg_opus and flac.
+    """
+    def __init__(self, codec, sample_rate, bitrate=DEFAULT_OPUS_BITRATE):
+        if codec not in COMPRESSED_FORMATS:
+            raise ValueError(f"codec must be one of {COMPRESSED_FORMATS}, got {codec!r}")
+        av = _import_av()
+        self._av = av
+        self.codec = codec
+        self.input_rate = int(sample_rate)
+        # Opus only supports a few rates, resample to the nearest above
+        if codec == "flac":
+            self.rate = self.input_rate
+        else:
+            self.rate = next((rate for rate in OPUS_SAMPLE_RATES if rate >= self.input_rate), 48000)
+        self.resampler = None
+        if self.rate != self.input_rate:
+            self.resampler = av.AudioResampler(format="s16", layout="mono", rate=self.rate)
+        self.frame_size = int(self.rate * OPUS_FRAME_SECONDS) if codec != "flac" else None
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.pts = 0
+
+        self.pieces = []
+        if codec == "opus":
+            self.container = None
+            self.stream = av.CodecContext.create("libopus", "w")
+        else:
+            # Flush Ogg pages every frame instead of once a second
+            options = {"page_duration": str(int(OPUS_FRAME_SECONDS * 1e6))} if codec == "ogg_opus" else {}
+            self.container = av.open(self, mode="w", format=CONTAINER_FORMATS[codec], options=options)
+            self.stream = self.container.add_stream(
+                "libopus" if codec == "ogg_opus" else "flac", rate=self.rate)
+        self.stream.sample_rate = self.rate
+        self.stream.layout = "mono"
+        self.stream.format = "s16"
+        if codec != "flac":
+            self.stream.bit_rate = bitrate
+
+    def write(self, data):
+        # Output of the container muxer
+        self.pieces.append(bytes(data))
+        return len(data)
+
+    def _frame(self, samples, rate):
+        frame = self._av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(samples, dtype=np.int16).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = rate
+        return frame
+
+    def _encode_frame(self, frame):
+        for packet in self.stream.encode(frame):
+            if self.container is None:
+                self.pieces.append(bytes(packet))
+            else:
+                self.container.mux(packet)
+
+    def _take_pieces(self):
+        pieces, self.pieces = self.pieces, []
+        if self.container is not None and pieces:
+            return [b"".join(pieces)]
+        return pieces
+
+    def encode(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if self.resampler is not None:
+            resampled = [frame.to_ndarray().reshape(-1) for frame in self.resampler.resample(self._frame(samples, self.input_rate))]
+            samples = np.concatenate(resampled) if resampled else samples[:0]
+        if self.frame_size is None:
+            frames = [samples] if len(samples) else []
+        else:
+            # Opus encodes fixed 20 ms frames
+            samples = np.concatenate((self.pending, samples))
+            usable = len(samples) - len(samples) % self.frame_size
+            frames = np.split(samples[:usable], usable // self.frame_size) if usable else []
+            self.pending = samples[usable:]
+        for samples in frames:
+            frame = self._frame(samples, self.rate)
+            frame.pts = self.pts
+            self.pts += len(samples)
+            self._encode_frame(frame)
+        return self._take_pieces()
+
+    def close(self):
+        """Flushes the encoder and returns the last messages."""
+        self._encode_frame(None)
+        if self.container is not None:
+            self.container.close()
+        return self._take_pieces()
@@ -1,5 +1,5 @@
 from colorama import init, Fore, Style
-from scipy.signal import butter, filtfilt, resample_poly
+from .resampler import ensure_resampler
 try:
     import pyaudiowpatch as pyaudio
 except ImportError:
@@ -35,6 +35,7 @@ class AudioInput:
         self.channels = channels
         self.resample_to_target = resample_to_target
         self.use_loopback = use_loopback
+        self.resampler = None
 
     def get_supported_sample_rates(self, device_index):
         """Test which standard sample rates are supported by the specified device."""
@@ -208,6 +209,8 @@ class AudioInput:
         # Normalize cutoff frequency to Nyquist rate (required by butter())
         normal_cutoff = cutoff_freq / nyquist_rate
 
+        from scipy.signal import butter, filtfilt
+
         # Design the Butterworth filter
         b, a = butter(5, normal_cutoff, btype='low', analog=False)
 
@@ -228,17 +231,13 @@ class AudioInput:
             np.ndarray: Resampled audio data
 
         Notes:
-            - Applies anti-aliasing filter before resampling
-            - Uses polyphase filtering for high-quality resampling
+            - Treats consecutive calls as one continuous stream, the filter
+              history is kept between chunks
+            - Uses polyphase filtering for high-quality resampling, its
+              low-pass filter also prevents aliasing when downsampling
         """
-        if target_sample_rate < original_sample_rate:
-            # Downsampling with low-pass filter
-            pcm_filtered = self.lowpass_filter(pcm_data, target_sample_rate / 2, original_sample_rate)
-            resampled = resample_poly(pcm_filtered, target_sample_rate, original_sample_rate)
-        else:
-            # Upsampling without low-pass filter
-            resampled = resample_poly(pcm_data, target_sample_rate, original_sample_rate)
-        return resampled
+        self.resampler = ensure_resampler(self.resampler, original_sample_rate, target_sample_rate)
+        return self.resampler.process(pcm_data)
 
     def read_chunk(self):
         """Read a chunk of audio data"""
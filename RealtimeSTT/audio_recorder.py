@@ -26,21 +26,32 @@ Author: Kolja Beigel
 
 """
 
-from faster_whisper import WhisperModel, BatchedInferencePipeline
+# faster_whisper, torch, scipy, openwakeword, pvporcupine, halo and
+# soundfile are imported where they are used, so importing RealtimeSTT
+# stays fast and backends of unused features are never loaded.
 from typing import Iterable, List, Optional, Union
-from openwakeword.model import Model
-import torch.multiprocessing as mp
-from scipy.signal import resample
+import multiprocessing as mp
 import signal as system_signal
 from ctypes import c_bool
-from scipy import signal
 from .safepipe import SafePipe
-import soundfile as sf
-import faster_whisper
-import openwakeword
+from .audio_buffer import AudioArena, AudioChunker
+from .shared_audio import SharedAudioPool, SharedAudioDescriptor, SHARED_AUDIO_SLOTS_PER_RECORDER
+from .model_pool import ModelPool
+from .vad_worker import SileroVADWorker
+from .resampler import ensure_resampler
+from .utterance_trace import UtteranceTrace, JsonlTraceSink, LatencyStats
+from .offline import OfflineSegmenter, OfflineTranscription
+from .clock import create_clock
+from .qos import QoSController, QOS_LEVELS
+from . import metrics
+import concurrent.futures
 import collections
+import dataclasses
+import itertools
+import weakref
+import hashlib
+import bisect
 import numpy as np
-import pvporcupine
 import traceback
 import threading
 import webrtcvad
@@ -50,8 +61,6 @@ import logging
 import struct
 import base64
 import queue
-import torch
-import halo
 import time
 import copy
 import os
@@ -79,9 +88,27 @@ INIT_PRE_RECORDING_BUFFER_DURATION = 1.0
 INIT_WAKE_WORD_ACTIVATION_DELAY = 0.0
 INIT_WAKE_WORD_TIMEOUT = 5.0
 INIT_WAKE_WORD_BUFFER_DURATION = 0.1
+INIT_REALTIME_MAX_WINDOW_SECONDS = 15.0
+INIT_QOS_REALTIME_PAUSE = 0.5
+INIT_QOS_FALLBACK_MODEL = "tiny"
+INIT_SHARED_MEMORY_MAX_SECONDS = 60.0
+TRANSCRIPTION_RESULT_POLL_TIMEOUT = 0.5
+TRANSCRIPTION_STATS_INTERVAL = 1.0
+INIT_TRANSCRIPTION_BATCH_WINDOW_MS = 0
+INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS = 16
+BATCH_CHUNK_SECONDS = 30
+REALTIME_WINDOW_PROMPT_CHARS = 200
+REALTIME_MAIN_MODEL_TIMEOUT = 5.0
+# The worker gathers offline requests at least this long into one batch
+OFFLINE_BATCH_WINDOW = 0.05
+# Seconds of a file read at once by transcribe_file()
+OFFLINE_FILE_BLOCK_SECONDS = 10
 ALLOWED_LATENCY_LIMIT = 100
+# Upper bound for how long an idle worker blocks before it re-checks state
+# that is changed without a notification (events set by other processes,
+# pipes closed by the other end). Notifications and data wake it at once.
+IDLE_WAIT_TIMEOUT = 0.5
 
-TIME_SLEEP = 0.02
 SAMPLE_RATE = 16000
 BUFFER_SIZE = 512
 INT16_MAX_ABS_VALUE = 32768.0
@@ -90,11 +117,263 @@ INIT_HANDLE_BUFFER_OVERFLOW = False
 if platform.system() != 'Darwin':
     INIT_HANDLE_BUFFER_OVERFLOW = True
 
+# Lower value means higher priority. Offline requests (transcribe_file,
+# transcribe_stream) yield to the live recorders sharing the worker.
+TRANSCRIPTION_PRIORITIES = {"final": 0, "early": 1, "realtime": 2, "offline": 3}
+
+# A request to the transcription worker. The worker replies with
+# (request_id, (status, result)), status being 'success', 'error' or
+# 'cancelled'. The result of a success is (text, info, (decode_start,
+# decode_end)), the decode times from time.monotonic(), which is system
+# wide and comparable across processes. A ('cancel', request_id) message
+# cancels a queued request.
+TranscriptionRequest = collections.namedtuple(
+    "TranscriptionRequest",
+    ["request_id", "kind", "priority", "audio", "language", "use_prompt", "utterance_id", "options"],
+    defaults=(None,))
+
+# Decoding options sent along with every request, so recorders with
+# different settings can share one transcription worker. Hashable, the
+# worker batches only requests with equal options.
+TranscriptionOptions = collections.namedtuple(
+    "TranscriptionOptions",
+    ["beam_size", "initial_prompt", "suppress_tokens", "batch_size", "vad_filter", "normalize_audio"])
+
+# A speculative transcription sent during a pause in speech, with the
+# length and fingerprint of the audio span it transcribes
+EarlyTranscription = collections.namedtuple("EarlyTranscription", ["future", "samples", "fingerprint"])
+
+# Utterance ids are unique within the process, requests of different
+# recorders sharing a worker must never be coalesced with each other
+_utterance_ids = itertools.count(1)
+
+# Running recorders, for the audio queue gauges
+_live_recorders = weakref.WeakSet()
+
+
+def _queue_depth(recorder):
+    try:
+        return recorder.audio_queue.qsize()
+    except NotImplementedError:
+        # multiprocessing queues have no qsize() on macOS
+        return 0
+
+
+def _audio_fingerprint(audio):
+    """Digest of an audio span, to recognize it at the start of a later array."""
+    return hashlib.blake2b(np.ascontiguousarray(audio), digest_size=16).digest()
+
+
+def _deepest_recorder():
+    return max(list(_live_recorders), key=_queue_depth, default=None)
+
+
+metrics.AUDIO_QUEUE_DEPTH.set_function(
+    lambda: _queue_depth(_deepest_recorder()) if _live_recorders else 0)
+metrics.AUDIO_QUEUE_LIMIT.set_function(
+    lambda: _deepest_recorder().allowed_latency_limit if _live_recorders else 0)
+metrics.QOS_LEVEL.set_function(
+    lambda: max((QOS_LEVELS.index(recorder.qos.level_name)
+                 for recorder in list(_live_recorders) if getattr(recorder, "qos", None)), default=0))
+
+
+class TranscriptionScheduler:
+    """
+    Priority queue of pending transcription requests in the worker.
+
+    get() always returns the highest priority request (final before early
+    before realtime), oldest first within a priority. A new realtime or
+    early request supersedes queued requests of the same kind for the same
+    utterance, since only the newest audio of an utterance is of interest.
+    Superseded and cancelled requests are handed back to the caller, which
+    replies 'cancelled' so the parent can release their resources.
+    """
+    COALESCED_KINDS = ("realtime", "early")
+
+    def __init__(self):
+        self._pending = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._served = collections.Counter()
+        self._dropped = collections.Counter()
+        self._wait_total = collections.Counter()
+        self._wait_max = {}
+        self._max_depth = 0
+
+    def put(self, request):
+        """
+        Queues a request. Returns the list of queued requests it supersedes.
+        """
+        dropped = []
+        with self._condition:
+            if request.kind in self.COALESCED_KINDS:
+                keep = []
+                for entry in self._pending:
+                    queued = entry[2]
+                    if queued.kind == request.kind and queued.utterance_id == request.utterance_id:
+                        dropped.append(queued)
+                    else:
+                        keep.append(entry)
+                self._pending = keep
+            self._pending.append((request.priority, next(self._sequence), request, time.time()))
+            self._max_depth = max(self._max_depth, len(self._pending))
+            self._condition.notify()
+        with self._stats_lock:
+            for queued in dropped:
+                self._dropped[queued.kind] += 1
+        return dropped
+
+    def cancel(self, request_id):
+        """
+        Removes a queued request. Returns it, or None if it is not queued
+        (already being transcribed or done).
+        """
+        with self._condition:
+            for entry in self._pending:
+                if entry[2].request_id == request_id:
+                    self._pending.remove(entry)
+                    with self._stats_lock:
+                        self._dropped[entry[2].kind] += 1
+                    return entry[2]
+        return None
+
+    def get(self, timeout=None, kind=None):
+        """
+        Returns the next request to transcribe. Raises queue.Empty if none
+        arrives within timeout seconds.
+
+        With kind set, only a request of that kind is returned: get() waits
+        until one is next in line and raises queue.Empty as soon as a
+        request of a higher priority is next in line instead.
+        """
+        with self._condition:
+            if kind is None:
+                ready = lambda: self._pending
+            else:
+                priority = TRANSCRIPTION_PRIORITIES[kind]
+                ready = lambda: self._pending and min(self._pending)[0] <= priority
+            if not self._condition.wait_for(ready, timeout):
+                raise queue.Empty
+            entry = min(self._pending)
+            if kind is not None and entry[2].kind != kind:
+                raise queue.Empty
+            self._pending.remove(entry)
+        _, _, request, queued_time = entry
+        wait_time = time.time() - queued_time
+        with self._stats_lock:
+            self._served[request.kind] += 1
+            self._wait_total[request.kind] += wait_time
+            self._wait_max[request.kind] = max(self._wait_max.get(request.kind, 0.0), wait_time)
+        return request
+
+    def stats(self, reset=True):
+        """
+        Returns queue depth and wait time statistics per request kind,
+        optionally starting a new measurement interval.
+        """
+        with self._condition:
+            depth = collections.Counter(entry[2].kind for entry in self._pending)
+        with self._stats_lock:
+            stats = {
+                "queue_depth": sum(depth.values()),
+                "max_queue_depth": self._max_depth,
+                "kinds": {
+                    kind: {
+                        "queued": depth[kind],
+                        "served": self._served[kind],
+                        "dropped": self._dropped[kind],
+                        "mean_wait": (self._wait_total[kind] / self._served[kind]
+                                      if self._served[kind] else 0.0),
+                        "max_wait": self._wait_max.get(kind, 0.0),
+                    }
+                    for kind in TRANSCRIPTION_PRIORITIES
+                },
+            }
+            if reset:
+                self._reset_stats()
+        return stats
+
+
+def transcribe_batched(pipeline, audios, language, batch_size=None, vad_filter=False, **transcribe_kwargs):
+    """
+    Transcribes several independent clips in shared forward passes.
+
+    The clips are laid out in one buffer (separated by a short gap) and
+    every clip is cut into chunks of at most BATCH_CHUNK_SECONDS, using
+    VAD speech segments when vad_filter is set. The chunks of all clips are
+    passed to the BatchedInferencePipeline as clip_timestamps, so they are
+    encoded and decoded together, and the resulting segments are mapped
+    back to their clip by position.
+
+    Args:
+        pipeline (BatchedInferencePipeline): The pipeline to run.
+        audios (list of np.ndarray): Float32 16 kHz clips.
+        language (str): Language of all clips. Must not be None, since the
+            pipeline would detect one language for all clips.
+        batch_size (int, optional): Chunks per forward pass. Defaults to
+            all chunks at once.
+        vad_filter (bool): Only transcribe speech segments found by VAD.
+        **transcribe_kwargs: Passed on to pipeline.transcribe.
+
+    Returns:
+        list of (str, TranscriptionInfo): One result per clip.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+    from faster_whisper.transcribe import TranscriptionInfo
+
+    gap = SAMPLE_RATE // 10
+    chunk_samples = BATCH_CHUNK_SECONDS * SAMPLE_RATE
+    offsets = []
+    clip_timestamps = []
+    position = 0
+    for audio in audios:
+        offsets.append(position)
+        if vad_filter:
+            vad_options = VadOptions(max_speech_duration_s=BATCH_CHUNK_SECONDS, min_silence_duration_ms=160)
+            chunks = merge_segments(get_speech_timestamps(audio, vad_options), vad_options)
+        else:
+            chunks = [{"start": start, "end": min(start + chunk_samples, len(audio))}
+                      for start in range(0, len(audio), chunk_samples)]
+        clip_timestamps.extend({"start": position + chunk["start"], "end": position + chunk["end"]}
+                               for chunk in chunks)
+        position += len(audio) + gap
+
+    results = [[] for _ in audios]
+    info = TranscriptionInfo(
+        language=language, language_probability=1, duration=0, duration_after_vad=0,
+        all_language_probs=None, transcription_options=None, vad_options=None)
+    if clip_timestamps:
+        combined = np.zeros(position, dtype=np.float32)
+        for offset, audio in zip(offsets, audios):
+            combined[offset:offset + len(audio)] = audio
+        segments, info = pipeline.transcribe(
+            combined,
+            language=language,
+            clip_timestamps=clip_timestamps,
+            batch_size=batch_size or len(clip_timestamps),
+            **transcribe_kwargs
+        )
+        # Clip boundaries in the middle of each gap, in seconds
+        boundaries = [(offset - gap / 2) / SAMPLE_RATE for offset in offsets[1:]]
+        for segment in segments:
+            results[bisect.bisect_right(boundaries, segment.start)].append(segment.text)
+
+    return [
+        (" ".join(texts).strip(), dataclasses.replace(info, duration=len(audio) / SAMPLE_RATE))
+        for texts, audio in zip(results, audios)
+    ]
+
 
 class TranscriptionWorker:
     def __init__(self, conn, stdout_pipe, model_path, download_root, compute_type, gpu_device_index, device,
                  ready_event, shutdown_event, interrupt_stop_event, beam_size, initial_prompt, suppress_tokens,
-                 batch_size, faster_whisper_vad_filter, normalize_audio):
+                 batch_size, faster_whisper_vad_filter, normalize_audio,
+                 batch_window_ms=INIT_TRANSCRIPTION_BATCH_WINDOW_MS,
+                 max_batch_requests=INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS):
         self.conn = conn
         self.stdout_pipe = stdout_pipe
         self.model_path = model_path
@@ -105,13 +384,18 @@ class TranscriptionWorker:
         self.ready_event = ready_event
         self.shutdown_event = shutdown_event
         self.interrupt_stop_event = interrupt_stop_event
-        self.beam_size = beam_size
-        self.initial_prompt = initial_prompt
-        self.suppress_tokens = suppress_tokens
-        self.batch_size = batch_size
-        self.faster_whisper_vad_filter = faster_whisper_vad_filter
-        self.normalize_audio = normalize_audio
-        self.queue = queue.Queue()
+        self.default_options = TranscriptionOptions(
+            beam_size, initial_prompt, suppress_tokens, batch_size,
+            faster_whisper_vad_filter, normalize_audio)
+        # Attached shared audio pools: name => SharedAudioPool
+        self.shared_audio = {}
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_requests = max(1, max_batch_requests)
+        self.queue = TranscriptionScheduler()
+        self.send_lock = threading.Lock()
+        self.last_stats_time = time.time()
+        # (kind, inference seconds, audio seconds) since the last stats
+        self.transcriptions = []
 
     def custom_print(self, *args, **kwargs):
         message = ' '.join(map(str, args))
@@ -120,19 +404,186 @@ class TranscriptionWorker:
         except (BrokenPipeError, EOFError, OSError):
             pass
 
+    def reply(self, request_id, status, result=None):
+        # Replies are sent from the polling thread (cancellations) too
+        with self.send_lock:
+            self.conn.send((request_id, (status, result)))
+
+    def send_stats(self, force=False):
+        """
+        Sends scheduler statistics as ('stats', {...}) over the stdout pipe
+        at most every TRANSCRIPTION_STATS_INTERVAL seconds.
+        """
+        now = time.time()
+        if not force and now - self.last_stats_time < TRANSCRIPTION_STATS_INTERVAL:
+            return
+        stats = self.queue.stats()
+        stats["interval"] = now - self.last_stats_time
+        stats["transcriptions"], self.transcriptions = self.transcriptions, []
+        self.last_stats_time = now
+        try:
+            self.stdout_pipe.send(('stats', stats))
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+
     def poll_connection(self):
         while not self.shutdown_event.is_set():
             try:
-                # Use a longer timeout to reduce polling frequency
-                if self.conn.poll(0.01):  # Increased from 0.01 to 0.5 seconds
-                    data = self.conn.recv()
-                    self.queue.put(data)
+                # Blocks until a request arrives, the timeout only bounds
+                # how long a shutdown waits for this thread
+                if not self.conn.poll(IDLE_WAIT_TIMEOUT):
+                    continue
+                data = self.conn.recv()
+                if isinstance(data, tuple) and len(data) == 2 and data[0] == 'cancel':
+                    dropped = [self.queue.cancel(data[1])]
                 else:
-                    # Sleep only if no data, but use a shorter sleep
-                    time.sleep(TIME_SLEEP)
+                    dropped = self.queue.put(data)
+                for request in dropped:
+                    if request is not None:
+                        logging.debug(f"Dropping {request.kind} transcription request {request.request_id}")
+                        self.reply(request.request_id, 'cancelled')
+            except (EOFError, BrokenPipeError, OSError):
+                # The parent closed the pipe, no more requests will come
+                break
             except Exception as e:
                 logging.error(f"Error receiving data from connection: {e}", exc_info=True)
-                time.sleep(TIME_SLEEP)
+
+    def get_options(self, request):
+        """Returns the options of a request, falling back to the worker's."""
+        return request.options or self.default_options
+
+    def prepare_audio(self, request):
+        """Resolves the audio of a request and normalizes it if enabled."""
+        audio = request.audio
+
+        # Zero-copy view into the shared audio slot
+        if isinstance(audio, SharedAudioDescriptor):
+            pool = self.shared_audio.get(audio.pool[0])
+            if pool is None:
+                pool = self.shared_audio[audio.pool[0]] = SharedAudioPool.attach(audio.pool)
+            audio = pool.view(audio)
+
+        # normalize audio to -0.95 dBFS
+        if audio is not None and audio .size > 0:
+            if self.get_options(request).normalize_audio:
+                peak = np.max(np.abs(audio))
+                if peak > 0:
+                    audio = (audio / peak) * 0.95
+        else:
+            raise ValueError("Received None audio for transcription")
+        return audio
+
+    @staticmethod
+    def get_prompt(options, use_prompt):
+        if use_prompt:
+            return options.initial_prompt if options.initial_prompt else None
+        return None
+
+    @staticmethod
+    def decode_kwargs(options, use_prompt):
+        """The faster_whisper transcribe() arguments for options."""
+        suppress_tokens = options.suppress_tokens
+        return dict(
+            beam_size=options.beam_size,
+            initial_prompt=TranscriptionWorker.get_prompt(options, use_prompt),
+            # faster_whisper insists on a list
+            suppress_tokens=list(suppress_tokens) if suppress_tokens is not None else None,
+        )
+
+    def transcribe_request(self, model, batched_model, request):
+        request_id, language = request.request_id, request.language
+        try:
+            logging.debug(f"Transcribing {request.kind} request {request_id} with language {language}")
+            start_t = time.monotonic()
+            audio = self.prepare_audio(request)
+            options = self.get_options(request)
+
+            if (options.batch_size > 0 and not options.vad_filter
+                    and len(audio) > BATCH_CHUNK_SECONDS * SAMPLE_RATE):
+                # Without VAD the pipeline refuses clips longer than one
+                # chunk, transcribe_batched cuts them into chunks itself
+                language_probability = 1
+                if not language:
+                    language, language_probability, _ = batched_model.model.detect_language(audio)
+                [(transcription, info)] = transcribe_batched(
+                    batched_model, [audio], language,
+                    batch_size=options.batch_size,
+                    **self.decode_kwargs(options, request.use_prompt)
+                )
+                info = dataclasses.replace(info, language_probability=language_probability)
+            else:
+                if options.batch_size > 0:
+                    segments, info = batched_model.transcribe(
+                        audio,
+                        language=language if language else None,
+                        batch_size=options.batch_size,
+                        vad_filter=options.vad_filter,
+                        **self.decode_kwargs(options, request.use_prompt)
+                    )
+                else:
+                    segments, info = model.transcribe(
+                        audio,
+                        language=language if language else None,
+                        vad_filter=options.vad_filter,
+                        **self.decode_kwargs(options, request.use_prompt)
+                    )
+                transcription = " ".join(seg.text for seg in segments).strip()
+            end_t = time.monotonic()
+            elapsed = end_t - start_t
+            self.transcriptions.append((request.kind, elapsed, len(audio) / SAMPLE_RATE))
+            logging.debug(f"Final text detected with main model: {transcription} in {elapsed:.4f}s")
+            self.reply(request_id, 'success', (transcription, info, (start_t, end_t)))
+        except Exception as e:
+            logging.error(f"General error in transcription: {e}", exc_info=True)
+            self.reply(request_id, 'error', str(e))
+
+    def transcribe_requests(self, pipeline, requests):
+        """
+        Transcribes several requests together. Requests are grouped by
+        language, prompt and options, each group runs as one batch.
+        """
+        start_t = time.time()
+        groups = collections.defaultdict(list)
+        for request in requests:
+            try:
+                audio = self.prepare_audio(request)
+                language, language_probability = request.language, 1
+                if not language:
+                    # The pipeline would detect one language for the whole batch
+                    language, language_probability, _ = pipeline.model.detect_language(audio)
+                groups[(language, request.use_prompt, self.get_options(request))].append(
+                    (request, audio, language_probability))
+            except Exception as e:
+                logging.error(f"General error in transcription: {e}", exc_info=True)
+                self.reply(request.request_id, 'error', str(e))
+
+        for (language, use_prompt, options), entries in groups.items():
+            group_start = time.monotonic()
+            try:
+                results = transcribe_batched(
+                    pipeline,
+                    [audio for _, audio, _ in entries],
+                    language,
+                    batch_size=max(options.batch_size, 0) or None,
+                    vad_filter=options.vad_filter,
+                    **self.decode_kwargs(options, use_prompt)
+                )
+            except Exception as e:
+                logging.error(f"General error in batched transcription: {e}", exc_info=True)
+                for request, _, _ in entries:
+                    self.reply(request.request_id, 'error', str(e))
+                continue
+            # The batch's model time is shared by audio length
+            group_end = time.monotonic()
+            group_time = group_end - group_start
+            total_samples = sum(len(audio) for _, audio, _ in entries) or 1
+            for request, audio, _ in entries:
+                self.transcriptions.append(
+                    (request.kind, group_time * len(audio) / total_samples, len(audio) / SAMPLE_RATE))
+            for (request, _, language_probability), (transcription, info) in zip(entries, results):
+                info = dataclasses.replace(info, language_probability=language_probability)
+                self.reply(request.request_id, 'success', (transcription, info, (group_start, group_end)))
+        logging.debug(f"Transcribed batch of {len(requests)} requests in {time.time() - start_t:.4f}s")
 
     def run(self):
         if __name__ == "__main__":
@@ -142,16 +593,18 @@ class TranscriptionWorker:
         logging.info(f"Initializing faster_whisper main transcription model {self.model_path}")
 
         try:
-            model = faster_whisper.WhisperModel(
+            from faster_whisper import WhisperModel, BatchedInferencePipeline
+            import soundfile as sf
+
+            model = WhisperModel(
                 model_size_or_path=self.model_path,
                 device=self.device,
                 compute_type=self.compute_type,
                 device_index=self.gpu_device_index,
                 download_root=self.download_root,
             )
-            # Create a short dummy audio array, for example 1 second of silence at 16 kHz
-            if self.batch_size > 0:
-                model = BatchedInferencePipeline(model=model)
+            # Requests choose between plain and batched inference
+            batched_model = BatchedInferencePipeline(model=model)
 
             # Run a warm-up transcription
             current_dir = os.path.dirname(os.path.realpath(__file__))
@@ -159,7 +612,8 @@ class TranscriptionWorker:
                 current_dir, "warmup_audio.wav"
             )
             warmup_audio_data, _ = sf.read(warmup_audio_path, dtype="float32")
-            segments, info = model.transcribe(warmup_audio_data, language="en", beam_size=1)
+            warmup_model = batched_model if self.default_options.batch_size > 0 else model
+            segments, info = warmup_model.transcribe(warmup_audio_data, language="en", beam_size=1)
             model_warmup_transcription = " ".join(segment.text for segment in segments)
         except Exception as e:
             logging.exception(f"Error initializing main faster_whisper transcription model: {e}")
@@ -175,53 +629,31 @@ class TranscriptionWorker:
         try:
             while not self.shutdown_event.is_set():
                 try:
-                    audio, language, use_prompt = self.queue.get(timeout=0.1)
-                    try:
-                        logging.debug(f"Transcribing audio with language {language}")
-                        start_t = time.time()
-
-                        # normalize audio to -0.95 dBFS
-                        if audio is not None and audio .size > 0:
-                            if self.normalize_audio:
-                                peak = np.max(np.abs(audio))
-                                if peak > 0:
-                                    audio = (audio / peak) * 0.95
-                        else:
-                            logging.error("Received None audio for transcription")
-                            self.conn.send(('error', "Received None audio for transcription"))
-                            continue
-
-                        prompt = None
-                        if use_prompt:
-                            prompt = self.initial_prompt if self.initial_prompt else None
-
-                        if self.batch_size > 0:
-                            segments, info = model.transcribe(
-                                audio,
-                                language=language if language else None,
-                                beam_size=self.beam_size,
-                                initial_prompt=prompt,
-                                suppress_tokens=self.suppress_tokens,
-                                batch_size=self.batch_size, 
-                                vad_filter=self.faster_whisper_vad_filter
-                            )
-                        else:
-                            segments, info = model.transcribe(
-                                audio,
-                                language=language if language else None,
-                                beam_size=self.beam_size,
-                                initial_prompt=prompt,
-                                suppress_tokens=self.suppress_tokens,
-                                vad_filter=self.faster_whisper_vad_filter
-                            )
-                        elapsed = time.time() - start_t
-                        transcription = " ".join(seg.text for seg in segments).strip()
-                        logging.debug(f"Final text detected with main model: {transcription} in {elapsed:.4f}s")
-                        self.conn.send(('success', (transcription, info)))
-                    except Exception as e:
-                        logging.error(f"General error in transcription: {e}", exc_info=True)
-                        self.conn.send(('error', str(e)))
+                    requests = [self.queue.get(timeout=TRANSCRIPTION_STATS_INTERVAL)]
+                    kind = requests[0].kind
+                    batch_window = self.batch_window
+                    if kind == "offline":
+                        # Throughput over latency, always batch
+                        batch_window = max(batch_window, OFFLINE_BATCH_WINDOW)
+                    if batch_window > 0:
+                        # Gather requests of the same kind only, so a final
+                        # never waits for or decodes with lower priorities.
+                        # A final is not held back either, it only takes the
+                        # finals that are already queued along.
+                        deadline = time.time() + (0 if kind == "final" else batch_window)
+                        while len(requests) < self.max_batch_requests:
+                            try:
+                                requests.append(self.queue.get(
+                                    timeout=max(deadline - time.time(), 0), kind=kind))
+                            except queue.Empty:
+                                break
+                    if len(requests) == 1:
+                        self.transcribe_request(model, batched_model, requests[0])
+                    else:
+                        self.transcribe_requests(batched_model, requests)
+                    self.send_stats()
                 except queue.Empty:
+                    self.send_stats()
                     continue
                 except KeyboardInterrupt:
                     self.interrupt_stop_event.set()
@@ -231,18 +663,599 @@ class TranscriptionWorker:
                     logging.error(f"General error in processing queue item: {e}", exc_info=True)
         finally:
             __builtins__['print'] = print  # Restore the original print function
+            for pool in self.shared_audio.values():
+                pool.close()
             self.conn.close()
             self.stdout_pipe.close()
             self.shutdown_event.set()  # Ensure the polling thread will stop
             polling_thread.join()  # Wait for the polling thread to finish
 
 
+def _worker_runs_in_thread():
+    """Returns True if _start_worker runs workers as threads."""
+    return platform.system() == 'Linux'
+
+
+def _start_worker(target=None, args=()):
+    """
+    Implement a consistent threading model across the library.
+
+    Starts target with the standard threading.Thread on Linux and with the
+    pytorch MultiProcessing library 'Process' on all other platforms.
+    """
+    if _worker_runs_in_thread():
+        thread = threading.Thread(target=target, args=args)
+        thread.deamon = True
+        thread.start()
+        return thread
+    else:
+        thread = mp.Process(target=target, args=args)
+        thread.start()
+        return thread
+
+
+class TranscriptionService:
+    """
+    A running main model TranscriptionWorker with its pipes and the shared
+    audio memory. Services are pooled by ModelPool and shared by every
+    TranscriptionEngine with the same model configuration, each request
+    carries the decoding options of the engine that sent it.
+
+    Shared memory is only used if the worker runs in its own process. On
+    Linux the worker is a thread of this process, sharing memory with it
+    saves nothing over the pipe. Engines register with add_engine() so the
+    shared memory grows with the number of recorders using the service.
+    """
+    def __init__(self,
+                 model: str = INIT_MODEL_TRANSCRIPTION,
+                 download_root: str = None,
+                 compute_type: str = "default",
+                 gpu_device_index: Union[int, List[int]] = 0,
+                 device: str = "cpu",
+                 default_options: TranscriptionOptions = TranscriptionOptions(5, None, (-1,), 16, True, False),
+                 use_shared_memory_transport: bool = True,
+                 shared_memory_max_seconds: float = INIT_SHARED_MEMORY_MAX_SECONDS,
+                 transcription_batch_window_ms: int = INIT_TRANSCRIPTION_BATCH_WINDOW_MS,
+                 transcription_max_batch_requests: int = INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS,
+                 ):
+        """
+        Starts the transcription worker and waits until its model is loaded.
+        default_options apply to requests sent without options.
+        """
+        self.is_shut_down = False
+        self.shutdown_lock = threading.Lock()
+        self.shutdown_event = mp.Event()
+        self.interrupt_stop_event = mp.Event()
+        self.ready_event = mp.Event()
+        self.worker_stats = {}
+        self.request_ids = itertools.count(1)
+        self.max_batch_requests = max(1, transcription_max_batch_requests)
+        self.engines = 0
+
+        # Shared memory for request audio: pool name => SharedAudioPool,
+        # and request_id => descriptor of the slot the request occupies
+        self.use_shared_memory_transport = (
+            use_shared_memory_transport and not _worker_runs_in_thread())
+        self.shared_audio_slot_samples = int(shared_memory_max_seconds * SAMPLE_RATE)
+        self.shared_audio_pools = {}
+        self.shared_audio_slots = {}
+        self.shared_audio_lock = threading.Lock()
+
+        self.parent_transcription_pipe, child_transcription_pipe = SafePipe()
+        self.parent_stdout_pipe, child_stdout_pipe = SafePipe()
+
+        self.transcript_process = _start_worker(
+            target=TranscriptionService._transcription_worker,
+            args=(
+                child_transcription_pipe,
+                child_stdout_pipe,
+                model,
+                download_root,
+                compute_type,
+                gpu_device_index,
+                device,
+                self.ready_event,
+                self.shutdown_event,
+                self.interrupt_stop_event,
+                *default_options,
+                transcription_batch_window_ms,
+                transcription_max_batch_requests,
+            )
+        )
+
+        # Wait for transcription models to start
+        logger.debug('Waiting for main transcription model to start')
+        self.ready_event.wait()
+        logger.debug('Main transcription model ready')
+
+        self.stdout_thread = threading.Thread(target=self._read_stdout)
+        self.stdout_thread.daemon = True
+        self.stdout_thread.start()
+
+    @staticmethod
+    def _transcription_worker(*args, **kwargs):
+        worker = TranscriptionWorker(*args, **kwargs)
+        worker.run()
+
+    @property
+    def pid(self):
+        """Process id of the worker if it runs in its own process."""
+        return getattr(self.transcript_process, "pid", None)
+
+    def _read_stdout(self):
+        while not self.shutdown_event.is_set():
+            try:
+                if self.parent_stdout_pipe.poll(IDLE_WAIT_TIMEOUT):
+                    logger.debug("Receive from stdout pipe")
+                    message = self.parent_stdout_pipe.recv()
+                    if isinstance(message, tuple) and message[0] == 'stats':
+                        stats = message[1]
+                        for kind, inference_seconds, audio_seconds in stats.pop("transcriptions", ()):
+                            metrics.observe_transcription(kind, inference_seconds, audio_seconds)
+                        self.worker_stats = stats
+                    else:
+                        logger.info(message)
+            except (BrokenPipeError, EOFError, OSError):
+                # The pipe has been closed, nothing more will arrive
+                break
+            except KeyboardInterrupt:  # handle manual interruption (Ctrl+C)
+                logger.info("KeyboardInterrupt in read from stdout detected, exiting...")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error in read from stdout: {e}", exc_info=True)
+                logger.error(traceback.format_exc())  # Log the full traceback here
+                break 
+
+    def add_engine(self):
+        """
+        Registers an engine using this service. Adds shared memory slots
+        until every registered engine's requests and a full batch fit.
+        """
+        with self.shared_audio_lock:
+            self.engines += 1
+            if not self.use_shared_memory_transport:
+                return
+            needed = self.max_batch_requests + SHARED_AUDIO_SLOTS_PER_RECORDER * self.engines
+            available = sum(pool.num_slots for pool in self.shared_audio_pools.values())
+            if needed <= available:
+                return
+            # Existing pools may have slots in use, so add another block
+            try:
+                pool = SharedAudioPool(self.shared_audio_slot_samples, needed - available)
+            except Exception as e:
+                logger.warning("Shared memory audio transport unavailable, "
+                               f"sending audio through the pipe: {e}")
+                self.use_shared_memory_transport = False
+                return
+            self.shared_audio_pools[pool.name] = pool
+
+    def remove_engine(self):
+        """Unregisters an engine. Shared memory is kept until shutdown."""
+        with self.shared_audio_lock:
+            self.engines -= 1
+
+    def _write_shared_audio(self, request_id, audio):
+        """
+        Writes audio into a free shared memory slot for request_id.
+        Returns the descriptor or None if no slot was available.
+        """
+        with self.shared_audio_lock:
+            pools = list(self.shared_audio_pools.values())
+        for pool in pools:
+            descriptor = pool.write(audio)
+            if descriptor:
+                self.shared_audio_slots[request_id] = descriptor
+                return descriptor
+        return None
+
+    def request(self, audio, language, use_prompt, kind, utterance_id=0, options=None):
+        """
+        Sends a transcription request of the given kind ('final', 'early',
+        'realtime' or 'offline') to the transcription worker and returns a future that
+        receives the (status, result) reply.
+
+        If shared memory transport is enabled and a slot is free, the audio
+        is written into shared memory once and only its descriptor is sent.
+        Otherwise the audio array is pickled through the pipe.
+        """
+        request_id = next(self.request_ids)
+        descriptor = self._write_shared_audio(request_id, audio)
+        request = TranscriptionRequest(
+            request_id, kind, TRANSCRIPTION_PRIORITIES[kind],
+            descriptor if descriptor else audio, language, use_prompt,
+            utterance_id, options)
+        try:
+            future = self.parent_transcription_pipe.request(
+                request_id, request, on_reply=self._on_reply)
+        except BaseException:
+            self._on_reply(request_id)
+            raise
+        future.request_id = request_id
+        future.add_done_callback(self._release_failed(request_id))
+        future.add_done_callback(self._latency_observer(kind, time.time()))
+        return future
+
+    @staticmethod
+    def _latency_observer(kind, start_time):
+        """Done callback recording the latency of successful requests."""
+        def observe(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            if future.result()[0] == 'success':
+                metrics.TRANSCRIPTION_LATENCY.labels(kind).observe(time.time() - start_time)
+        return observe
+
+    def _on_reply(self, request_id):
+        """
+        Called for every worker reply, including replies to cancelled
+        requests. Releases the shared memory slot the request used.
+        """
+        descriptor = self.shared_audio_slots.pop(request_id, None)
+        pool = descriptor and self.shared_audio_pools.get(descriptor.pool[0])
+        if pool:
+            pool.release(descriptor)
+
+    def _release_failed(self, request_id):
+        """
+        Done callback releasing the slot of a request that failed without
+        a reply, e.g. because the pipe was closed. Cancelled requests keep
+        their slot until the worker replied, it may still be reading it.
+        """
+        def release(future):
+            if not future.cancelled() and future.exception() is not None:
+                self._on_reply(request_id)
+        return release
+
+    def cancel(self, future):
+        """
+        Abandons the result of a request and asks the worker to skip it
+        if it has not started transcribing it yet.
+        """
+        if future is None or future.done():
+            return
+        future.cancel()
+        self.parent_transcription_pipe.send(('cancel', future.request_id))
+
+    def shutdown(self):
+        """Stops the transcription worker."""
+        with self.shutdown_lock:
+            if self.is_shut_down:
+                return
+            self.is_shut_down = True
+            self.shutdown_event.set()
+
+            logger.debug('Terminating transcription process')
+            self.transcript_process.join(timeout=10)
+
+            if self.transcript_process.is_alive():
+                logger.warning("Transcript process did not terminate "
+                                "in time. Terminating forcefully."
+                                )
+                self.transcript_process.terminate()
+
+            self.parent_transcription_pipe.close()
+            with self.shared_audio_lock:
+                for pool in self.shared_audio_pools.values():
+                    pool.close()
+                self.shared_audio_pools.clear()
+
+
+def _load_realtime_model(model, download_root, compute_type, gpu_device_index, device, batched):
+    """Loads and warms up the in-process realtime transcription model."""
+    try:
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+        import soundfile as sf
+
+        logger.info("Initializing faster_whisper realtime "
+                     f"transcription model {model}, "
+                     f"default device: {device}, "
+                     f"compute type: {compute_type}, "
+                     f"device index: {gpu_device_index}, "
+                     f"download root: {download_root}"
+                     )
+        realtime_model = WhisperModel(
+            model_size_or_path=model,
+            device=device,
+            compute_type=compute_type,
+            device_index=gpu_device_index,
+            download_root=download_root,
+        )
+        if batched:
+            realtime_model = BatchedInferencePipeline(model=realtime_model)
+
+        # Run a warm-up transcription
+        current_dir = os.path.dirname(os.path.realpath(__file__))
+        warmup_audio_path = os.path.join(
+            current_dir, "warmup_audio.wav"
+        )
+        warmup_audio_data, _ = sf.read(warmup_audio_path, dtype="float32")
+        segments, info = realtime_model.transcribe(warmup_audio_data, language="en", beam_size=1)
+        model_warmup_transcription = " ".join(segment.text for segment in segments)
+    except Exception as e:
+        logger.exception("Error initializing faster_whisper "
+                          f"realtime transcription model: {e}"
+                          )
+        raise
+
+    logger.debug("Faster_whisper realtime speech to text "
+                  "transcription model initialized successfully")
+    return realtime_model
+
+
+def _resolve_device(device):
+    """Returns "cuda" if requested and available, "cpu" otherwise."""
+    if device != "cuda":
+        return "cpu"
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _hashable(value):
+    """Turns lists (device indices, token ids) into tuples for pool keys."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class TranscriptionEngine:
+    """
+    The transcription models used by a recorder.
+
+    An engine holds handles to the main model's TranscriptionService and
+    the in-process realtime model, both taken from a ModelPool (the
+    process-wide ModelPool.default() unless another pool is given). Engines
+    asking for the same model configuration share the loaded models even
+    if their decoding options (beam_size, initial_prompt, batch_size, ...)
+    differ, because the options are sent along with every request.
+
+    Every AudioToTextRecorder creates an engine by default. Several
+    recorders can also share one engine by passing it as
+    transcription_engine.
+    """
+    def __init__(self,
+                 model: str = INIT_MODEL_TRANSCRIPTION,
+                 download_root: str = None,
+                 compute_type: str = "default",
+                 gpu_device_index: Union[int, List[int]] = 0,
+                 device: str = "cuda",
+                 beam_size: int = 5,
+                 initial_prompt: Optional[Union[str, Iterable[int]]] = None,
+                 suppress_tokens: Optional[List[int]] = [-1],
+                 batch_size: int = 16,
+                 faster_whisper_vad_filter: bool = True,
+                 normalize_audio: bool = False,
+                 realtime_model_type: Optional[str] = None,
+                 realtime_batch_size: int = 16,
+                 use_shared_memory_transport: bool = True,
+                 shared_memory_max_seconds: float = INIT_SHARED_MEMORY_MAX_SECONDS,
+                 transcription_batch_window_ms: int = INIT_TRANSCRIPTION_BATCH_WINDOW_MS,
+                 transcription_max_batch_requests: int = INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS,
+                 model_pool: Optional[ModelPool] = None,
+                 ):
+        """
+        Acquires the models from the pool, loading them if needed.
+
+        The parameters have the same meaning as the corresponding
+        AudioToTextRecorder parameters. realtime_model_type=None loads no
+        realtime model.
+        """
+        self.main_model_type = model
+        self.realtime_model_type = realtime_model_type
+        self.is_shut_down = False
+        self.shutdown_lock = threading.Lock()
+        self.model_pool = model_pool or ModelPool.default()
+        self.options = TranscriptionOptions(
+            beam_size,
+            _hashable(initial_prompt),
+            _hashable(suppress_tokens),
+            batch_size,
+            faster_whisper_vad_filter,
+            normalize_audio,
+        )
+
+        # Set device for model
+        self.device = _resolve_device(device)
+
+        service_key = ("transcription", model, download_root, compute_type,
+                       _hashable(gpu_device_index), self.device,
+                       use_shared_memory_transport, shared_memory_max_seconds,
+                       transcription_batch_window_ms, transcription_max_batch_requests)
+        self.service_handle = self.model_pool.acquire(
+            service_key,
+            lambda: TranscriptionService(
+                model=model,
+                download_root=download_root,
+                compute_type=compute_type,
+                gpu_device_index=gpu_device_index,
+                device=self.device,
+                default_options=self.options,
+                use_shared_memory_transport=use_shared_memory_transport,
+                shared_memory_max_seconds=shared_memory_max_seconds,
+                transcription_batch_window_ms=transcription_batch_window_ms,
+                transcription_max_batch_requests=transcription_max_batch_requests,
+            ),
+            close=lambda service: service.shutdown(),
+            pid=lambda service: service.pid,
+        )
+        self.service = self.service_handle.resource
+        self.service.add_engine()
+        self.ready_event = self.service.ready_event
+
+        # Initialize the realtime transcription model
+        self.realtime_model = None
+        self.realtime_model_handle = None
+        self.realtime_model_args = (download_root, compute_type, gpu_device_index, realtime_batch_size > 0)
+        # Smaller realtime models loaded for the adaptive QoS: type => handle
+        self.fallback_realtime_models = {}
+        self.fallback_lock = threading.Lock()
+        if realtime_model_type:
+            try:
+                self.realtime_model_handle = self._acquire_realtime_model(realtime_model_type)
+            except Exception:
+                self.service.remove_engine()
+                self.service_handle.release()
+                raise
+            self.realtime_model = self.realtime_model_handle.resource
+
+    def _acquire_realtime_model(self, model_type):
+        download_root, compute_type, gpu_device_index, batched = self.realtime_model_args
+        realtime_key = ("realtime", model_type, download_root, compute_type,
+                        _hashable(gpu_device_index), self.device, batched)
+        return self.model_pool.acquire(
+            realtime_key,
+            lambda: _load_realtime_model(
+                model_type, download_root, compute_type,
+                gpu_device_index, self.device, batched),
+        )
+
+    def fallback_realtime_model(self, model_type):
+        """
+        The in-process realtime model model_type, loaded from the pool on
+        first use and kept until the engine shuts down. The adaptive QoS
+        of the recorders switches to it under load.
+        """
+        with self.fallback_lock:
+            handle = self.fallback_realtime_models.get(model_type)
+            if handle is None:
+                handle = self._acquire_realtime_model(model_type)
+                self.fallback_realtime_models[model_type] = handle
+            return handle.resource
+
+    @property
+    def worker_stats(self):
+        """Scheduler statistics of the (possibly shared) worker."""
+        return self.service.worker_stats
+
+    def request(self, audio, language, use_prompt, kind, utterance_id=0, options=None):
+        """
+        Sends a transcription request of the given kind ('final', 'early',
+        'realtime' or 'offline') with this engine's decoding options (or
+        the given TranscriptionOptions) and returns a future that receives
+        the (status, result) reply.
+        """
+        return self.service.request(
+            audio, language, use_prompt, kind, utterance_id, options or self.options)
+
+    def cancel(self, future):
+        """
+        Abandons the result of a request and asks the worker to skip it
+        if it has not started transcribing it yet.
+        """
+        self.service.cancel(future)
+
+    def memory_report(self):
+        """Memory use of the models in this engine's pool."""
+        return self.model_pool.memory_report()
+
+    def shutdown(self):
+        """
+        Releases the models. The pool unloads them once no other engine
+        uses them (and they are not kept as idle models).
+        """
+        with self.shutdown_lock:
+            if self.is_shut_down:
+                return
+            self.is_shut_down = True
+            self.realtime_model = None
+            if self.realtime_model_handle:
+                self.realtime_model_handle.release()
+            with self.fallback_lock:
+                for handle in self.fallback_realtime_models.values():
+                    handle.release()
+                self.fallback_realtime_models.clear()
+            self.service.remove_engine()
+            self.service_handle.release()
+            gc.collect()
+
+
 class bcolors:
     OKGREEN = '\033[92m'  # Green for active speech detection
     WARNING = '\033[93m'  # Yellow for silence detection
     ENDC = '\033[0m'      # Reset to default color
 
 
+class RealtimeWindow:
+    """
+    Bookkeeping for sliding-window realtime transcription.
+
+    Segments that came out identical in two consecutive realtime passes
+    are committed: their text is kept and the audio behind them is no
+    longer decoded. Every pass only transcribes the uncommitted tail of
+    the recording, using the committed text as prompt. If the tail grows
+    beyond max_window_seconds without anything stabilizing, all but the
+    last segment get committed anyway so the decode cost stays bounded.
+    """
+    def __init__(self, sample_rate, max_window_seconds=INIT_REALTIME_MAX_WINDOW_SECONDS,
+                 prompt_max_chars=REALTIME_WINDOW_PROMPT_CHARS):
+        self.sample_rate = sample_rate
+        self.max_window_samples = int(max_window_seconds * sample_rate)
+        self.prompt_max_chars = prompt_max_chars
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        """Starts over for a new recording."""
+        self.generation += 1
+        self.committed_samples = 0
+        self.committed_text = ""
+        self.previous_texts = []
+
+    def prompt(self, initial_prompt=None):
+        """
+        Returns the prompt for decoding the current window: the tail of
+        the committed text, appended to initial_prompt if that is a string.
+        """
+        tail = self.committed_text[-self.prompt_max_chars:]
+        if len(tail) < len(self.committed_text) and " " in tail:
+            tail = tail.split(" ", 1)[1]
+        if initial_prompt is None or isinstance(initial_prompt, str):
+            prompt = f"{initial_prompt or ''} {tail}".strip()
+            return prompt or None
+        return initial_prompt
+
+    def update(self, segments, window_samples, generation=None):
+        """
+        Takes the segments decoded from the current window and returns the
+        full realtime text of the recording.
+
+        Args:
+            segments (list): (start, end, text) tuples with timestamps in
+              seconds relative to the start of the window.
+            window_samples (int): Number of samples that were decoded.
+            generation (int, optional): Value of self.generation when the
+              window was taken. Stale results from an earlier recording
+              are not committed.
+        """
+        texts = [text.strip() for _, _, text in segments]
+
+        if generation is None or generation == self.generation:
+            stable = 0
+            for previous, current in zip(self.previous_texts, texts[:-1]):
+                if previous != current:
+                    break
+                stable += 1
+
+            if not stable and window_samples > self.max_window_samples:
+                if len(segments) > 1:
+                    stable = len(segments) - 1
+                elif segments:
+                    stable = 1
+                else:
+                    # Nothing but silence in the window, skip its head
+                    self.committed_samples += window_samples - self.max_window_samples
+
+            if stable:
+                end = int(segments[stable - 1][1] * self.sample_rate)
+                self.committed_samples += min(max(end, 0), window_samples)
+                self.committed_text = " ".join(
+                    t for t in [self.committed_text] + texts[:stable] if t)
+                texts = texts[stable:]
+
+            self.previous_texts = texts
+
+        return " ".join(t for t in [self.committed_text] + texts if t)
+
+
 class AudioToTextRecorder:
     """
     A class responsible for capturing audio from the microphone, detecting
@@ -277,6 +1290,10 @@ class AudioToTextRecorder:
                  on_realtime_transcription_update=None,
                  on_realtime_transcription_stabilized=None,
                  realtime_batch_size: int = 16,
+                 realtime_sliding_window: bool = False,
+                 realtime_max_window_seconds: float = (
+                     INIT_REALTIME_MAX_WINDOW_SECONDS
+                 ),
 
                  # Voice activation parameters
                  silero_sensitivity: float = INIT_SILERO_SENSITIVITY,
@@ -301,6 +1318,8 @@ class AudioToTextRecorder:
                  on_vad_detect_stop=None,
                  on_turn_detection_start=None,
                  on_turn_detection_stop=None,
+                 on_utterance_trace=None,
+                 on_qos_change=None,
 
                  # Wake word parameters
                  wakeword_backend: str = "",
@@ -328,6 +1347,7 @@ class AudioToTextRecorder:
                  initial_prompt_realtime: Optional[Union[str, Iterable[int]]] = None,
                  suppress_tokens: Optional[List[int]] = [-1],
                  print_transcription_time: bool = False,
+                 utterance_trace_file: Optional[str] = None,
                  early_transcription_on_silence: int = 0,
                  allowed_latency_limit: int = ALLOWED_LATENCY_LIMIT,
                  no_log_file: bool = False,
@@ -336,6 +1356,16 @@ class AudioToTextRecorder:
                  normalize_audio: bool = False,
                  start_callback_in_new_thread: bool = False,
                  use_loopback: bool = False,
+                 clock: Union[str, object] = "wall",
+                 adaptive_qos: bool = False,
+                 qos_realtime_pause: float = INIT_QOS_REALTIME_PAUSE,
+                 qos_fallback_model: Optional[str] = INIT_QOS_FALLBACK_MODEL,
+                 use_shared_memory_transport: bool = True,
+                 shared_memory_max_seconds: float = INIT_SHARED_MEMORY_MAX_SECONDS,
+                 transcription_batch_window_ms: int = INIT_TRANSCRIPTION_BATCH_WINDOW_MS,
+                 transcription_max_batch_requests: int = INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS,
+                 transcription_engine: Optional[TranscriptionEngine] = None,
+                 model_pool: Optional[ModelPool] = None,
                  ):
         """
         Initializes an audio recorder and  transcription
@@ -419,6 +1449,17 @@ class AudioToTextRecorder:
             slight delay compared to the regular real-time updates.
         - realtime_batch_size (int, default=16): Batch size for the real-time
             transcription model.
+        - realtime_sliding_window (bool, default=False): If set to True, the
+            real-time model only transcribes the not yet stabilized tail of
+            the recording. Text that came out identical in two consecutive
+            real-time passes is committed and fed as prompt, and the audio
+            behind it is no longer decoded. Keeps the cost of each real-time
+            update bounded for long utterances. Only applies to the separate
+            real-time model (use_main_model_for_realtime=False).
+        - realtime_max_window_seconds (float, default=15.0): Maximum length
+            in seconds of the audio window decoded per real-time update when
+            realtime_sliding_window is enabled. When the window grows beyond
+            this, all but the last detected segment get committed.
         - silero_sensitivity (float, default=SILERO_SENSITIVITY): Sensitivity
             for the Silero Voice Activity Detection model ranging from 0
             (least sensitive) to 1 (most sensitive). Default is 0.5.
@@ -467,6 +1508,17 @@ class AudioToTextRecorder:
             to be called when the system starts to listen for a turn of speech.
         - on_turn_detection_stop (callable, default=None): Callback function to
             be called when the system stops listening for a turn of speech.
+        - on_utterance_trace (callable, default=None): Callback function to
+            be called with the latency trace (a dict) of every utterance
+            once its final transcription is done, failed or was
+            interrupted. The trace holds the time.monotonic() timestamps
+            of the stages from the first speech frame to the delivery of
+            the text and the end of speech to text latency, see
+            RealtimeSTT.utterance_trace.
+        - on_qos_change (callable, default=None): Callback function to be
+            called with an event dict ("level", "previous_level",
+            "direction", "realtime_factor", "queue_fill", ...) whenever the
+            adaptive QoS changes the realtime degradation level.
         - wakeword_backend (str, default=""): Specifies the backend library to
             use for wake word detection. Supported options include 'pvporcupine'
             for using the Porcupine wake word engine or 'oww' for using the
@@ -540,6 +1592,9 @@ class AudioToTextRecorder:
             from the transcription output.
         - print_transcription_time (bool, default=False): Logs processing time
             of main model transcription 
+        - utterance_trace_file (str, default=None): Path of a file the
+            latency traces of the utterances are appended to, one JSON
+            object per line.
         - early_transcription_on_silence (int, default=0): If set, the
             system will transcribe audio faster when silence is detected.
             Transcription will start after the specified milliseconds, so 
@@ -570,6 +1625,66 @@ class AudioToTextRecorder:
             callback to run concurrently with other operations.
         - use_loopback (bool, default=False): If set to True, system audio
             (loopback) is used for input instead of microphone.
+        - clock (str or clock object, default="wall"): The clock the
+            recorder measures silence, recording lengths, wake word
+            timeouts and realtime pauses on. "wall" is time.time(). "audio"
+            advances by the duration of every processed chunk, so audio
+            fed faster than real time with feed_audio() is segmented
+            exactly like live audio (chunks beyond allowed_latency_limit
+            are not dropped then, pace the feeding). See
+            RealtimeSTT.clock.
+        - adaptive_qos (bool, default=False): If set to True, the realtime
+            transcription degrades step by step while its decodes run
+            slower than real time or the audio queue fills up: a longer
+            realtime pause, then beam size 1, then the smaller
+            qos_fallback_model, then no realtime updates at all. It
+            recovers the same way as the load drops. See RealtimeSTT.qos.
+        - qos_realtime_pause (float, default=0.5): realtime_processing_pause
+            from the "longer_pause" level on (if longer than the
+            configured one).
+        - qos_fallback_model (str, default="tiny"): Realtime model used from
+            the "smaller_model" level on, loaded on first use. The level is
+            skipped if it is None, the realtime model itself or the main
+            model is used for realtime transcription.
+        - use_shared_memory_transport (bool, default=True): If set to True,
+            audio for the main transcription model is written once into
+            shared memory and only a small descriptor is sent to the
+            transcription process, instead of pickling the whole array.
+            Only used where the transcription worker runs in its own
+            process, on Linux it is a thread and audio is passed through
+            the pipe. Slots are added for every recorder sharing the
+            transcription model, clips that find no free slot are sent
+            through the pipe.
+        - shared_memory_max_seconds (float, default=60.0): Longest clip in
+            seconds that fits into one shared memory slot. Longer clips are
+            sent through the pipe.
+        - transcription_batch_window_ms (int, default=0): If greater than 0,
+            the transcription worker waits up to this many milliseconds for
+            further requests of the same kind after receiving one and
+            transcribes all of them in one batched forward pass. Final
+            requests are not delayed, they are only batched with finals that
+            are already queued. Useful when several streams share
+            one transcription worker. Values around 10-30 ms are a good
+            trade-off between latency and throughput. On a CPU the batched
+            passes are barely faster than sequential ones and the whole
+            batch finishes at once, so the median latency goes up (see
+            tests/benchmark_batching.py).
+        - transcription_max_batch_requests (int, default=16): Maximum number
+            of requests transcribed together in one batch.
+        - transcription_engine (TranscriptionEngine, default=None): An
+            already running engine with the loaded transcription models to
+            share with other recorders. If None, the recorder creates and
+            owns its own engine. With a shared engine the model related
+            parameters (model, realtime_model_type, device, compute_type,
+            beam_size, batch_size, initial_prompt, ...) of the engine apply
+            and the engine is not shut down with the recorder.
+        - model_pool (ModelPool, default=None): The pool the recorder's own
+            engine takes its models from. Recorders of one pool asking for
+            the same model, device and compute type share the loaded
+            models. Defaults to the process-wide ModelPool.default(), which
+            unloads models once no recorder uses them anymore. Pass
+            ModelPool(max_idle_models=..., idle_timeout=...) to keep
+            unused models loaded for reuse.
         """
 
         self.language = language
@@ -602,6 +1717,8 @@ class AudioToTextRecorder:
         self.on_vad_detect_stop = on_vad_detect_stop
         self.on_turn_detection_start = on_turn_detection_start
         self.on_turn_detection_stop = on_turn_detection_stop
+        self.on_utterance_trace = on_utterance_trace
+        self.on_qos_change = on_qos_change
         self.on_wakeword_detection_start = on_wakeword_detection_start
         self.on_wakeword_detection_end = on_wakeword_detection_end
         self.on_recorded_chunk = on_recorded_chunk
@@ -628,9 +1745,12 @@ class AudioToTextRecorder:
         self.allowed_latency_limit = allowed_latency_limit
         self.batch_size = batch_size
         self.realtime_batch_size = realtime_batch_size
+        self.realtime_sliding_window = realtime_sliding_window
+        self.realtime_max_window_seconds = realtime_max_window_seconds
 
         self.level = level
         self.audio_queue = mp.Queue()
+        _live_recorders.add(self)
         self.buffer_size = buffer_size
         self.sample_rate = sample_rate
         self.recording_start_time = 0
@@ -639,10 +1759,14 @@ class AudioToTextRecorder:
         self.last_recording_stop_time = 0
         self.wake_word_detect_time = 0
         self.silero_check_time = 0
-        self.silero_working = False
+        self.silero_vad_worker = None
         self.speech_end_silence_start = 0
         self.silero_sensitivity = silero_sensitivity
         self.silero_deactivity_detection = silero_deactivity_detection
+        self.silero_use_onnx = silero_use_onnx
+        self.webrtc_sensitivity = webrtc_sensitivity
+        # Silero models of the offline segmenters, not used by the live VAD
+        self.offline_silero_vad_models = []
         self.listen_start = 0
         self.spinner = spinner
         self.halo = None
@@ -660,6 +1784,9 @@ class AudioToTextRecorder:
         self.stream = None
         self.start_recording_event = threading.Event()
         self.stop_recording_event = threading.Event()
+        # Notified whenever the recording state changes or a chunk has been
+        # processed, wait_audio() and the realtime worker block on it
+        self.state_changed = threading.Condition()
         self.backdate_stop_seconds = 0.0
         self.backdate_resume_seconds = 0.0
         self.last_transcription_bytes = None
@@ -674,8 +1801,21 @@ class AudioToTextRecorder:
         self.detected_realtime_language_probability = 0
         self.transcription_lock = threading.Lock()
         self.shutdown_lock = threading.Lock()
-        self.transcribe_count = 0
+        # The pending EarlyTranscription of the current recording, if any
+        self.early_transcription = None
+        self.early_transcription_lock = threading.Lock()
+        self.utterance_id = 0
+        self.transcription_requests = {}
         self.print_transcription_time = print_transcription_time
+        self.utterance_trace_sink = JsonlTraceSink(utterance_trace_file) if utterance_trace_file else None
+        # Trace of the current recording and of the last stopped one,
+        # which the final transcription completes
+        self.utterance_trace = None
+        self.stopped_trace = None
+        # Monotonic time of the first chunk of the current run of WebRTC
+        # speech while listening, 0 if none
+        self.speech_start_time = 0
+        self.latency_stats = LatencyStats()
         self.early_transcription_on_silence = early_transcription_on_silence
         self.use_extended_logging = use_extended_logging
         self.faster_whisper_vad_filter = faster_whisper_vad_filter
@@ -683,6 +1823,8 @@ class AudioToTextRecorder:
         self.awaiting_speech_end = False
         self.start_callback_in_new_thread = start_callback_in_new_thread
         self.use_loopback = use_loopback
+        self.clock = create_clock(clock, self.sample_rate)
+        self.transcription_requests_lock = threading.Lock()
 
         # ----------------------------------------------------------------------------
         # Named logger configuration
@@ -727,35 +1869,42 @@ class AudioToTextRecorder:
 
         self.interrupt_stop_event = mp.Event()
         self.was_interrupted = mp.Event()
-        self.main_transcription_ready_event = mp.Event()
-
-        self.parent_transcription_pipe, child_transcription_pipe = SafePipe()
-        self.parent_stdout_pipe, child_stdout_pipe = SafePipe()
 
         # Set device for model
-        self.device = "cuda" if self.device == "cuda" and torch.cuda.is_available() else "cpu"
+        self.device = _resolve_device(self.device)
 
-        self.transcript_process = self._start_thread(
-            target=AudioToTextRecorder._transcription_worker,
-            args=(
-                child_transcription_pipe,
-                child_stdout_pipe,
-                self.main_model_type,
-                self.download_root,
-                self.compute_type,
-                self.gpu_device_index,
-                self.device,
-                self.main_transcription_ready_event,
-                self.shutdown_event,
-                self.interrupt_stop_event,
-                self.beam_size,
-                self.initial_prompt,
-                self.suppress_tokens,
-                self.batch_size,
-                self.faster_whisper_vad_filter,
-                self.normalize_audio,
+        self.owns_transcription_engine = transcription_engine is None
+        if transcription_engine is None:
+            transcription_engine = TranscriptionEngine(
+                model=self.main_model_type,
+                download_root=self.download_root,
+                compute_type=self.compute_type,
+                gpu_device_index=self.gpu_device_index,
+                device=self.device,
+                beam_size=self.beam_size,
+                initial_prompt=self.initial_prompt,
+                suppress_tokens=self.suppress_tokens,
+                batch_size=self.batch_size,
+                faster_whisper_vad_filter=self.faster_whisper_vad_filter,
+                normalize_audio=self.normalize_audio,
+                realtime_model_type=(
+                    self.realtime_model_type
+                    if self.enable_realtime_transcription and not self.use_main_model_for_realtime
+                    else None),
+                realtime_batch_size=self.realtime_batch_size,
+                use_shared_memory_transport=use_shared_memory_transport,
+                shared_memory_max_seconds=shared_memory_max_seconds,
+                transcription_batch_window_ms=transcription_batch_window_ms,
+                transcription_max_batch_requests=transcription_max_batch_requests,
+                model_pool=model_pool,
             )
-        )
+        elif (self.enable_realtime_transcription and not self.use_main_model_for_realtime
+                and transcription_engine.realtime_model is None):
+            logger.warning("Shared transcription engine has no realtime model, "
+                           "using the main model for realtime transcription")
+            self.use_main_model_for_realtime = True
+        self.transcription_engine = transcription_engine
+        self.main_transcription_ready_event = transcription_engine.ready_event
 
         # Start audio data reading process
         if self.use_microphone.value:
@@ -778,42 +1927,29 @@ class AudioToTextRecorder:
                 )
             )
 
-        # Initialize the realtime transcription model
+        # The realtime transcription model is loaded by the engine
         if self.enable_realtime_transcription and not self.use_main_model_for_realtime:
-            try:
-                logger.info("Initializing faster_whisper realtime "
-                             f"transcription model {self.realtime_model_type}, "
-                             f"default device: {self.device}, "
-                             f"compute type: {self.compute_type}, "
-                             f"device index: {self.gpu_device_index}, "
-                             f"download root: {self.download_root}"
-                             )
-                self.realtime_model_type = faster_whisper.WhisperModel(
-                    model_size_or_path=self.realtime_model_type,
-                    device=self.device,
-                    compute_type=self.compute_type,
-                    device_index=self.gpu_device_index,
-                    download_root=self.download_root,
-                )
-                if self.realtime_batch_size > 0:
-                    self.realtime_model_type = BatchedInferencePipeline(model=self.realtime_model_type)
-
-                # Run a warm-up transcription
-                current_dir = os.path.dirname(os.path.realpath(__file__))
-                warmup_audio_path = os.path.join(
-                    current_dir, "warmup_audio.wav"
-                )
-                warmup_audio_data, _ = sf.read(warmup_audio_path, dtype="float32")
-                segments, info = self.realtime_model_type.transcribe(warmup_audio_data, language="en", beam_size=1)
-                model_warmup_transcription = " ".join(segment.text for segment in segments)
-            except Exception as e:
-                logger.exception("Error initializing faster_whisper "
-                                  f"realtime transcription model: {e}"
-                                  )
-                raise
-
-            logger.debug("Faster_whisper realtime speech to text "
-                          "transcription model initialized successfully")
+            self.realtime_model_type = transcription_engine.realtime_model
+
+        # Adaptive quality of service of the realtime transcription
+        self.qos = None
+        self.qos_realtime_pause = qos_realtime_pause
+        self.qos_fallback_model = qos_fallback_model
+        if adaptive_qos and self.enable_realtime_transcription:
+            if self.use_main_model_for_realtime:
+                realtime_beam_size = transcription_engine.options.beam_size
+            else:
+                realtime_beam_size = self.beam_size_realtime
+            skipped = set()
+            if realtime_beam_size <= 1:
+                skipped.add("beam_1")
+            if (self.use_main_model_for_realtime or not qos_fallback_model
+                    or qos_fallback_model == transcription_engine.realtime_model_type):
+                skipped.add("smaller_model")
+            self.qos = QoSController(
+                levels=[level for level in QOS_LEVELS if level not in skipped],
+                on_change=self._on_qos_change,
+            )
 
         # Setup wake word detection
         if wake_words or wakeword_backend in {'oww', 'openwakeword', 'openwakewords', 'pvp', 'pvporcupine'}:
@@ -831,6 +1967,7 @@ class AudioToTextRecorder:
             if wake_words and self.wakeword_backend in {'pvp', 'pvporcupine'}:
 
                 try:
+                    import pvporcupine
                     self.porcupine = pvporcupine.create(
                         keywords=self.wake_words_list,
                         sensitivities=self.wake_words_sensitivities
@@ -851,7 +1988,9 @@ class AudioToTextRecorder:
                 )
 
             elif wake_words and self.wakeword_backend in {'oww', 'openwakeword', 'openwakewords'}:
-                    
+
+                import openwakeword
+                from openwakeword.model import Model
                 openwakeword.utils.download_models()
 
                 try:
@@ -916,6 +2055,7 @@ class AudioToTextRecorder:
 
         # Setup voice activity detection model Silero VAD
         try:
+            import torch
             self.silero_vad_model, _ = torch.hub.load(
                 repo_or_dir="snakers4/silero-vad",
                 model="silero_vad",
@@ -933,6 +2073,14 @@ class AudioToTextRecorder:
                       "engine initialized successfully"
                       )
 
+        # Silero inference runs on its own thread, the recording worker
+        # only submits chunks and reads the published probabilities
+        self.silero_vad_worker = SileroVADWorker(
+            self.silero_vad_model,
+            self.sample_rate,
+            on_probability=self._on_silero_probability,
+        )
+
         self.audio_buffer = collections.deque(
             maxlen=int((self.sample_rate // self.buffer_size) *
                        self.pre_recording_buffer_duration)
@@ -943,6 +2091,14 @@ class AudioToTextRecorder:
         )
         self.frames = []
         self.last_frames = []
+        self.feed_resampler = None
+        self.feed_chunker = None
+
+        # Float32 copy of self.frames, converted once per chunk, so readers
+        # can take zero-copy views of the current recording
+        self.audio_arena = AudioArena()
+        self.realtime_window = RealtimeWindow(
+            self.sample_rate, self.realtime_max_window_seconds)
 
         # Recording control flags
         self.is_recording = False
@@ -960,15 +2116,6 @@ class AudioToTextRecorder:
         self.realtime_thread.daemon = True
         self.realtime_thread.start()
                    
-        # Wait for transcription models to start
-        logger.debug('Waiting for main transcription model to start')
-        self.main_transcription_ready_event.wait()
-        logger.debug('Main transcription model ready')
-
-        self.stdout_thread = threading.Thread(target=self._read_stdout)
-        self.stdout_thread.daemon = True
-        self.stdout_thread.start()
-
         logger.debug('RealtimeSTT initialization completed successfully')
                    
     def _start_thread(self, target=None, args=()):
@@ -984,38 +2131,12 @@ class AudioToTextRecorder:
             args (tuple): is a list or tuple of arguments for the target
               invocation. Defaults to ().
         """
-        if (platform.system() == 'Linux'):
-            thread = threading.Thread(target=target, args=args)
-            thread.deamon = True
-            thread.start()
-            return thread
-        else:
-            thread = mp.Process(target=target, args=args)
-            thread.start()
-            return thread
-
-    def _read_stdout(self):
-        while not self.shutdown_event.is_set():
-            try:
-                if self.parent_stdout_pipe.poll(0.1):
-                    logger.debug("Receive from stdout pipe")
-                    message = self.parent_stdout_pipe.recv()
-                    logger.info(message)
-            except (BrokenPipeError, EOFError, OSError):
-                # The pipe probably has been closed, so we ignore the error
-                pass
-            except KeyboardInterrupt:  # handle manual interruption (Ctrl+C)
-                logger.info("KeyboardInterrupt in read from stdout detected, exiting...")
-                break
-            except Exception as e:
-                logger.error(f"Unexpected error in read from stdout: {e}", exc_info=True)
-                logger.error(traceback.format_exc())  # Log the full traceback here
-                break 
-            time.sleep(0.1)
+        return _start_worker(target, args)
 
-    def _transcription_worker(*args, **kwargs):
-        worker = TranscriptionWorker(*args, **kwargs)
-        worker.run()
+    @property
+    def transcription_worker_stats(self):
+        """Latest queue statistics reported by the transcription worker."""
+        return self.transcription_engine.worker_stats
 
     def _run_callback(self, cb, *args, **kwargs):
         if self.start_callback_in_new_thread:
@@ -1208,32 +2329,27 @@ class AudioToTextRecorder:
                     time.sleep(3)  # Wait before retrying
                     continue
 
+        # Keeps its filter history across chunks, recreated if the device
+        # comes back with another sample rate
+        resampler = None
+
         def preprocess_audio(chunk, original_sample_rate, target_sample_rate):
             """Preprocess audio chunk similar to feed_audio method."""
+            nonlocal resampler
             if isinstance(chunk, np.ndarray):
                 # Handle stereo to mono conversion if necessary
                 if chunk.ndim == 2:
                     chunk = np.mean(chunk, axis=1)
-
-                # Resample to target_sample_rate if necessary
-                if original_sample_rate != target_sample_rate:
-                    logger.debug(f"Resampling from {original_sample_rate} Hz to {target_sample_rate} Hz.")
-                    num_samples = int(len(chunk) * target_sample_rate / original_sample_rate)
-                    chunk = signal.resample(chunk, num_samples)
-
-                chunk = chunk.astype(np.int16)
             else:
                 # If chunk is bytes, convert to numpy array
                 chunk = np.frombuffer(chunk, dtype=np.int16)
 
-                # Resample if necessary
-                if original_sample_rate != target_sample_rate:
-                    logger.debug(f"Resampling from {original_sample_rate} Hz to {target_sample_rate} Hz.")
-                    num_samples = int(len(chunk) * target_sample_rate / original_sample_rate)
-                    chunk = signal.resample(chunk, num_samples)
-                    chunk = chunk.astype(np.int16)
+            # Resample to target_sample_rate if necessary
+            if original_sample_rate != target_sample_rate:
+                resampler = ensure_resampler(resampler, original_sample_rate, target_sample_rate)
+                chunk = resampler.process(chunk)
 
-            return chunk.tobytes()
+            return chunk.astype(np.int16, copy=False).tobytes()
 
         audio_interface = None
         stream = None
@@ -1318,8 +2434,8 @@ class AudioToTextRecorder:
         if not setup_audio():
             raise Exception("Failed to set up audio recording.")
 
-        buffer = bytearray()
         silero_buffer_size = 2 * buffer_size  # Silero complains if too short
+        chunker = AudioChunker(silero_buffer_size)
 
         time_since_last_buffer_message = 0
 
@@ -1330,13 +2446,11 @@ class AudioToTextRecorder:
 
                     if use_microphone.value:
                         processed_data = preprocess_audio(data, device_sample_rate, target_sample_rate)
-                        buffer += processed_data
 
-                        # Check if the buffer has reached or exceeded the silero_buffer_size
-                        while len(buffer) >= silero_buffer_size:
-                            # Extract silero_buffer_size amount of data from the buffer
-                            to_process = buffer[:silero_buffer_size]
-                            buffer = buffer[silero_buffer_size:]
+                        # Cut the audio into chunks of silero_buffer_size
+                        for frame in chunker.feed(processed_data):
+                            # Frames are views, the queue needs its own copy
+                            to_process = bytes(frame)
 
                             # Feed the extracted data to the audio_queue
                             if time_since_last_buffer_message:
@@ -1399,8 +2513,8 @@ class AudioToTextRecorder:
             logger.debug("Audio data worker process finished due to KeyboardInterrupt")
         finally:
             # After recording stops, feed any remaining audio data
-            if buffer:
-                audio_queue.put(bytes(buffer))
+            if len(chunker):
+                audio_queue.put(chunker.drain())
 
             try:
                 if stream:
@@ -1415,19 +2529,36 @@ class AudioToTextRecorder:
         """
         If in wake work modus, wake up as if a wake word was spoken.
         """
-        self.listen_start = time.time()
+        self.listen_start = self.clock.time()
+
+    def abort(self, timeout=None):
+        """
+        Interrupts a running text() call and waits until it returned.
 
-    def abort(self):
+        Args:
+            timeout (float, optional): Longest wait in seconds for text()
+              to return. Without one abort() blocks forever if no text()
+              call is running, e.g. on teardown, when the thread calling
+              text() may be between two calls.
+
+        Returns:
+            bool: False if the wait timed out.
+        """
         state = self.state
         self.start_recording_on_voice_activity = False
         self.stop_recording_on_voice_deactivity = False
         self.interrupt_stop_event.set()
+        self._notify_state_change()
+        self._cancel_transcription_requests()
+        interrupted = True
         if self.state != "inactive": # if inactive, was_interrupted will never be set
-            self.was_interrupted.wait()
-            self._set_state("transcribing")
+            interrupted = self.was_interrupted.wait(timeout)
+            if interrupted:
+                self._set_state("transcribing")
         self.was_interrupted.clear()
         if self.is_recording: # if recording, make sure to stop the recorder
             self.stop()
+        return interrupted
 
 
     def wait_audio(self):
@@ -1448,7 +2579,7 @@ class AudioToTextRecorder:
         try:
             logger.info("Setting listen time")
             if self.listen_start == 0:
-                self.listen_start = time.time()
+                self.listen_start = self.clock.time()
 
             # If not yet started recording, wait for voice activity to initiate.
             if not self.is_recording and not self.frames:
@@ -1457,9 +2588,9 @@ class AudioToTextRecorder:
 
                 # Wait until recording starts
                 logger.debug('Waiting for recording start')
-                while not self.interrupt_stop_event.is_set():
-                    if self.start_recording_event.wait(timeout=0.02):
-                        break
+                self._wait_for_state(
+                    lambda: self.start_recording_event.is_set()
+                    or self.interrupt_stop_event.is_set())
 
             # If recording is ongoing, wait for voice inactivity
             # to finish recording.
@@ -1468,20 +2599,19 @@ class AudioToTextRecorder:
 
                 # Wait until recording stops
                 logger.debug('Waiting for recording stop')
-                while not self.interrupt_stop_event.is_set():
-                    if (self.stop_recording_event.wait(timeout=0.02)):
-                        break
-
-            frames = self.frames
-            if len(frames) == 0:
-                frames = self.last_frames
+                self._wait_for_state(
+                    lambda: self.stop_recording_event.is_set()
+                    or self.interrupt_stop_event.is_set())
 
             # Calculate samples needed for backdating resume
             samples_to_keep = int(self.sample_rate * self.backdate_resume_seconds)
 
-            # First convert all current frames to audio array
-            full_audio_array = np.frombuffer(b''.join(frames), dtype=np.int16)
-            full_audio = full_audio_array.astype(np.float32) / INT16_MAX_ABS_VALUE
+            # Take over the already converted audio of the recording
+            if len(self.frames) > 0:
+                full_audio = self.audio_arena.detach()
+            else:
+                full_audio_array = np.frombuffer(b''.join(self.last_frames), dtype=np.int16)
+                full_audio = full_audio_array.astype(np.float32) / INT16_MAX_ABS_VALUE
 
             # Calculate how many samples we need to keep for backdating resume
             if samples_to_keep > 0:
@@ -1521,6 +2651,8 @@ class AudioToTextRecorder:
             self.frames.clear()
             self.last_frames.clear()
             self.frames.extend(frames_to_read)
+            self.audio_arena.clear()
+            self.audio_arena.extend(frames_to_read)
 
             # Reset backdating parameters
             self.backdate_stop_seconds = 0.0
@@ -1536,9 +2668,76 @@ class AudioToTextRecorder:
             raise  # Re-raise the exception after cleanup
 
 
+    def _send_transcription_request(self, audio, use_prompt, kind, options=None):
+        """
+        Sends a transcription request of the given kind ('final', 'early',
+        'realtime' or 'offline') to the transcription engine and returns a future that
+        receives the (status, result) reply. options overrides the
+        engine's TranscriptionOptions.
+        """
+        future = self.transcription_engine.request(
+            audio, self.language, use_prompt, kind, self.utterance_id, options)
+        with self.transcription_requests_lock:
+            self.transcription_requests[future.request_id] = future
+        future.add_done_callback(self._forget_transcription_request)
+        return future
+
+    def _forget_transcription_request(self, future):
+        with self.transcription_requests_lock:
+            self.transcription_requests.pop(future.request_id, None)
+
+    def _cancel_transcription_request(self, future):
+        """
+        Abandons the result of a request and asks the worker to skip it
+        if it has not started transcribing it yet.
+        """
+        self.transcription_engine.cancel(future)
+
+    def _cancel_transcription_requests(self):
+        """Cancels all transcription requests that are still in flight."""
+        with self.transcription_requests_lock:
+            futures = list(self.transcription_requests.values())
+        for future in futures:
+            self._cancel_transcription_request(future)
+
+    def _cancel_early_transcription(self):
+        """
+        Cancels the pending early transcription. Returns whether there
+        was one.
+        """
+        with self.early_transcription_lock:
+            early, self.early_transcription = self.early_transcription, None
+        if early is None:
+            return False
+        self._cancel_transcription_request(early.future)
+        return True
+
+    def _take_early_transcription(self, audio):
+        """
+        Returns the future of the early transcription if its text is the
+        text of audio: audio starts with exactly the transcribed span and
+        anything behind it is non-speech (the recording worker cancels the
+        early transcription as soon as its VAD detects speech again).
+        Cancels a stale early transcription and returns None.
+        """
+        with self.early_transcription_lock:
+            early, self.early_transcription = self.early_transcription, None
+        if early is None or early.future.cancelled():
+            return None
+        if (len(audio) >= early.samples
+                and _audio_fingerprint(audio[:early.samples]) == early.fingerprint):
+            logger.debug(f"Reusing early transcription request {early.future.request_id}, "
+                         f"{(len(audio) - early.samples) / SAMPLE_RATE:.2f} s of trailing silence")
+            metrics.EARLY_TRANSCRIPTIONS.labels("reused").inc()
+            return early.future
+        metrics.EARLY_TRANSCRIPTIONS.labels("stale").inc()
+        self._cancel_transcription_request(early.future)
+        return None
+
     def perform_final_transcription(self, audio_bytes=None, use_prompt=True):
         start_time = 0
         with self.transcription_lock:
+            trace, self.stopped_trace = self.stopped_trace, None
             if audio_bytes is None:
                 audio_bytes = copy.deepcopy(self.audio)
 
@@ -1548,27 +2747,33 @@ class AudioToTextRecorder:
                 return ""
 
             try:
-                if self.transcribe_count == 0:
-                    logger.debug("Adding transcription request, no early transcription started")
+                future = self._take_early_transcription(audio_bytes)
+                if future is None:
+                    logger.debug("Adding transcription request, no usable early transcription")
                     start_time = time.time()  # Start timing
-                    self.parent_transcription_pipe.send((audio_bytes, self.language, use_prompt))
-                    self.transcribe_count += 1
-
-                while self.transcribe_count > 0:
-                    logger.debug(F"Receive from parent_transcription_pipe after sendiung transcription request, transcribe_count: {self.transcribe_count}")
-                    if not self.parent_transcription_pipe.poll(0.1): # check if transcription done
-                        if self.interrupt_stop_event.is_set(): # check if interrupted
+                    future = self._send_transcription_request(audio_bytes, use_prompt, "final")
+                    if trace:
+                        trace.mark("final_request")
+
+                while True:
+                    logger.debug(f"Waiting for transcription request {future.request_id}")
+                    # Wakes up as soon as the result arrives or abort() cancels
+                    # the request, the timeout only covers interrupts raised elsewhere
+                    try:
+                        status, result = future.result(timeout=TRANSCRIPTION_RESULT_POLL_TIMEOUT)
+                        break
+                    except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError):
+                        if future.cancelled() or self.interrupt_stop_event.is_set(): # check if interrupted
+                            self._cancel_transcription_request(future)
                             self.was_interrupted.set()
                             self._set_state("inactive")
+                            self._finish_trace(trace, "interrupted")
                             return "" # return empty string if interrupted
-                        continue
-                    status, result = self.parent_transcription_pipe.recv()
-                    self.transcribe_count -= 1
 
                 self.allowed_to_early_transcribe = True
                 self._set_state("inactive")
                 if status == 'success':
-                    segments, info = result
+                    segments, info, (decode_start, decode_end) = result
                     self.detected_language = info.language if info.language_probability > 0 else None
                     self.detected_language_probability = info.language_probability
                     self.last_transcription_bytes = copy.deepcopy(audio_bytes)
@@ -1582,14 +2787,216 @@ class AudioToTextRecorder:
                             print(f"Model {self.main_model_type} completed transcription in {transcription_time:.2f} seconds")
                         else:
                             logger.debug(f"Model {self.main_model_type} completed transcription in {transcription_time:.2f} seconds")
-                    return "" if self.interrupt_stop_event.is_set() else transcription # if interrupted return empty string
+                    if self.interrupt_stop_event.is_set():
+                        self._finish_trace(trace, "interrupted")
+                        return "" # if interrupted return empty string
+                    if trace:
+                        trace.mark("decode_start", decode_start)
+                        trace.mark("decode_end", decode_end)
+                        trace.mark("result")
+                    self._finish_trace(trace, "success")
+                    return transcription
                 else:
                     logger.error(f"Transcription error: {result}")
                     raise Exception(result)
             except Exception as e:
                 logger.error(f"Error during transcription: {str(e)}", exc_info=True)
+                self._finish_trace(trace, "error")
                 raise e
 
+    def _mark_trace(self, stage, timestamp=None):
+        """Stamps a stage of the current recording's trace."""
+        trace = self.utterance_trace
+        if trace:
+            trace.mark(stage, timestamp)
+
+    def _finish_trace(self, trace, status):
+        """Records the latency of a finished trace and emits it."""
+        if trace is None or trace.status is not None:
+            return
+        trace.status = status
+        latency = trace.latency()
+        if status == "success" and latency is not None:
+            self.latency_stats.add(latency)
+            metrics.END_OF_SPEECH_LATENCY.observe(latency)
+        if not self.on_utterance_trace and not self.utterance_trace_sink:
+            return
+        record = trace.to_dict()
+        if self.utterance_trace_sink:
+            try:
+                self.utterance_trace_sink.write(record)
+            except OSError as e:
+                logger.error(f"Error writing utterance trace: {e}")
+        if self.on_utterance_trace:
+            self._run_callback(self.on_utterance_trace, record)
+
+    def _realtime_pause(self):
+        """realtime_processing_pause at the current QoS level."""
+        if self.qos and self.qos.at_least("longer_pause"):
+            return max(self.realtime_processing_pause, self.qos_realtime_pause)
+        return self.realtime_processing_pause
+
+    def _realtime_decoder(self):
+        """The realtime model and beam size at the current QoS level."""
+        model, beam_size = self.realtime_model_type, self.beam_size_realtime
+        if self.qos:
+            if self.qos.at_least("beam_1"):
+                beam_size = 1
+            if self.qos.at_least("smaller_model") and self.qos_fallback_model:
+                try:
+                    model = self.transcription_engine.fallback_realtime_model(self.qos_fallback_model)
+                except Exception as e:
+                    logger.error(f"Error loading the QoS fallback realtime model "
+                                 f"{self.qos_fallback_model}: {e}", exc_info=True)
+                    self.qos_fallback_model = None
+        return model, beam_size
+
+    def _observe_realtime_decode(self, seconds, samples):
+        if self.qos:
+            self.qos.observe_decode(seconds, samples / SAMPLE_RATE)
+            self.qos.update(_queue_depth(self) / self.allowed_latency_limit)
+
+    def _on_qos_change(self, event):
+        factor = event["realtime_factor"]
+        message = (f"Realtime QoS {event['direction']}: {event['previous_level']} -> {event['level']} "
+                   f"(real-time factor {'n/a' if factor is None else f'{factor:.2f}'}, "
+                   f"queue fill {event['queue_fill']:.2f})")
+        if event["direction"] == "degrade":
+            logger.warning(message)
+        else:
+            logger.info(message)
+        metrics.QOS_CHANGES.labels(event["direction"], event["level"]).inc()
+        if self.on_qos_change:
+            self._run_callback(self.on_qos_change, event)
+
+    def latency_percentiles(self, points=(50, 90, 99)):
+        """
+        Percentiles of the end of speech to final text latency of the
+        latest utterances in seconds, e.g.
+        {"count": 42, "window": 42, "p50": 0.71, "p90": 0.93, "p99": 1.2}.
+        """
+        return self.latency_stats.percentiles(points)
+
+
+    def transcribe_file(self, path, batch_requests=INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS):
+        """
+        Transcribes an audio file (any format soundfile reads) faster than
+        real time, see transcribe_stream().
+
+        Returns:
+            generator of OfflineTranscription: (start, end, text, language,
+            language_probability) of every utterance in order, start and
+            end in seconds of the file.
+        """
+        import soundfile as sf
+
+        sample_rate = sf.info(path).samplerate
+        blocks = sf.blocks(path, blocksize=sample_rate * OFFLINE_FILE_BLOCK_SECONDS,
+                           dtype="int16", always_2d=True)
+        return self.transcribe_stream(
+            (block[:, 0] if block.shape[1] == 1 else block.mean(axis=1).astype(np.int16)
+             for block in blocks),
+            sample_rate, batch_requests)
+
+    def transcribe_stream(self, chunks, sample_rate=SAMPLE_RATE,
+                          batch_requests=INIT_TRANSCRIPTION_MAX_BATCH_REQUESTS):
+        """
+        Transcribes recorded audio faster than real time.
+
+        The audio is cut into utterances with the recorder's voice activity
+        settings (silero_sensitivity, webrtc_sensitivity,
+        post_speech_silence_duration, min_length_of_recording, ...), timed
+        on the audio instead of the wall clock (see RealtimeSTT.offline).
+        The utterances are transcribed by the main model as 'offline'
+        requests, which the worker batches and serves after the requests
+        of live recorders. Up to 2 * batch_requests utterances are in
+        flight at a time.
+
+        Does not touch the recorder's live recording state, the recorder
+        can keep listening meanwhile.
+
+        Args:
+            chunks (iterable): 16 bit mono audio as bytes or numpy arrays
+              (int16 values, stereo arrays are downmixed), like feed_audio().
+            sample_rate (int): Sample rate of the chunks.
+            batch_requests (int): Utterances the worker should transcribe
+              together.
+
+        Returns:
+            generator of OfflineTranscription: (start, end, text, language,
+            language_probability) of every utterance in order, start and
+            end in seconds of the stream.
+        """
+        segmenter = self._create_offline_segmenter()
+        resampler = None
+        # (segment, future) in stream order
+        pending = collections.deque()
+
+        def submit(segments):
+            for segment in segments:
+                if len(segment.audio):
+                    audio = segment.audio.astype(np.float32) / INT16_MAX_ABS_VALUE
+                    # Sent to the engine directly: abort() cancels the
+                    # recorder's live requests, not this stream
+                    pending.append((segment, self.transcription_engine.request(
+                        audio, self.language, True, "offline")))
+
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, (bytes, bytearray, memoryview)):
+                    chunk = np.frombuffer(chunk, dtype=np.int16)
+                elif chunk.ndim == 2:
+                    chunk = np.mean(chunk, axis=1)
+                if sample_rate != SAMPLE_RATE:
+                    resampler = ensure_resampler(resampler, sample_rate, SAMPLE_RATE)
+                    chunk = resampler.process(chunk)
+                submit(segmenter.feed(chunk.astype(np.int16, copy=False)))
+                while pending and (len(pending) >= 2 * batch_requests or pending[0][1].done()):
+                    yield self._offline_result(*pending.popleft())
+            if resampler:
+                submit(segmenter.feed(resampler.flush().astype(np.int16, copy=False)))
+            submit(segmenter.flush())
+            while pending:
+                yield self._offline_result(*pending.popleft())
+        finally:
+            for _, future in pending:
+                self.transcription_engine.cancel(future)
+            self.offline_silero_vad_models.append(segmenter.silero_model)
+
+    def _create_offline_segmenter(self):
+        try:
+            silero_model = self.offline_silero_vad_models.pop()
+        except IndexError:
+            import torch
+            silero_model, _ = torch.hub.load(
+                repo_or_dir="snakers4/silero-vad",
+                model="silero_vad",
+                verbose=False,
+                onnx=self.silero_use_onnx
+            )
+        webrtc_vad = webrtcvad.Vad()
+        webrtc_vad.set_mode(self.webrtc_sensitivity)
+        return OfflineSegmenter(
+            webrtc_vad,
+            silero_model,
+            silero_sensitivity=self.silero_sensitivity,
+            silero_deactivity_detection=self.silero_deactivity_detection,
+            post_speech_silence_duration=self.post_speech_silence_duration,
+            min_length_of_recording=self.min_length_of_recording,
+            min_gap_between_recordings=self.min_gap_between_recordings,
+            pre_recording_buffer_duration=self.pre_recording_buffer_duration,
+            chunk_samples=self.buffer_size,
+        )
+
+    def _offline_result(self, segment, future):
+        status, result = future.result()
+        if status != 'success':
+            logger.error(f"Offline transcription error: {result}")
+            raise Exception(result if status == 'error' else "Offline transcription cancelled")
+        text, info, _ = result
+        return OfflineTranscription(
+            round(segment.start, 3), round(segment.end, 3), self._preprocess_output(text),
+            info.language, info.language_probability)
 
     def transcribe(self):
         """
@@ -1636,14 +3043,18 @@ class AudioToTextRecorder:
                 "h" * self.buffer_size,
                 data
             )
+            start = time.perf_counter()
             porcupine_index = self.porcupine.process(pcm)
+            metrics.WAKEWORD_INFERENCE.labels("pvporcupine").observe(time.perf_counter() - start)
             if self.debug_mode:
                 logger.info(f"wake words porcupine_index: {porcupine_index}")
             return porcupine_index
 
         elif self.wakeword_backend in {'oww', 'openwakeword', 'openwakewords'}:
             pcm = np.frombuffer(data, dtype=np.int16)
+            start = time.perf_counter()
             prediction = self.owwModel.predict(pcm)
+            metrics.WAKEWORD_INFERENCE.labels("openwakeword").observe(time.perf_counter() - start)
             max_score = -1
             max_index = -1
             wake_words_in_prediction = len(self.owwModel.prediction_buffer.keys())
@@ -1728,7 +3139,7 @@ class AudioToTextRecorder:
 
         # Ensure there's a minimum interval
         # between stopping and starting recording
-        if (time.time() - self.recording_stop_time
+        if (self.clock.time() - self.recording_stop_time
                 < self.min_gap_between_recordings):
             logger.info("Attempted to start recording "
                          "too soon after stopping."
@@ -1743,15 +3154,22 @@ class AudioToTextRecorder:
         self.wakeword_detected = False
         self.wake_word_detect_time = 0
         self.frames = []
+        self.audio_arena.clear()
+        self.realtime_window.reset()
+        self.utterance_id = next(_utterance_ids)
+        self.utterance_trace = UtteranceTrace(self.utterance_id)
         if frames:
             self.frames = frames
+            self.audio_arena.extend(frames)
         self.is_recording = True
 
-        self.recording_start_time = time.time()
+        self.recording_start_time = self.clock.time()
+        self.silero_vad_worker.clear()
         self.is_silero_speech_active = False
         self.is_webrtc_speech_active = False
         self.stop_recording_event.clear()
         self.start_recording_event.set()
+        self._notify_state_change()
 
         if self.on_recording_start:
             self._run_callback(self.on_recording_start)
@@ -1775,7 +3193,7 @@ class AudioToTextRecorder:
 
         # Ensure there's a minimum interval
         # between starting and stopping recording
-        if (time.time() - self.recording_start_time
+        if (self.clock.time() - self.recording_start_time
                 < self.min_length_of_recording):
             logger.info("Attempted to stop recording "
                          "too soon after starting."
@@ -1783,16 +3201,21 @@ class AudioToTextRecorder:
             return self
 
         logger.info("recording stopped")
+        self._mark_trace("recording_stop")
+        if self.utterance_trace:
+            self.stopped_trace, self.utterance_trace = self.utterance_trace, None
         self.last_frames = copy.deepcopy(self.frames)
         self.backdate_stop_seconds = backdate_stop_seconds
         self.backdate_resume_seconds = backdate_resume_seconds
         self.is_recording = False
-        self.recording_stop_time = time.time()
+        self.recording_stop_time = self.clock.time()
+        self.silero_vad_worker.clear()
         self.is_silero_speech_active = False
         self.is_webrtc_speech_active = False
         self.silero_check_time = 0
         self.start_recording_event.clear()
         self.stop_recording_event.set()
+        self._notify_state_change()
 
         self.last_recording_start_time = self.recording_start_time
         self.last_recording_stop_time = self.recording_stop_time
@@ -1809,7 +3232,7 @@ class AudioToTextRecorder:
         The recorder now "listens" for voice activation.
         Once voice is detected we enter "recording" state.
         """
-        self.listen_start = time.time()
+        self.listen_start = self.clock.time()
         self._set_state("listening")
         self.start_recording_on_voice_activity = True
 
@@ -1819,9 +3242,10 @@ class AudioToTextRecorder:
         accumulated until the buffer size is reached, and then the accumulated
         data is fed into the audio_queue.
         """
-        # Check if the buffer attribute exists, if not, initialize it
-        if not hasattr(self, 'buffer'):
-            self.buffer = bytearray()
+        # Check if the chunker exists, if not, initialize it
+        buf_size = 2 * self.buffer_size  # silero complains if too short
+        if self.feed_chunker is None:
+            self.feed_chunker = AudioChunker(buf_size)
 
         # Check if input is a NumPy array
         if isinstance(chunk, np.ndarray):
@@ -1831,27 +3255,25 @@ class AudioToTextRecorder:
 
             # Resample to 16000 Hz if necessary
             if original_sample_rate != 16000:
-                num_samples = int(len(chunk) * 16000 / original_sample_rate)
-                chunk = resample(chunk, num_samples)
+                self.feed_resampler = ensure_resampler(
+                    self.feed_resampler, original_sample_rate, 16000)
+                chunk = self.feed_resampler.process(chunk)
 
             # Ensure data type is int16
             chunk = chunk.astype(np.int16)
 
             # Convert the NumPy array to bytes
             chunk = chunk.tobytes()
+        elif original_sample_rate != 16000:
+            # 16 bit PCM bytes at another rate
+            self.feed_resampler = ensure_resampler(
+                self.feed_resampler, original_sample_rate, 16000)
+            chunk = self.feed_resampler.process(chunk).tobytes()
 
-        # Append the chunk to the buffer
-        self.buffer += chunk
-        buf_size = 2 * self.buffer_size  # silero complains if too short
-
-        # Check if the buffer has reached or exceeded the buffer_size
-        while len(self.buffer) >= buf_size:
-            # Extract self.buffer_size amount of data from the buffer
-            to_process = self.buffer[:buf_size]
-            self.buffer = self.buffer[buf_size:]
-
-            # Feed the extracted data to the audio_queue
-            self.audio_queue.put(to_process)
+        # Cut the data into chunks of buffer_size samples
+        for frame in self.feed_chunker.feed(chunk):
+            # Feed a copy of the frame to the audio_queue (frames are views)
+            self.audio_queue.put(bytes(frame))
 
     def set_microphone(self, microphone_on=True):
         """
@@ -1880,11 +3302,20 @@ class AudioToTextRecorder:
             self.shutdown_event.set()
             self.is_recording = False
             self.is_running = False
+            self._notify_state_change()
+            # Wake the recording worker blocked on the empty queue
+            self.audio_queue.put(None)
+            _live_recorders.discard(self)
+            if self.utterance_trace_sink:
+                self.utterance_trace_sink.close()
 
             logger.debug('Finishing recording thread')
             if self.recording_thread:
                 self.recording_thread.join()
 
+            if self.silero_vad_worker:
+                self.silero_vad_worker.stop()
+
             logger.debug('Terminating reader process')
 
             # Give it some time to finish the loop and cleanup.
@@ -1897,16 +3328,9 @@ class AudioToTextRecorder:
                                     )
                     self.reader_process.terminate()
 
-            logger.debug('Terminating transcription process')
-            self.transcript_process.join(timeout=10)
-
-            if self.transcript_process.is_alive():
-                logger.warning("Transcript process did not terminate "
-                                "in time. Terminating forcefully."
-                                )
-                self.transcript_process.terminate()
-
-            self.parent_transcription_pipe.close()
+            self._cancel_transcription_requests()
+            if self.owns_transcription_engine:
+                self.transcription_engine.shutdown()
 
             logger.debug('Finishing realtime thread')
             if self.realtime_thread:
@@ -1955,7 +3379,15 @@ class AudioToTextRecorder:
                     # if self.use_extended_logging:
                     #     logger.debug('Debug: Trying to get data from audio queue')
                     try:
-                        data = self.audio_queue.get(timeout=0.01)
+                        data = self.audio_queue.get(timeout=IDLE_WAIT_TIMEOUT)
+                        if data is None:
+                            # Shutdown sentinel
+                            continue
+                        self.clock.advance(len(data) // 2)
+                        self._notify_state_change()
+                        metrics.AUDIO_CHUNKS.inc()
+                        if self.qos:
+                            self.qos.update(_queue_depth(self) / self.allowed_latency_limit)
                         self.last_words_buffer.append(data)
                     except queue.Empty:
                         # if self.use_extended_logging:
@@ -1977,7 +3409,8 @@ class AudioToTextRecorder:
 
                     if self.use_extended_logging:
                         logger.debug('Debug: Checking if handle_buffer_overflow is True')
-                    if self.handle_buffer_overflow:
+                    # Late chunks do not matter on the audio clock
+                    if self.handle_buffer_overflow and getattr(self.clock, "realtime", True):
                         if self.use_extended_logging:
                             logger.debug('Debug: Handling buffer overflow')
                         # Handle queue overflow
@@ -1997,6 +3430,7 @@ class AudioToTextRecorder:
                                 self.allowed_latency_limit):
 
                             data = self.audio_queue.get()
+                            metrics.DROPPED_CHUNKS.labels("latency_limit").inc()
 
                 except BrokenPipeError:
                     logger.error("BrokenPipeError _recording_worker", exc_info=True)
@@ -2025,7 +3459,7 @@ class AudioToTextRecorder:
                     if self.use_extended_logging:
                         logger.debug('Debug: Handling not recording state')
                     # Handle not recording state
-                    time_since_listen_start = (time.time() - self.listen_start
+                    time_since_listen_start = (self.clock.time() - self.listen_start
                                             if self.listen_start else 0)
 
                     wake_word_activation_delay_passed = (
@@ -2089,8 +3523,8 @@ class AudioToTextRecorder:
                         if wakeword_index >= 0:
                             if self.use_extended_logging:
                                 logger.debug('Debug: Wake word detected, updating variables')
-                            self.wake_word_detect_time = time.time()
-                            wakeword_detected_time = time.time()
+                            self.wake_word_detect_time = self.clock.time()
+                            wakeword_detected_time = self.wake_word_detect_time
                             wakeword_samples_to_remove = int(self.sample_rate * self.wake_word_buffer_duration)
                             self.wakeword_detected = True
                             if self.on_wakeword_detected:
@@ -2111,6 +3545,7 @@ class AudioToTextRecorder:
                             logger.debug('Debug: Checking if voice is active')
 
                         if self._is_voice_active():
+                            vad_start_time = time.monotonic()
 
                             if self.on_vad_start:
                                self._run_callback(self.on_vad_start)
@@ -2122,6 +3557,10 @@ class AudioToTextRecorder:
                             if self.use_extended_logging:
                                 logger.debug('Debug: Starting recording')
                             self.start()
+                            if self.speech_start_time:
+                                self._mark_trace("speech_start", self.speech_start_time)
+                            self._mark_trace("vad_start", vad_start_time)
+                            self.speech_start_time = 0
 
                             self.start_recording_on_voice_activity = False
 
@@ -2130,11 +3569,12 @@ class AudioToTextRecorder:
                             # Add the buffered audio
                             # to the recording frames
                             self.frames.extend(list(self.audio_buffer))
+                            self.audio_arena.extend(self.audio_buffer)
                             self.audio_buffer.clear()
 
                             if self.use_extended_logging:
                                 logger.debug('Debug: Resetting Silero VAD model states')
-                            self.silero_vad_model.reset_states()
+                            self.silero_vad_worker.reset()
                         else:
                             if self.use_extended_logging:
                                 logger.debug('Debug: Checking voice activity')
@@ -2170,8 +3610,9 @@ class AudioToTextRecorder:
                             else:
                                 self.frames[0] = frame[wakeword_samples_to_remove * 2:]
                                 samples_removed += wakeword_samples_to_remove
-                                samples_to_remove = 0
-                        
+                                wakeword_samples_to_remove = 0
+
+                        self.audio_arena.drop_front(samples_removed)
                         wakeword_samples_to_remove = 0
 
                     if self.use_extended_logging:
@@ -2202,10 +3643,11 @@ class AudioToTextRecorder:
                             # Voice deactivity was detected, so we start
                             # measuring silence time before stopping recording
                             if self.speech_end_silence_start == 0 and \
-                                (time.time() - self.recording_start_time > self.min_length_of_recording):
+                                (self.clock.time() - self.recording_start_time > self.min_length_of_recording):
 
-                                self.speech_end_silence_start = time.time()
-                                self.awaiting_speech_end = True
+                                self.speech_end_silence_start = self.clock.time()
+                                self._mark_trace("turn_detection_start")
+                                self._set_awaiting_speech_end(True)
                                 if self.on_turn_detection_start:
                                     if self.use_extended_logging:
                                         logger.debug('Debug: Calling on_turn_detection_start')
@@ -2215,23 +3657,31 @@ class AudioToTextRecorder:
                             if self.use_extended_logging:
                                 logger.debug('Debug: Checking early transcription conditions')
                             if self.speech_end_silence_start and self.early_transcription_on_silence and len(self.frames) > 0 and \
-                                (time.time() - self.speech_end_silence_start > self.early_transcription_on_silence) and \
+                                (self.clock.time() - self.speech_end_silence_start > self.early_transcription_on_silence) and \
                                 self.allowed_to_early_transcribe:
                                     if self.use_extended_logging:
                                         logger.debug("Debug:Adding early transcription request")
-                                    self.transcribe_count += 1
-                                    audio_array = np.frombuffer(b''.join(self.frames), dtype=np.int16)
-                                    audio = audio_array.astype(np.float32) / INT16_MAX_ABS_VALUE
+                                    audio = self.audio_arena.view()
 
                                     if self.use_extended_logging:
                                         logger.debug("Debug: early transcription request pipe send")
-                                    self.parent_transcription_pipe.send((audio, self.language, True))
+                                    # A newer early request supersedes the previous one
+                                    self._cancel_early_transcription()
+                                    early = EarlyTranscription(
+                                        self._send_transcription_request(audio, True, "early"),
+                                        len(audio), _audio_fingerprint(audio))
+                                    with self.early_transcription_lock:
+                                        self.early_transcription = early
+                                    self._mark_trace("early_request")
                                     if self.use_extended_logging:
                                         logger.debug("Debug: early transcription request pipe send return")
                                     self.allowed_to_early_transcribe = False
 
                         else:
-                            self.awaiting_speech_end = False
+                            self._set_awaiting_speech_end(False)
+                            if self._cancel_early_transcription():
+                                # Speech was added to the transcribed audio
+                                metrics.EARLY_TRANSCRIPTIONS.labels("speech_resumed").inc()
                             if self.use_extended_logging:
                                 logger.debug('Debug: Handling speech detection')
                             if self.speech_end_silence_start:
@@ -2250,7 +3700,7 @@ class AudioToTextRecorder:
                         if self.use_extended_logging:
                             logger.debug('Debug: Checking if silence duration exceeds threshold')
                         # Wait for silence to stop recording after speech
-                        if self.speech_end_silence_start and time.time() - \
+                        if self.speech_end_silence_start and self.clock.time() - \
                                 self.speech_end_silence_start >= \
                                 self.post_speech_silence_duration:
 
@@ -2265,7 +3715,7 @@ class AudioToTextRecorder:
                             if self.use_extended_logging:
                                 logger.debug('Debug: Calculating time difference')
                             # Calculate time difference
-                            time_diff = time.time() - self.speech_end_silence_start
+                            time_diff = self.clock.time() - self.speech_end_silence_start
 
                             if self.use_extended_logging:
                                 logger.debug('Debug: Logging voice deactivity detection')
@@ -2274,6 +3724,7 @@ class AudioToTextRecorder:
 
                                 logger.debug('Debug: Appending data to frames and stopping recording')
                             self.frames.append(data)
+                            self.audio_arena.append(data)
                             self.stop()
                             if not self.is_recording:
                                 if self.speech_end_silence_start != 0:
@@ -2290,7 +3741,7 @@ class AudioToTextRecorder:
                                     logger.debug('Debug: Setting failed_stop_attempt to True')
                                 failed_stop_attempt = True
 
-                            self.awaiting_speech_end = False
+                            self._set_awaiting_speech_end(False)
 
                 if self.use_extended_logging:
                     logger.debug('Debug: Checking if recording stopped')
@@ -2302,14 +3753,14 @@ class AudioToTextRecorder:
 
                 if self.use_extended_logging:
                     logger.debug('Debug: Checking Silero time')
-                if time.time() - self.silero_check_time > 0.1:
+                if self.clock.time() - self.silero_check_time > 0.1:
                     self.silero_check_time = 0
 
                 if self.use_extended_logging:
                     logger.debug('Debug: Handling wake word timeout')
                 # Handle wake word timeout (waited to long initiating
                 # speech after wake word detection)
-                if self.wake_word_detect_time and time.time() - \
+                if self.wake_word_detect_time and self.clock.time() - \
                         self.wake_word_detect_time > self.wake_word_timeout:
 
                     self.wake_word_detect_time = 0
@@ -2329,6 +3780,7 @@ class AudioToTextRecorder:
                     if self.use_extended_logging:
                         logger.debug('Debug: Appending data to frames')
                     self.frames.append(data)
+                    self.audio_arena.append(data)
 
                 if self.use_extended_logging:
                     logger.debug('Debug: Checking if not recording or speech end silence start')
@@ -2369,63 +3821,91 @@ class AudioToTextRecorder:
                 return
 
             # Track time of last transcription
-            last_transcription_time = time.time()
+            last_transcription_time = self.clock.time()
 
             while self.is_running:
 
                 if self.is_recording:
 
-                    # MODIFIED SLEEP LOGIC:
-                    # Wait until realtime_processing_pause has elapsed,
-                    # but check often so we can respond to changes quickly.
-                    while (
-                        time.time() - last_transcription_time
-                    ) < self.realtime_processing_pause:
-                        time.sleep(0.001)
-                        if not self.is_running or not self.is_recording:
-                            break
+                    # Wait until realtime_processing_pause has elapsed.
+                    # Processed chunks and state changes notify
+                    # state_changed, the audio clock only advances then.
+                    with self.state_changed:
+                        while self.is_running and self.is_recording:
+                            remaining = self._realtime_pause() - (
+                                self.clock.time() - last_transcription_time)
+                            if remaining <= 0:
+                                break
+                            self.state_changed.wait(
+                                remaining if getattr(self.clock, "realtime", True)
+                                else IDLE_WAIT_TIMEOUT)
 
                     if self.awaiting_speech_end:
-                        time.sleep(0.001)
+                        self._wait_for_state(
+                            lambda: not self.awaiting_speech_end
+                            or not self.is_recording or not self.is_running)
                         continue
 
                     # Update transcription time
-                    last_transcription_time = time.time()
+                    last_transcription_time = self.clock.time()
 
-                    # Convert the buffer frames to a NumPy array
-                    audio_array = np.frombuffer(
-                        b''.join(self.frames),
-                        dtype=np.int16
-                        )
+                    if self.qos and self.qos.at_least("disabled"):
+                        # Shed the realtime transcription until the load drops
+                        continue
+
+                    use_window = (self.realtime_sliding_window
+                                  and not self.use_main_model_for_realtime)
+                    window_generation = self.realtime_window.generation
+
+                    # Zero-copy view of the recording (or of its uncommitted
+                    # tail), already normalized to the [-1, 1] range
+                    if use_window:
+                        audio_array = self.audio_arena.view(
+                            self.realtime_window.committed_samples)
+                        initial_prompt_realtime = self.realtime_window.prompt(
+                            self.initial_prompt_realtime)
+                    else:
+                        audio_array = self.audio_arena.view()
+                        initial_prompt_realtime = self.initial_prompt_realtime
 
                     logger.debug(f"Current realtime buffer size: {len(audio_array)}")
 
-                    # Normalize the array to a [-1, 1] range
-                    audio_array = audio_array.astype(np.float32) / \
-                        INT16_MAX_ABS_VALUE
+                    if not len(audio_array):
+                        continue
 
                     if self.use_main_model_for_realtime:
-                        with self.transcription_lock:
-                            try:
-                                self.parent_transcription_pipe.send((audio_array, self.language, True))
-                                if self.parent_transcription_pipe.poll(timeout=5):  # Wait for 5 seconds
-                                    logger.debug("Receive from realtime worker after transcription request to main model")
-                                    status, result = self.parent_transcription_pipe.recv()
-                                    if status == 'success':
-                                        segments, info = result
-                                        self.detected_realtime_language = info.language if info.language_probability > 0 else None
-                                        self.detected_realtime_language_probability = info.language_probability
-                                        realtime_text = segments
-                                        logger.debug(f"Realtime text detected with main model: {realtime_text}")
-                                    else:
-                                        logger.error(f"Realtime transcription error: {result}")
-                                        continue
-                                else:
-                                    logger.warning("Realtime transcription timed out")
-                                    continue
-                            except Exception as e:
-                                logger.error(f"Error in realtime transcription: {str(e)}", exc_info=True)
+                        future = None
+                        options = None
+                        if self.qos and self.qos.at_least("beam_1"):
+                            options = self.transcription_engine.options._replace(beam_size=1)
+                        try:
+                            realtime_start = time.time()
+                            future = self._send_transcription_request(audio_array, True, "realtime", options)
+                            status, result = future.result(timeout=REALTIME_MAIN_MODEL_TIMEOUT)
+                            logger.debug("Receive from realtime worker after transcription request to main model")
+                            if status == 'success':
+                                self._observe_realtime_decode(time.time() - realtime_start, len(audio_array))
+                                segments, info, _ = result
+                                self.detected_realtime_language = info.language if info.language_probability > 0 else None
+                                self.detected_realtime_language_probability = info.language_probability
+                                realtime_text = segments
+                                logger.debug(f"Realtime text detected with main model: {realtime_text}")
+                            elif status == 'cancelled':
+                                logger.debug("Realtime transcription superseded by a newer request")
+                                continue
+                            else:
+                                logger.error(f"Realtime transcription error: {result}")
                                 continue
+                        except concurrent.futures.TimeoutError:
+                            # Stale by now, the next update will carry newer audio
+                            logger.warning("Realtime transcription timed out")
+                            self._cancel_transcription_request(future)
+                            continue
+                        except concurrent.futures.CancelledError:
+                            continue
+                        except Exception as e:
+                            logger.error(f"Error in realtime transcription: {str(e)}", exc_info=True)
+                            continue
                     else:
                         # Perform transcription and assemble the text
                         if self.normalize_audio:
@@ -2435,36 +3915,51 @@ class AudioToTextRecorder:
                                 if peak > 0:
                                     audio_array = (audio_array / peak) * 0.95
 
+                        realtime_model, beam_size = self._realtime_decoder()
+                        realtime_start = time.time()
                         if self.realtime_batch_size > 0:
-                            segments, info = self.realtime_model_type.transcribe(
+                            segments, info = realtime_model.transcribe(
                                 audio_array,
                                 language=self.language if self.language else None,
-                                beam_size=self.beam_size_realtime,
-                                initial_prompt=self.initial_prompt_realtime,
+                                beam_size=beam_size,
+                                initial_prompt=initial_prompt_realtime,
                                 suppress_tokens=self.suppress_tokens,
                                 batch_size=self.realtime_batch_size,
                                 vad_filter=self.faster_whisper_vad_filter
                             )
                         else:
-                            segments, info = self.realtime_model_type.transcribe(
+                            segments, info = realtime_model.transcribe(
                                 audio_array,
                                 language=self.language if self.language else None,
-                                beam_size=self.beam_size_realtime,
-                                initial_prompt=self.initial_prompt_realtime,
+                                beam_size=beam_size,
+                                initial_prompt=initial_prompt_realtime,
                                 suppress_tokens=self.suppress_tokens,
                                 vad_filter=self.faster_whisper_vad_filter
                             )
 
                         self.detected_realtime_language = info.language if info.language_probability > 0 else None
                         self.detected_realtime_language_probability = info.language_probability
-                        realtime_text = " ".join(
-                            seg.text for seg in segments
-                        )
+                        if use_window:
+                            realtime_text = self.realtime_window.update(
+                                [(seg.start, seg.end, seg.text) for seg in segments],
+                                len(audio_array),
+                                window_generation
+                            )
+                        else:
+                            realtime_text = " ".join(
+                                seg.text for seg in segments
+                            )
+                        # Segments are decoded lazily, the text is complete here
+                        realtime_elapsed = time.time() - realtime_start
+                        metrics.TRANSCRIPTION_LATENCY.labels("realtime").observe(realtime_elapsed)
+                        metrics.observe_transcription(
+                            "realtime", realtime_elapsed, len(audio_array) / SAMPLE_RATE)
+                        self._observe_realtime_decode(realtime_elapsed, len(audio_array))
                         logger.debug(f"Realtime text detected: {realtime_text}")
 
                     # double check recording state
                     # because it could have changed mid-transcription
-                    if self.is_recording and time.time() - \
+                    if self.is_recording and self.clock.time() - \
                             self.recording_start_time > self.init_realtime_after_seconds:
 
                         self.realtime_transcription_text = realtime_text
@@ -2531,9 +4026,10 @@ class AudioToTextRecorder:
                         # Invoke the callback with the transcribed text
                         self._run_callback(self._on_realtime_transcription_update, self._preprocess_output(self.realtime_transcription_text,True))
 
-                # If not recording, sleep briefly before checking again
+                # If not recording, wait until a recording starts
                 else:
-                    time.sleep(TIME_SLEEP)
+                    self._wait_for_state(
+                        lambda: self.is_recording or not self.is_running)
 
         except Exception as e:
             logger.error(f"Unhandled exeption in _realtime_worker: {e}", exc_info=True)
@@ -2541,33 +4037,41 @@ class AudioToTextRecorder:
 
     def _is_silero_speech(self, chunk):
         """
-        Returns true if speech is detected in the provided audio data
+        Submits the provided audio data to the Silero VAD worker and
+        returns whether speech was detected in the most recently
+        processed audio. Does not wait for the inference of chunk,
+        except on a clock that is not real time (see _silero_submit).
 
         Args:
             data (bytes): raw bytes of audio data (1024 raw bytes with
             16000 sample rate and 16 bits per sample)
         """
-        if self.sample_rate != 16000:
-            pcm_data = np.frombuffer(chunk, dtype=np.int16)
-            data_16000 = signal.resample_poly(
-                pcm_data, 16000, self.sample_rate)
-            chunk = data_16000.astype(np.int16).tobytes()
+        self._silero_submit(chunk)
+        return self.is_silero_speech_active
+
+    def _silero_submit(self, chunk):
+        """
+        Hands a chunk to the Silero VAD worker. On a clock that is not
+        real time (the audio clock) the audio may arrive faster than
+        Silero runs, so the recording worker waits for the result of
+        every chunk: the decisions then refer to the chunk at hand and
+        none are dropped, however fast the audio is fed.
+        """
+        self.silero_vad_worker.submit(
+            chunk, wait=not getattr(self.clock, "realtime", True))
 
-        self.silero_working = True
-        audio_chunk = np.frombuffer(chunk, dtype=np.int16)
-        audio_chunk = audio_chunk.astype(np.float32) / INT16_MAX_ABS_VALUE
-        vad_prob = self.silero_vad_model(
-            torch.from_numpy(audio_chunk),
-            SAMPLE_RATE).item()
-        is_silero_speech_active = vad_prob > (1 - self.silero_sensitivity)
+    def _on_silero_probability(self, probability, timestamp):
+        """
+        Called by the Silero VAD worker with the speech probability of the
+        audio it processed last.
+        """
+        is_silero_speech_active = probability > (1 - self.silero_sensitivity)
         if is_silero_speech_active:
             if not self.is_silero_speech_active and self.use_extended_logging:
                 logger.info(f"{bcolors.OKGREEN}Silero VAD detected speech{bcolors.ENDC}")
         elif self.is_silero_speech_active and self.use_extended_logging:
             logger.info(f"{bcolors.WARNING}Silero VAD detected silence{bcolors.ENDC}")
         self.is_silero_speech_active = is_silero_speech_active
-        self.silero_working = False
-        return is_silero_speech_active
 
     def _is_webrtc_speech(self, chunk, all_frames_must_be_true=False):
         """
@@ -2581,6 +4085,7 @@ class AudioToTextRecorder:
         silence_str = f"{bcolors.WARNING}WebRTC VAD detected silence{bcolors.ENDC}"
         if self.sample_rate != 16000:
             pcm_data = np.frombuffer(chunk, dtype=np.int16)
+            from scipy import signal
             data_16000 = signal.resample_poly(
                 pcm_data, 16000, self.sample_rate)
             chunk = data_16000.astype(np.int16).tobytes()
@@ -2594,7 +4099,10 @@ class AudioToTextRecorder:
             start_byte = i * frame_length * 2
             end_byte = start_byte + frame_length * 2
             frame = chunk[start_byte:end_byte]
-            if self.webrtc_vad_model.is_speech(frame, 16000):
+            start = time.perf_counter()
+            is_speech = self.webrtc_vad_model.is_speech(frame, 16000)
+            metrics.VAD_INFERENCE.labels("webrtc").observe(time.perf_counter() - start)
+            if is_speech:
                 speech_frames += 1
                 if not all_frames_must_be_true:
                     if self.debug_mode:
@@ -2636,14 +4144,33 @@ class AudioToTextRecorder:
 
         # First quick performing check for voice activity using WebRTC
         if self.is_webrtc_speech_active:
+            if not self.speech_start_time:
+                self.speech_start_time = time.monotonic()
+
+            # The intensive check runs on the Silero VAD worker
+            self._silero_submit(data)
+        else:
+            self.speech_start_time = 0
 
-            if not self.silero_working:
-                self.silero_working = True
+    def _notify_state_change(self):
+        """Wakes the threads blocked in _wait_for_state()."""
+        with self.state_changed:
+            self.state_changed.notify_all()
+
+    def _wait_for_state(self, predicate):
+        """
+        Blocks until predicate() is true. Woken by _notify_state_change(),
+        re-checks at least every IDLE_WAIT_TIMEOUT seconds for changes made
+        by other processes (e.g. interrupt_stop_event).
+        """
+        with self.state_changed:
+            while not predicate():
+                self.state_changed.wait(IDLE_WAIT_TIMEOUT)
 
-                # Run the intensive check in a separate thread
-                threading.Thread(
-                    target=self._is_silero_speech,
-                    args=(data,)).start()
+    def _set_awaiting_speech_end(self, value):
+        if self.awaiting_speech_end != value:
+            self.awaiting_speech_end = value
+            self._notify_state_change()
 
     def clear_audio_queue(self):
         """
@@ -2735,6 +4262,7 @@ class AudioToTextRecorder:
         if self.spinner:
             # If the Halo spinner doesn't exist, create and start it
             if self.halo is None:
+                import halo
                 self.halo = halo.Halo(text=text)
                 self.halo.start()
             # If the Halo spinner already exists, just update the text
@@ -6,6 +6,7 @@ from urllib.parse import urlparse
 from datetime import datetime
 from websocket import WebSocketApp
 from websocket import ABNF
+from . import protocol
 import numpy as np
 import subprocess
 import threading
@@ -19,8 +20,6 @@ import time
 import sys
 import os
 
-# Import the AudioInput class
-from .audio_input import AudioInput
 
 DEFAULT_CONTROL_URL = "ws://127.0.0.1:8011"
 DEFAULT_DATA_URL = "ws://127.0.0.1:8012"
@@ -173,6 +172,9 @@ class AudioToTextRecorderClient:
                  autostart_server: bool = True,
                  output_wav_file: str = None,
                  faster_whisper_vad_filter: bool = False,
+                 audio_events: str = None,
+                 legacy_audio_framing: bool = False,
+                 audio_codec: str = "pcm",
                  ):
 
         # Set instance variables from constructor parameters
@@ -256,6 +258,27 @@ class AudioToTextRecorderClient:
         self.autostart_server = autostart_server
         self.output_wav_file = output_wav_file
 
+        # Format of the audio sent with transcription_start, only fetched
+        # when there is a callback for it (see RealtimeSTT.protocol)
+        if audio_events is None:
+            audio_events = "int16" if on_transcription_start else "none"
+        self.audio_events = audio_events
+
+        # Prefix every chunk with JSON metadata instead of announcing the
+        # stream once with an audio_format message (for older servers)
+        self.legacy_audio_framing = legacy_audio_framing
+        self.sent_audio_format = None
+
+        # "pcm" or a compressed format the server decodes ("opus",
+        # "ogg_opus", "flac", needs PyAV, see RealtimeSTT.audio_codec)
+        if audio_codec != "pcm" and audio_codec not in protocol.COMPRESSED_FORMATS:
+            raise ValueError(f"Unknown audio_codec {audio_codec!r}")
+        if audio_codec != "pcm" and legacy_audio_framing:
+            raise ValueError("Compressed audio needs the audio_format handshake, "
+                             "it can not be combined with legacy_audio_framing")
+        self.audio_codec = audio_codec
+        self.audio_encoder = None
+
         # Instance variables
         self.muted = False
         self.recording_thread = None
@@ -271,6 +294,7 @@ class AudioToTextRecorderClient:
 
         self.request_counter = 0
         self.pending_requests = {}  # Map from request_id to threading.Event and value
+        self.session_id = None  # Assigned by the server on the data connection
 
         if self.debug_mode:
             print("Checking STT server")
@@ -403,7 +427,7 @@ class AudioToTextRecorderClient:
             self.control_ws_thread.start()
 
             # Connect to data WebSocket
-            self.data_ws = WebSocketApp(self.data_url,
+            self.data_ws = WebSocketApp(protocol.with_audio_events(self.data_url, self.audio_events),
                                                   on_message=self.on_data_message,
                                                   on_error=self.on_error,
                                                   on_close=self.on_close,
@@ -575,6 +599,7 @@ class AudioToTextRecorderClient:
     
     def list_devices(self):
         """List all available audio input devices."""
+        from .audio_input import AudioInput
         audio = AudioInput(debug_mode=self.debug_mode)
         audio.list_devices()
 
@@ -585,6 +610,7 @@ class AudioToTextRecorderClient:
 
     def setup_audio(self):
         """Initialize audio input"""
+        from .audio_input import AudioInput
         self.audio_input = AudioInput(
             input_device_index=self.input_device_index,
             debug_mode=self.debug_mode
@@ -628,15 +654,32 @@ class AudioToTextRecorderClient:
                         continue
 
                     if self.recording_start.is_set():
-                        metadata = {"sampleRate": self.audio_input.device_sample_rate}
-                        metadata_json = json.dumps(metadata)
-                        metadata_length = len(metadata_json)
-                        message = struct.pack('<I', metadata_length) + metadata_json.encode('utf-8') + audio_data
+                        sample_rate = self.audio_input.device_sample_rate
+                        if self.legacy_audio_framing:
+                            metadata = {"sampleRate": sample_rate}
+                            metadata_json = json.dumps(metadata)
+                            metadata_length = len(metadata_json)
+                            messages = [struct.pack('<I', metadata_length) + metadata_json.encode('utf-8') + audio_data]
+                        else:
+                            # Announce the stream once, then send plain PCM
+                            # or the compressed stream
+                            if self.sent_audio_format != sample_rate:
+                                if self.audio_codec != "pcm":
+                                    from .audio_codec import StreamEncoder
+                                    self.audio_encoder = StreamEncoder(self.audio_codec, sample_rate)
+                                self.data_ws.send(protocol.audio_format_message(
+                                    sample_rate, "int16" if self.audio_codec == "pcm" else self.audio_codec))
+                                self.sent_audio_format = sample_rate
+                            if self.audio_encoder is not None:
+                                messages = self.audio_encoder.encode(audio_data)
+                            else:
+                                messages = [audio_data]
 
                         if self.is_running:
                             if log_outgoing_chunks:
                                 print(".", flush=True, end='')
-                            self.data_ws.send(message, opcode=ABNF.OPCODE_BINARY)
+                            for message in messages:
+                                self.data_ws.send(message, opcode=ABNF.OPCODE_BINARY)
                 except KeyboardInterrupt:
                     if self.debug_mode:
                         print("KeyboardInterrupt in record_and_send_audio, exiting...")
@@ -681,8 +724,17 @@ class AudioToTextRecorderClient:
             print(f"Error processing control message: {e}")
 
     # Handle real-time transcription and full sentence updates
+    def on_audio_frame(self, message):
+        frame = protocol.decode_audio_frame(message)
+        if frame.message_type == 'transcription_start':
+            if self.on_transcription_start:
+                self.on_transcription_start(protocol.convert_samples(frame.audio, 'float32'))
+
     def on_data_message(self, ws, message):
         try:
+            if protocol.is_audio_frame(message):
+                self.on_audio_frame(message)
+                return
             data = json.loads(message)
             # Handle real-time transcription updates
             if data.get('type') == 'realtime':
@@ -711,18 +763,18 @@ class AudioToTextRecorderClient:
                 if self.on_recording_stop:
                     self.on_recording_stop()
             elif data.get('type') == 'transcription_start':
+                audio = None
                 audio_bytes_base64 = data.get('audio_bytes_base64')
-                decoded_bytes = base64.b64decode(audio_bytes_base64)
-
-                # Reconstruct the np.int16 array from the decoded bytes
-                audio_array = np.frombuffer(decoded_bytes, dtype=np.int16)
-
-                # If the original data was normalized, convert to np.float32 and normalize
-                INT16_MAX_ABS_VALUE = 32768.0
-                normalized_audio = audio_array.astype(np.float32) / INT16_MAX_ABS_VALUE
+                if audio_bytes_base64 is not None:
+                    # The server sends the recorder's float32 audio
+                    sample_format = data.get('audio_format', 'float32')
+                    decoded_bytes = base64.b64decode(audio_bytes_base64)
+                    audio = protocol.convert_samples(
+                        np.frombuffer(decoded_bytes, dtype=protocol.SAMPLE_FORMATS[sample_format][1]),
+                        'float32')
 
                 if self.on_transcription_start:
-                    self.on_transcription_start(normalized_audio)
+                    self.on_transcription_start(audio)
             elif data.get('type') == 'vad_detect_start':
                 if self.on_vad_detect_start:
                     self.on_vad_detect_start()
@@ -752,6 +804,13 @@ class AudioToTextRecorderClient:
                     self.on_wakeword_detection_end()
             elif data.get('type') == 'recorded_chunk':
                 pass
+            elif data.get('type') == 'session':
+                self.session_id = data.get('session_id')
+            elif data.get('type') == protocol.AUDIO_FORMAT_MESSAGE:
+                if data.get('status') != 'success':
+                    print(f"Server rejected the audio format: {data.get('message')}")
+                elif self.debug_mode:
+                    print("Server accepted the audio format.")
 
             else:
                 print(f"Unknown data message format: {data}")
@@ -779,16 +838,24 @@ class AudioToTextRecorderClient:
         self.connection_established.set()
 
     def on_data_open(self, ws):
+        # A new connection has not seen the audio_format message yet
+        self.sent_audio_format = None
         if self.debug_mode:
             print("Data WebSocket connection opened.")
 
+    def _send_command(self, command):
+        # Address this client's session on a multi-session server
+        if self.session_id is not None:
+            command["session_id"] = self.session_id
+        self.control_ws.send(json.dumps(command))
+
     def set_parameter(self, parameter, value):
         command = {
             "command": "set_parameter",
             "parameter": parameter,
             "value": value
         }
-        self.control_ws.send(json.dumps(command))
+        self._send_command(command)
 
     def get_parameter(self, parameter):
         # Generate a unique request_id
@@ -807,7 +874,7 @@ class AudioToTextRecorderClient:
         self.pending_requests[request_id] = {'event': event, 'value': None}
 
         # Send the command to the server
-        self.control_ws.send(json.dumps(command))
+        self._send_command(command)
 
         # Wait for the response or timeout after 5 seconds
         if event.wait(timeout=5):
@@ -828,7 +895,7 @@ class AudioToTextRecorderClient:
             "args": args or [],
             "kwargs": kwargs or {}
         }
-        self.control_ws.send(json.dumps(command))
+        self._send_command(command)
 
     def shutdown(self):
         """Shutdown all resources"""
@@ -0,0 +1,69 @@
+"""
+Clocks of the recorder's state machine.
+
+The recording worker, start()/stop(), wait_audio(), the wake word
+timeouts and the realtime worker measure durations (silence before a
+stop, min_length_of_recording, min_gap_between_recordings,
+wake_word_timeout, realtime_processing_pause, ...) on the recorder's
+clock.
+
+- WallClock (clock="wall", the default) is time.time(), for live audio.
+- AudioClock (clock="audio") advances by the duration of every chunk the
+  recording worker takes from the audio queue. Durations then refer to
+  the audio itself: audio fed faster than real time (replays, tests,
+  batch reprocessing) is segmented exactly like the same audio arriving
+  live. Since late chunks do not distort the timeline, the recorder does
+  not drop chunks beyond allowed_latency_limit with this clock; the
+  feeder has to pace itself. The recording worker also waits for the
+  Silero VAD result of every chunk it submits (clock.realtime is False),
+  so the VAD decisions refer to the chunk at hand instead of lagging
+  behind audio that arrives faster than Silero runs.
+
+A clock is any object with time() and advance(samples).
+"""
+
+import time
+
+CLOCKS = ("wall", "audio")
+
+
+class WallClock:
+    """The wall clock, time.time()."""
+    realtime = True
+
+    def time(self):
+        return time.time()
+
+    def advance(self, samples):
+        pass
+
+
+class AudioClock:
+    """
+    Seconds of audio processed, counted in samples. Starts at `start`
+    (the current time by default, so times look like timestamps in logs).
+    """
+    realtime = False
+
+    def __init__(self, sample_rate=16000, start=None):
+        self.sample_rate = sample_rate
+        self.start = time.time() if start is None else start
+        self.samples = 0
+
+    def time(self):
+        return self.start + self.samples / self.sample_rate
+
+    def advance(self, samples):
+        """Moves the clock forward by a chunk of `samples` samples."""
+        self.samples += samples
+
+
+def create_clock(clock, sample_rate=16000):
+    """Returns the clock for the recorder's clock parameter."""
+    if clock == "wall":
+        return WallClock()
+    if clock == "audio":
+        return AudioClock(sample_rate)
+    if isinstance(clock, str):
+        raise ValueError(f"Unknown clock {clock!r}, expected one of {CLOCKS} or a clock object")
+    return clock
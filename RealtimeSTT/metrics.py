@@ -0,0 +1,291 @@
+"""
+Process-wide metrics in the Prometheus text exposition format.
+
+The recorder, the transcription engine and the server update counters,
+gauges and histograms on their hot paths. An update is a few arithmetic
+operations under an uncontended lock; nothing is formatted or sent until
+somebody scrapes, so the metrics cost next to nothing when unused.
+Gauges can also be backed by a function that is only called on scrape.
+
+    from RealtimeSTT import metrics
+    metrics.start_http_server(9100)    # GET http://127.0.0.1:9100/metrics
+
+Transcription workers running in a separate process report their
+inference statistics over the stats pipe; the parent records them here.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import bisect
+import math
+
+PREFIX = "realtimestt_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a VAD window (sub-millisecond) to a long final decode
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    """A set of metrics rendered together."""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Returns all metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        # Children by the label values as passed, for a single dict lookup
+        self._lookup = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """Returns the child metric for the given label values."""
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(
+                    tuple(str(value) for value in values), self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self):
+        for values, child in sorted(self._children.items()):
+            yield from child.collect(self.name, self.labelnames, values)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Reads the value from function() on every scrape."""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return math.nan
+        return self.value
+
+    def collect(self, name, labelnames, values):
+        yield f"{name}{_labels(labelnames, values)} {_format_value(self.get())}"
+
+
+class Counter(_Metric):
+    """A monotonically increasing count. Names should end with _total."""
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.labelnames:
+            self.inc = self.labels().inc
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, or is computed on scrape."""
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.labelnames:
+            value = self.labels()
+            self.inc, self.dec, self.set = value.inc, value.dec, value.set
+            self.set_function, self.get = value.set_function, value.get
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def collect(self, name, labelnames, values):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = (("le", _format_value(float(bound))),)
+            yield f"{name}_bucket{_labels(labelnames, values, le)} {cumulative}"
+        yield f"{name}_sum{_labels(labelnames, values)} {_format_value(total)}"
+        yield f"{name}_count{_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    """Counts observations (e.g. durations in seconds) into buckets."""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+        if not self.labelnames:
+            self.observe = self.labels().observe
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr="127.0.0.1", registry=REGISTRY):
+    """
+    Serves the registry on http://addr:port/ (any path) from a daemon
+    thread. Returns the server; call shutdown() on it to stop.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# Metrics of the library, updated by the recorder and transcription engine
+AUDIO_CHUNKS = Counter(
+    "audio_chunks_total", "Audio chunks taken from the recorders' audio queues.")
+AUDIO_QUEUE_DEPTH = Gauge(
+    "audio_queue_depth", "Largest audio queue depth of the running recorders, in chunks.")
+AUDIO_QUEUE_LIMIT = Gauge(
+    "audio_queue_limit", "allowed_latency_limit of that recorder, chunks beyond it are dropped.")
+DROPPED_CHUNKS = Counter(
+    "dropped_chunks_total", "Audio chunks dropped, by reason.", ["reason"])
+VAD_INFERENCE = Histogram(
+    "vad_inference_seconds", "Voice activity detection time per frame (10 ms webrtc, 32 ms silero).", ["vad"])
+WAKEWORD_INFERENCE = Histogram(
+    "wakeword_inference_seconds", "Wake word detection time per chunk.", ["backend"])
+TRANSCRIPTION_LATENCY = Histogram(
+    "transcription_latency_seconds",
+    "Time from a transcription request to its result, including queueing.", ["kind"])
+TRANSCRIPTION_INFERENCE = Histogram(
+    "transcription_inference_seconds", "Model time per transcription request.", ["kind"])
+TRANSCRIBED_AUDIO = Counter(
+    "transcribed_audio_seconds_total", "Seconds of audio transcribed.", ["kind"])
+TRANSCRIPTION_INFERENCE_TOTAL = Counter(
+    "transcription_inference_seconds_total", "Model time spent transcribing.", ["kind"])
+END_OF_SPEECH_LATENCY = Histogram(
+    "end_of_speech_latency_seconds",
+    "Time from the end of speech (turn detection start) to the final text of an utterance.")
+EARLY_TRANSCRIPTIONS = Counter(
+    "early_transcriptions_total",
+    "Early transcriptions sent during a pause, by outcome: reused as the final text, "
+    "speech_resumed (cancelled as the speaker went on) or stale (did not match the final audio).",
+    ["outcome"])
+QOS_LEVEL = Gauge(
+    "qos_level",
+    "Most degraded realtime QoS level of the running recorders (0 normal, 1 longer_pause, "
+    "2 beam_1, 3 smaller_model, 4 disabled).")
+QOS_CHANGES = Counter(
+    "qos_changes_total", "Realtime QoS level changes, by direction and new level.", ["direction", "level"])
+REAL_TIME_FACTOR = Gauge(
+    "real_time_factor",
+    "Model time per second of audio of the latest transcription (below 1 is faster than real time).",
+    ["kind"])
+
+
+def observe_transcription(kind, inference_seconds, audio_seconds):
+    """Records the model time and audio length of one transcription."""
+    TRANSCRIPTION_INFERENCE.labels(kind).observe(inference_seconds)
+    TRANSCRIPTION_INFERENCE_TOTAL.labels(kind).inc(inference_seconds)
+    TRANSCRIBED_AUDIO.labels(kind).inc(audio_seconds)
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.labels(kind).set(inference_seconds / audio_seconds)
@@ -0,0 +1,230 @@
+"""
+Process-wide pool of loaded transcription models.
+
+Loading a Whisper model is slow and every copy costs hundreds of
+megabytes. ModelPool hands out refcounted handles to models keyed by
+their configuration (model, device, compute type, ...), so all recorders
+of a process that ask for the same configuration share one loaded copy.
+
+When the last handle of a model is released the model becomes idle.
+Idle models are kept for reuse up to max_idle_models (least recently
+used ones are evicted first) and for at most idle_timeout seconds.
+With the defaults a model is unloaded as soon as it is no longer used.
+
+memory_report() lists the pooled models with their reference counts and
+the memory their loading added to the process (or the resident size of
+the worker process they run in).
+"""
+
+import threading
+import logging
+import time
+import os
+import gc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger("realtimestt")
+
+
+def rss_bytes(pid=None):
+    """
+    Returns the resident set size of a process (default: this process)
+    in bytes, or None if it can not be determined on this platform.
+    """
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class ModelHandle:
+    """
+    A reference to a pooled model. Call release() (or use it as a context
+    manager) when the model is no longer needed.
+    """
+    def __init__(self, pool, key, resource):
+        self.pool = pool
+        self.key = key
+        self.resource = resource
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.pool.release(self)
+
+    def __enter__(self):
+        return self.resource
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class _PoolEntry:
+    def __init__(self, key, close):
+        self.key = key
+        self.close = close
+        self.resource = None
+        self.error = None
+        self.loaded = threading.Event()
+        self.refcount = 0
+        self.last_used = time.time()
+        self.memory_bytes = None
+        self.pid = None
+
+
+class ModelPool:
+    """
+    Refcounted, keyed pool of loaded models with LRU eviction of idle ones.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_idle_models: int = 0, idle_timeout: float = None):
+        """
+        Args:
+            max_idle_models (int): Number of unused models kept loaded for
+              reuse. The least recently used idle models are evicted first.
+            idle_timeout (float, optional): Seconds after which an idle
+              model is evicted regardless of max_idle_models. Checked
+              whenever a model is acquired or released.
+        """
+        self.max_idle_models = max_idle_models
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        """Returns the process-wide pool used when none is passed."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def acquire(self, key, factory, close=None, pid=None):
+        """
+        Returns a ModelHandle for key, calling factory() to load the model
+        if it is not pooled yet. Concurrent acquires of the same key wait
+        for a single load.
+
+        Args:
+            key (tuple): Hashable description of the model configuration.
+            factory (callable): Loads and returns the model.
+            close (callable, optional): Called with the model on eviction.
+            pid (callable, optional): Called with the model, returns the id
+              of the process the model lives in, if it is not this one.
+              Used for memory reporting.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = _PoolEntry(key, close)
+                self._entries[key] = entry
+            entry.refcount += 1
+            entry.last_used = time.time()
+
+        if owner:
+            logger.info(f"Loading pooled model {key}")
+            rss_before = rss_bytes()
+            try:
+                entry.resource = factory()
+            except BaseException as e:
+                entry.error = e
+                with self._lock:
+                    self._entries.pop(key, None)
+                entry.loaded.set()
+                raise
+            if pid is not None:
+                entry.pid = pid(entry.resource)
+            rss_after = rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry.memory_bytes = max(0, rss_after - rss_before)
+            entry.loaded.set()
+        else:
+            logger.debug(f"Reusing pooled model {key}")
+            entry.loaded.wait()
+            if entry.error is not None:
+                raise entry.error
+
+        self._evict_expired()
+        return ModelHandle(self, key, entry.resource)
+
+    def release(self, handle):
+        """Drops one reference. Prefer handle.release()."""
+        with self._lock:
+            entry = self._entries.get(handle.key)
+            if entry is None or entry.resource is not handle.resource:
+                return
+            entry.refcount -= 1
+            entry.last_used = time.time()
+        self._evict_expired()
+
+    def _evict_expired(self):
+        evicted = []
+        now = time.time()
+        with self._lock:
+            idle = sorted(
+                (entry for entry in self._entries.values()
+                 if entry.refcount == 0 and entry.loaded.is_set()),
+                key=lambda entry: entry.last_used)
+            for index, entry in enumerate(idle):
+                too_many = len(idle) - index > self.max_idle_models
+                too_old = self.idle_timeout is not None and now - entry.last_used > self.idle_timeout
+                if too_many or too_old:
+                    del self._entries[entry.key]
+                    evicted.append(entry)
+        for entry in evicted:
+            self._close(entry)
+
+    def _close(self, entry):
+        logger.info(f"Evicting pooled model {entry.key}")
+        if entry.close:
+            try:
+                entry.close(entry.resource)
+            except Exception as e:
+                logger.error(f"Error closing pooled model {entry.key}: {e}", exc_info=True)
+        entry.resource = None
+        gc.collect()
+
+    def clear(self):
+        """Unloads all idle models."""
+        with self._lock:
+            idle = [entry for entry in self._entries.values()
+                    if entry.refcount == 0 and entry.loaded.is_set()]
+            for entry in idle:
+                del self._entries[entry.key]
+        for entry in idle:
+            self._close(entry)
+
+    def memory_report(self):
+        """
+        Returns one dict per pooled model with its key, reference count
+        and memory use in bytes (None where it can not be measured).
+        Models living in a worker process report that process' resident
+        size, in-process models the growth of this process while loading.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+        report = []
+        for entry in entries:
+            memory = rss_bytes(entry.pid) if entry.pid else entry.memory_bytes
+            report.append({
+                "key": entry.key,
+                "refcount": entry.refcount,
+                "idle": entry.refcount == 0,
+                "memory_bytes": memory,
+            })
+        return report
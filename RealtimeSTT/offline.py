@@ -0,0 +1,183 @@
+"""
+Voice activity segmentation of recorded audio, faster than real time.
+
+The recording worker measures silence and recording lengths on the wall
+clock, so audio fed with feed_audio() has to arrive at real time pace.
+OfflineSegmenter runs the same decisions on an AudioClock instead: the
+time of a chunk is the number of samples before it. A recording starts
+when WebRTC VAD and Silero VAD both detect speech (including the
+pre-recording buffer) and stops after post_speech_silence_duration of
+silence, detected by Silero or by WebRTC on all frames like in the
+recorder. Silero runs synchronously on every chunk it has to judge.
+
+AudioToTextRecorder.transcribe_file() and transcribe_stream() feed the
+segments to the main model in batches.
+"""
+
+import collections
+import time
+import numpy as np
+
+from .clock import AudioClock
+from . import metrics
+
+SAMPLE_RATE = 16000
+INT16_MAX_ABS_VALUE = 32768.0
+WEBRTC_FRAME_SAMPLES = 160
+SILERO_WINDOW_SAMPLES = 512
+
+# A speech segment, start and end in seconds of the stream. audio holds
+# the int16 samples from start to end.
+OfflineSegment = collections.namedtuple("OfflineSegment", ["start", "end", "audio"])
+
+# The transcription of one OfflineSegment
+OfflineTranscription = collections.namedtuple(
+    "OfflineTranscription", ["start", "end", "text", "language", "language_probability"])
+
+
+class OfflineSegmenter:
+    """
+    Cuts a 16 kHz mono int16 stream into utterances, see the module
+    docstring. Not thread-safe.
+    """
+    def __init__(self,
+                 webrtc_vad,
+                 silero_model,
+                 silero_sensitivity=0.4,
+                 silero_deactivity_detection=False,
+                 post_speech_silence_duration=0.6,
+                 min_length_of_recording=0.5,
+                 min_gap_between_recordings=0,
+                 pre_recording_buffer_duration=1.0,
+                 chunk_samples=512,
+                 ):
+        """
+        Args:
+            webrtc_vad (webrtcvad.Vad): WebRTC VAD with the mode set.
+            silero_model: A Silero VAD model of its own (the model is
+              stateful, it must not be used by a live recorder as well).
+            chunk_samples (int): Samples per decision, the recorder's
+              buffer_size.
+
+        The other arguments have the meaning of the AudioToTextRecorder
+        parameters of the same name.
+        """
+        self.webrtc_vad = webrtc_vad
+        self.silero_model = silero_model
+        self.silero_threshold = 1 - silero_sensitivity
+        self.silero_deactivity_detection = silero_deactivity_detection
+        self.post_speech_silence_duration = post_speech_silence_duration
+        self.min_length_of_recording = min_length_of_recording
+        self.min_gap_between_recordings = min_gap_between_recordings
+        self.chunk_samples = chunk_samples
+        self.pre_recording_buffer = collections.deque(
+            maxlen=int(SAMPLE_RATE // chunk_samples * pre_recording_buffer_duration))
+
+        self._remainder = np.zeros(0, dtype=np.int16)
+        # Seconds of the stream processed so far
+        self.clock = AudioClock(SAMPLE_RATE, start=0.0)
+        self.frames = None
+        self.recording_start = 0
+        self.recording_stop = -np.inf
+        self.speech_end_silence_start = 0
+        self._silero_reset = True
+
+    def time(self):
+        """Seconds of the stream processed so far."""
+        return self.clock.time()
+
+    def feed(self, samples):
+        """
+        Processes the next samples of the stream (int16 numpy array at 16
+        kHz). Returns the list of segments completed by them.
+        """
+        samples = np.concatenate((self._remainder, samples.astype(np.int16, copy=False)))
+        usable = len(samples) - len(samples) % self.chunk_samples
+        self._remainder = samples[usable:]
+        segments = []
+        for start in range(0, usable, self.chunk_samples):
+            segment = self._process(samples[start:start + self.chunk_samples])
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self):
+        """Ends the stream. Returns the segment still recording, if any."""
+        if self.frames is None:
+            return []
+        if len(self._remainder):
+            self.frames.append(self._remainder)
+            self.clock.advance(len(self._remainder))
+            self._remainder = np.zeros(0, dtype=np.int16)
+        return [self._stop()]
+
+    def _process(self, chunk):
+        now = self.time()
+        if self.frames is None:
+            if (now - self.recording_stop >= self.min_gap_between_recordings
+                    and self._is_webrtc_speech(chunk)
+                    and self._silero_probability(chunk) > self.silero_threshold):
+                self.frames = list(self.pre_recording_buffer)
+                self.pre_recording_buffer.clear()
+                self.recording_start = now
+                self.speech_end_silence_start = 0
+                self._silero_reset = True
+        else:
+            if self.silero_deactivity_detection:
+                is_speech = self._silero_probability(chunk) > self.silero_threshold
+            else:
+                is_speech = self._is_webrtc_speech(chunk, all_frames_must_be_true=True)
+            if not is_speech:
+                if (not self.speech_end_silence_start
+                        and now - self.recording_start > self.min_length_of_recording):
+                    self.speech_end_silence_start = now
+            else:
+                self.speech_end_silence_start = 0
+            if (self.speech_end_silence_start
+                    and now - self.speech_end_silence_start >= self.post_speech_silence_duration):
+                self.frames.append(chunk)
+                self.clock.advance(len(chunk))
+                return self._stop()
+
+        if self.frames is not None:
+            self.frames.append(chunk)
+        else:
+            self.pre_recording_buffer.append(chunk)
+        self.clock.advance(len(chunk))
+        return None
+
+    def _stop(self):
+        audio = np.concatenate(self.frames) if self.frames else np.zeros(0, dtype=np.int16)
+        end = self.time()
+        self.frames = None
+        self.recording_stop = end
+        return OfflineSegment(max(0.0, end - len(audio) / SAMPLE_RATE), end, audio)
+
+    def _is_webrtc_speech(self, chunk, all_frames_must_be_true=False):
+        data = chunk.tobytes()
+        frames = len(chunk) // WEBRTC_FRAME_SAMPLES
+        speech_frames = 0
+        for index in range(frames):
+            frame = data[index * WEBRTC_FRAME_SAMPLES * 2:(index + 1) * WEBRTC_FRAME_SAMPLES * 2]
+            if self.webrtc_vad.is_speech(frame, SAMPLE_RATE):
+                speech_frames += 1
+                if not all_frames_must_be_true:
+                    return True
+        return all_frames_must_be_true and frames > 0 and speech_frames == frames
+
+    def _silero_probability(self, chunk):
+        import torch
+
+        if self._silero_reset:
+            self.silero_model.reset_states()
+            self._silero_reset = False
+        audio = chunk.astype(np.float32) / INT16_MAX_ABS_VALUE
+        if len(audio) % SILERO_WINDOW_SAMPLES:
+            audio = np.pad(audio, (0, SILERO_WINDOW_SAMPLES - len(audio) % SILERO_WINDOW_SAMPLES))
+        windows = audio.reshape(-1, SILERO_WINDOW_SAMPLES)
+        start = time.perf_counter()
+        with torch.inference_mode():
+            probability = max(
+                self.silero_model(torch.from_numpy(window), SAMPLE_RATE).item() for window in windows)
+        metrics.VAD_INFERENCE.labels("silero").observe((time.perf_counter() - start) / len(windows))
+        return probability
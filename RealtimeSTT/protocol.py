@@ -0,0 +1,217 @@
+"""
+Wire formats of the data websocket.
+
+The server used to send the utterance audio of transcription_start as
+base64 inside a JSON message, which inflates the payload by a third and
+costs a JSON parse of megabytes per utterance on the client. Audio events
+are now sent as one binary websocket message: a fixed little-endian
+header followed by the raw PCM samples.
+
+    offset  size  field
+    0       4     magic b"RSTT"
+    4       1     protocol version
+    5       1     message type (MESSAGE_TYPES)
+    6       1     sample format (SAMPLE_FORMATS)
+    7       1     channels
+    8       4     sample rate
+    12      4     payload length in bytes
+
+Data clients choose how they receive audio events when connecting, with
+the audio_events query parameter of the data websocket URL (see
+AUDIO_EVENT_MODES), e.g. ws://127.0.0.1:8012?audio_events=int16.
+
+In the other direction, clients originally prefixed every audio chunk
+with a 4 byte length and JSON metadata. A client can instead describe its
+stream once with an audio_format text message:
+
+    {"type": "audio_format", "sample_rate": 48000, "format": "int16", "channels": 1}
+
+after which every binary message is plain PCM in that format, or a piece
+of a compressed stream for the formats in COMPRESSED_FORMATS. The message
+may be sent again whenever the parameters change. Until a session got
+one, binary messages are read with the length prefixed framing.
+"""
+
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+import collections
+import struct
+import json
+import numpy as np
+
+MAGIC = b"RSTT"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBII")
+
+MESSAGE_TYPES = {
+    "transcription_start": 1,
+}
+MESSAGE_NAMES = {code: name for name, code in MESSAGE_TYPES.items()}
+
+SAMPLE_FORMATS = {
+    "int16": (1, np.dtype("<i2")),
+    "float32": (2, np.dtype("<f4")),
+}
+SAMPLE_FORMAT_NAMES = {code: name for name, (code, _) in SAMPLE_FORMATS.items()}
+
+# Compressed stream formats of the audio_format handshake (audio_codec.py)
+COMPRESSED_FORMATS = ("opus", "ogg_opus", "flac")
+
+# none: events without audio, json: the legacy base64 JSON message,
+# int16 / float32: binary frames with samples in that format
+AUDIO_EVENT_MODES = ("none", "json", "int16", "float32")
+DEFAULT_AUDIO_EVENT_MODE = "json"
+
+INT16_MAX_ABS_VALUE = 32768.0
+
+AudioFrame = collections.namedtuple(
+    "AudioFrame", "message_type sample_format channels sample_rate audio")
+
+AUDIO_FORMAT_MESSAGE = "audio_format"
+StreamFormat = collections.namedtuple("StreamFormat", "sample_rate sample_format channels")
+
+
+class ProtocolError(ValueError):
+    """Raised for messages that do not follow the data websocket protocol."""
+
+
+def convert_samples(audio, sample_format):
+    """
+    Converts float32 audio in [-1, 1] or int16 audio to the given sample
+    format. Returns the input unchanged if it already matches.
+    """
+    audio = np.asarray(audio)
+    dtype = SAMPLE_FORMATS[sample_format][1]
+    if audio.dtype == dtype:
+        return audio
+    if sample_format == "int16":
+        if audio.dtype.kind == "i":
+            return audio.astype(dtype)
+        scaled = np.clip(audio * INT16_MAX_ABS_VALUE, -32768, 32767)
+        return np.round(scaled).astype(dtype)
+    if audio.dtype.kind == "i":
+        return (audio / INT16_MAX_ABS_VALUE).astype(dtype)
+    return audio.astype(dtype)
+
+
+def encode_audio_frame(message_type, audio, sample_format="float32", sample_rate=16000, channels=1):
+    """
+    Encodes audio as one binary frame.
+
+    Args:
+        message_type (str): A key of MESSAGE_TYPES.
+        audio (np.ndarray): float32 in [-1, 1] or int16 samples,
+          interleaved if channels > 1.
+        sample_format (str): "int16" or "float32", the format on the wire.
+
+    Returns:
+        bytes: Header and payload.
+    """
+    payload = convert_samples(audio, sample_format).tobytes()
+    header = HEADER.pack(MAGIC, VERSION, MESSAGE_TYPES[message_type],
+                         SAMPLE_FORMATS[sample_format][0], channels,
+                         int(sample_rate), len(payload))
+    return header + payload
+
+
+def is_audio_frame(message):
+    """True for binary messages that start with the frame magic."""
+    return isinstance(message, (bytes, bytearray, memoryview)) and bytes(message[:4]) == MAGIC
+
+
+def decode_audio_frame(message):
+    """
+    Decodes a binary frame. The audio is a read-only view of the message
+    in the sample format of the frame, use convert_samples to normalize.
+
+    Raises:
+        ProtocolError: For a wrong magic, an unknown version, type or
+          format, or a truncated payload.
+    """
+    if len(message) < HEADER.size:
+        raise ProtocolError(f"Frame of {len(message)} bytes is shorter than the header")
+    magic, version, type_code, format_code, channels, sample_rate, length = HEADER.unpack_from(message)
+    if magic != MAGIC:
+        raise ProtocolError(f"Unknown frame magic {magic!r}")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported frame version {version}")
+    if type_code not in MESSAGE_NAMES:
+        raise ProtocolError(f"Unknown message type {type_code}")
+    if format_code not in SAMPLE_FORMAT_NAMES:
+        raise ProtocolError(f"Unknown sample format {format_code}")
+    if len(message) - HEADER.size != length:
+        raise ProtocolError(
+            f"Payload is {len(message) - HEADER.size} bytes, header says {length}")
+
+    sample_format = SAMPLE_FORMAT_NAMES[format_code]
+    audio = np.frombuffer(message, dtype=SAMPLE_FORMATS[sample_format][1], offset=HEADER.size)
+    return AudioFrame(MESSAGE_NAMES[type_code], sample_format, channels, sample_rate, audio)
+
+
+def parse_audio_events(path, default=DEFAULT_AUDIO_EVENT_MODE):
+    """
+    Returns the audio_events mode requested in a websocket request path
+    (or full URL). Unknown values fall back to the default.
+    """
+    values = parse_qs(urlparse(path or "").query).get("audio_events")
+    if values and values[-1] in AUDIO_EVENT_MODES:
+        return values[-1]
+    return default
+
+
+def with_audio_events(url, mode):
+    """Returns url with its audio_events query parameter set to mode."""
+    if mode not in AUDIO_EVENT_MODES:
+        raise ValueError(f"audio_events must be one of {AUDIO_EVENT_MODES}, got {mode!r}")
+    parsed = urlparse(url)
+    query = {key: value[-1] for key, value in parse_qs(parsed.query).items()}
+    query["audio_events"] = mode
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+def audio_format_message(sample_rate, sample_format="int16", channels=1):
+    """The audio_format handshake message announcing a raw PCM stream."""
+    return json.dumps({
+        "type": AUDIO_FORMAT_MESSAGE,
+        "sample_rate": int(sample_rate),
+        "format": sample_format,
+        "channels": int(channels),
+    })
+
+
+def parse_audio_format(data):
+    """
+    Validates a decoded audio_format message.
+
+    Returns:
+        StreamFormat
+
+    Raises:
+        ProtocolError: For missing or unsupported parameters.
+    """
+    try:
+        sample_rate = int(data["sample_rate"])
+        channels = int(data.get("channels", 1))
+    except (KeyError, TypeError, ValueError):
+        raise ProtocolError(f"Invalid audio_format message: {data}")
+    sample_format = data.get("format", "int16")
+    if sample_format not in SAMPLE_FORMATS and sample_format not in COMPRESSED_FORMATS:
+        raise ProtocolError(f"Unsupported sample format {sample_format!r}")
+    if sample_rate <= 0 or channels <= 0:
+        raise ProtocolError(f"Invalid sample rate {sample_rate} or channel count {channels}")
+    return StreamFormat(sample_rate, sample_format, channels)
+
+
+def decode_pcm(message, stream_format):
+    """
+    Returns a raw PCM message of the given StreamFormat as 16 bit mono
+    PCM. Mono int16, what the recorder consumes, is passed through as is.
+    """
+    if stream_format.sample_format == "int16" and stream_format.channels == 1:
+        return message
+    audio = np.frombuffer(message, dtype=SAMPLE_FORMATS[stream_format.sample_format][1])
+    if stream_format.channels > 1:
+        usable = len(audio) - len(audio) % stream_format.channels
+        audio = audio[:usable].reshape(-1, stream_format.channels).mean(axis=1)
+        if stream_format.sample_format == "int16":
+            audio = audio.astype(np.int16)
+    return convert_samples(audio, "int16").tobytes()
@@ -0,0 +1,195 @@
+"""
+Adaptive quality of service for realtime transcription.
+
+realtime_processing_pause, beam_size_realtime and realtime_model_type are
+chosen for a machine with headroom. Under load the realtime decodes get
+slower than the audio they transcribe, updates pile up and the recording
+worker falls behind until the audio queue overflows past
+allowed_latency_limit.
+
+QoSController watches two signals:
+
+- the real-time factor of the realtime decodes (decode seconds per second
+  of audio, smoothed; above 1 the model is slower than the speech)
+- the fill of the audio queue (depth / allowed_latency_limit)
+
+Under pressure it steps through the degradation levels one at a time,
+
+    normal -> longer_pause -> beam_1 -> smaller_model -> disabled
+
+and back up as the load drops. The recorder maps the levels to its
+settings, each level includes the ones before it. Hysteresis keeps the
+controller from flapping: it degrades only after the pressure lasted
+degrade_after seconds and recovers only after recover_after seconds of
+clearly lower load (the thresholds for both leave a dead band between
+them). A recovery that has to be undone within recover_after doubles the
+time the next recovery waits, up to max_recover_after.
+"""
+
+import threading
+import time
+
+QOS_LEVELS = ("normal", "longer_pause", "beam_1", "smaller_model", "disabled")
+
+# Decodes of shorter clips are not counted, their fixed overhead dominates
+MIN_DECODE_AUDIO_SECONDS = 1.0
+
+
+class QoSController:
+    """
+    Chooses the degradation level from decode times and queue fill, see
+    the module docstring. Thread-safe.
+    """
+    def __init__(self,
+                 levels=QOS_LEVELS,
+                 degrade_realtime_factor=1.0,
+                 recover_realtime_factor=0.5,
+                 degrade_queue_fill=0.5,
+                 recover_queue_fill=0.1,
+                 degrade_after=1.0,
+                 recover_after=5.0,
+                 max_recover_after=60.0,
+                 decode_timeout=5.0,
+                 smoothing=0.3,
+                 on_change=None,
+                 time_source=time.monotonic,
+                 ):
+        """
+        Args:
+            levels (tuple): Level names from best to most degraded, the
+              first one is the starting level.
+            degrade_realtime_factor, degrade_queue_fill: Either one above
+              its threshold is pressure.
+            recover_realtime_factor, recover_queue_fill: Both below their
+              thresholds is relief.
+            degrade_after, recover_after (float): Seconds pressure or
+              relief has to last before the level changes by one.
+            max_recover_after (float): Upper bound of the backed off
+              recover_after.
+            decode_timeout (float): Seconds after which the last decode no
+              longer counts, e.g. while realtime transcription is disabled
+              or nobody speaks.
+            smoothing (float): Weight of a new decode in the moving
+              average of the real-time factor.
+            on_change (callable): Called with the event dict of every
+              level change.
+            time_source (callable): Monotonic seconds.
+        """
+        self.levels = tuple(levels)
+        self.degrade_realtime_factor = degrade_realtime_factor
+        self.recover_realtime_factor = recover_realtime_factor
+        self.degrade_queue_fill = degrade_queue_fill
+        self.recover_queue_fill = recover_queue_fill
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.max_recover_after = max_recover_after
+        self.decode_timeout = decode_timeout
+        self.smoothing = smoothing
+        self.on_change = on_change
+        self.time_source = time_source
+
+        self.level = 0
+        self.realtime_factor = None
+        self.queue_fill = 0.0
+        self.changes = 0
+        self._last_decode = None
+        self._pressure_since = None
+        self._relief_since = None
+        self._recover_wait = recover_after
+        self._last_recovery = None
+        self._lock = threading.Lock()
+
+    @property
+    def level_name(self):
+        return self.levels[self.level]
+
+    def at_least(self, name):
+        """Whether the current level is name or a more degraded one."""
+        return name in self.levels and self.level >= self.levels.index(name)
+
+    def observe_decode(self, seconds, audio_seconds):
+        """Records a realtime decode of audio_seconds of audio."""
+        if audio_seconds < MIN_DECODE_AUDIO_SECONDS:
+            return
+        factor = seconds / audio_seconds
+        with self._lock:
+            if self.realtime_factor is None:
+                self.realtime_factor = factor
+            else:
+                self.realtime_factor += self.smoothing * (factor - self.realtime_factor)
+            self._last_decode = self.time_source()
+
+    def update(self, queue_fill):
+        """
+        Records the current audio queue fill and changes the level by one
+        if pressure or relief lasted long enough. Returns the event of
+        the change, None if the level stays.
+        """
+        with self._lock:
+            now = self.time_source()
+            self.queue_fill = queue_fill
+            factor = self.realtime_factor
+            if self._last_decode is None or now - self._last_decode > self.decode_timeout:
+                factor = None
+
+            pressure = ((factor is not None and factor > self.degrade_realtime_factor)
+                        or queue_fill > self.degrade_queue_fill)
+            relief = ((factor is None or factor < self.recover_realtime_factor)
+                      and queue_fill < self.recover_queue_fill)
+
+            event = None
+            if pressure and self.level < len(self.levels) - 1:
+                self._relief_since = None
+                if self._pressure_since is None:
+                    self._pressure_since = now
+                if now - self._pressure_since >= self.degrade_after:
+                    if self._last_recovery is not None and now - self._last_recovery < self._recover_wait:
+                        # The last recovery did not hold, wait longer next time
+                        self._recover_wait = min(self._recover_wait * 2, self.max_recover_after)
+                    else:
+                        self._recover_wait = self.recover_after
+                    event = self._change(now, 1, factor, queue_fill)
+            elif relief and self.level > 0:
+                self._pressure_since = None
+                if self._relief_since is None:
+                    self._relief_since = now
+                if now - self._relief_since >= self._recover_wait:
+                    self._last_recovery = now
+                    event = self._change(now, -1, factor, queue_fill)
+            else:
+                self._pressure_since = None
+                self._relief_since = None
+
+        if event and self.on_change:
+            self.on_change(event)
+        return event
+
+    def _change(self, now, step, factor, queue_fill):
+        previous = self.level_name
+        self.level += step
+        self.changes += 1
+        # The new settings have to be measured afresh
+        self.realtime_factor = None
+        self._last_decode = None
+        self._pressure_since = None
+        self._relief_since = None
+        return {
+            "level": self.level_name,
+            "previous_level": previous,
+            "direction": "degrade" if step > 0 else "recover",
+            "realtime_factor": factor,
+            "queue_fill": queue_fill,
+            "recover_after": self._recover_wait,
+            "timestamp": time.time(),
+        }
+
+    def snapshot(self):
+        """The current state as a dict, e.g. for a status endpoint."""
+        with self._lock:
+            return {
+                "level": self.level_name,
+                "realtime_factor": self.realtime_factor,
+                "queue_fill": self.queue_fill,
+                "changes": self.changes,
+                "recover_after": self._recover_wait,
+            }
@@ -0,0 +1,146 @@
+"""
+Streaming polyphase resampler.
+
+Resampling a live stream chunk by chunk with scipy.signal.resample (FFT
+based) or resample_poly treats every chunk as an isolated signal: the
+filter starts from silence at each chunk boundary, which costs CPU and
+adds clicks at every boundary. StreamingResampler instead keeps the
+filter history across chunks, so the concatenated output equals
+resampling the whole stream at once (delayed by half the filter length).
+
+The windowed sinc low-pass filter (the same design resample_poly uses)
+is split into one polyphase branch per output phase. The branches are
+computed once per rate pair and shared by all resamplers.
+"""
+
+import functools
+import math
+import numpy as np
+
+KAISER_BETA = 5.0
+HALF_LENGTH_FACTOR = 10
+
+
+@functools.lru_cache(maxsize=None)
+def polyphase_taps(input_rate, output_rate):
+    """
+    Returns (up, down, half_length, taps) for a rate pair. taps[p] holds
+    the time-reversed filter branch of phase p, so that an output sample
+    is the dot product of one branch with consecutive input samples.
+    """
+    divisor = math.gcd(int(input_rate), int(output_rate))
+    up, down = int(output_rate) // divisor, int(input_rate) // divisor
+    max_rate = max(up, down)
+    half_length = HALF_LENGTH_FACTOR * max_rate
+    length = 2 * half_length + 1
+
+    cutoff = 1.0 / max_rate
+    time_axis = np.arange(length) - half_length
+    filter_taps = np.sinc(cutoff * time_axis) * cutoff * np.kaiser(length, KAISER_BETA)
+    filter_taps *= up / filter_taps.sum()
+
+    branch_length = -(-length // up)
+    padded = np.zeros(branch_length * up)
+    padded[:length] = filter_taps
+    taps = padded.reshape(branch_length, up).T[:, ::-1]
+    taps = np.ascontiguousarray(taps, dtype=np.float32)
+    taps.setflags(write=False)
+    return up, down, half_length, taps
+
+
+class StreamingResampler:
+    """
+    Resamples a mono stream between two fixed rates, chunk by chunk.
+    """
+    def __init__(self, input_rate, output_rate):
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        self.up, self.down, self.half_length, self.taps = polyphase_taps(
+            self.input_rate, self.output_rate)
+        self.branch_length = self.taps.shape[1]
+        self.reset()
+
+    @property
+    def rates(self):
+        return (self.input_rate, self.output_rate)
+
+    def reset(self):
+        """Forgets the stream history, e.g. when a new stream starts."""
+        # Zero history acts as the silence before the stream starts
+        self._history = np.zeros(self.branch_length - 1, dtype=np.float32)
+        # Absolute index of the first history sample
+        self._history_start = -(self.branch_length - 1)
+        self._next_output = 0
+        # Sample type of the stream, flush() returns the same
+        self._dtype = np.float32
+
+    def process(self, samples):
+        """
+        Resamples the next chunk of the stream.
+
+        Args:
+            samples (np.ndarray or bytes): Mono audio. Bytes are read as
+              16 bit PCM.
+
+        Returns:
+            np.ndarray: The resampled audio available so far, int16 for
+            int16 input (rounded and clipped), float32 otherwise.
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+        is_int16 = samples.dtype == np.int16
+        self._dtype = np.int16 if is_int16 else np.float32
+
+        buffer = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        last_input = self._history_start + len(buffer) - 1
+
+        # Output k is centered on upsampled position k * down, its filter
+        # reaches half_length upsampled samples into the future
+        end = (last_input * self.up - self.half_length) // self.down + 1
+        outputs = np.arange(self._next_output, max(end, self._next_output), dtype=np.int64)
+        positions = outputs * self.down + self.half_length
+        phases = positions % self.up
+        starts = positions // self.up - (self.branch_length - 1) - self._history_start
+
+        # Read-only view of every window of branch_length input samples
+        windows = np.lib.stride_tricks.as_strided(
+            buffer, (max(len(buffer) - self.branch_length + 1, 0), self.branch_length),
+            (buffer.strides[0],) * 2, writeable=False)
+        if self.up == 1:
+            # Integer decimation: one branch, evenly spaced windows
+            if len(outputs):
+                resampled = np.einsum(
+                    "kt,t->k", windows[starts[0]:starts[-1] + 1:self.down], self.taps[0])
+            else:
+                resampled = np.zeros(0, dtype=np.float32)
+        else:
+            resampled = np.einsum("kt,kt->k", windows[starts], self.taps[phases])
+
+        # Keep the input the window of the next output starts at
+        self._next_output += len(outputs)
+        next_start = (self._next_output * self.down + self.half_length) // self.up - (self.branch_length - 1)
+        next_start = min(next_start, last_input + 1)
+        self._history = buffer[next_start - self._history_start:]
+        self._history_start = next_start
+
+        if is_int16:
+            return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+        return resampled.astype(np.float32, copy=False)
+
+    def flush(self):
+        """
+        Returns the remaining output by feeding the filter with silence,
+        int16 if the stream was int16.
+        """
+        tail = np.zeros(-(-self.half_length // self.up) + 1, dtype=self._dtype)
+        return self.process(tail)
+
+
+def ensure_resampler(resampler, input_rate, output_rate):
+    """
+    Returns resampler if it converts between the given rates, otherwise a
+    new StreamingResampler. For paths whose input rate may change.
+    """
+    if resampler is None or resampler.rates != (int(input_rate), int(output_rate)):
+        return StreamingResampler(input_rate, output_rate)
+    return resampler
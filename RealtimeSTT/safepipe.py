@@ -1,6 +1,7 @@
 import sys
 import multiprocessing as mp
-import queue
+import collections
+import concurrent.futures
 import threading
 import time
 import logging
@@ -10,6 +11,10 @@ import logging
 #                     format='[%(asctime)s] %(levelname)s:%(name)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bound for how long the reader thread blocks before it checks
+# whether close() was called. Incoming data wakes it immediately.
+READER_POLL_TIMEOUT = 0.5
+
 try:
     # Only set the start method if it hasn't been set already.
     if sys.platform.startswith('linux') or sys.platform == 'darwin':  # For Linux or macOS
@@ -23,109 +28,161 @@ except RuntimeError as e:
 class ParentPipe:
     """
     A thread-safe wrapper around the 'parent end' of a multiprocessing pipe.
-    All actual pipe operations happen in a dedicated worker thread, so it's safe
-    for multiple threads to call send(), recv(), or poll() on the same ParentPipe
-    without interfering.
+
+    A dedicated reader thread receives every incoming message into an inbox
+    and wakes threads waiting in recv() or poll() as soon as data arrives.
+    Replies of the form (request_id, payload) to a message sent with
+    request() are dispatched to that request's future instead, so several
+    requests can be in flight at once and complete in any order.
+    send() writes to the pipe directly from the calling thread under a lock,
+    so it's safe for multiple threads to call send(), recv(), or poll() on the
+    same ParentPipe without interfering.
     """
     def __init__(self, parent_synthesize_pipe):
         self.name = "ParentPipe"
         self._pipe = parent_synthesize_pipe  # The raw pipe.
         self._closed = False  # A flag to mark if close() has been called.
+        self._eof = False  # Set when the other end has closed.
+
+        # Serializes writes of concurrent senders.
+        self._send_lock = threading.Lock()
 
-        # The request queue for sending operations to the worker.
-        self._request_queue = queue.Queue()
+        # Received messages and the condition that waiters block on.
+        self._inbox = collections.deque()
+        self._condition = threading.Condition()
 
-        # This event signals the worker thread to stop.
+        # Pending requests: request_id => (future, on_reply callback).
+        self._requests = {}
+        self._wake_generation = 0
+
+        # This event signals the reader thread to stop.
         self._stop_event = threading.Event()
 
-        # Worker thread that executes actual .send(), .recv(), .poll() calls.
-        self._worker_thread = threading.Thread(
-            target=self._pipe_worker,
-            name=f"{self.name}_Worker",
+        # Reader thread that performs all .recv() calls on the raw pipe.
+        self._reader_thread = threading.Thread(
+            target=self._pipe_reader,
+            name=f"{self.name}_Reader",
             daemon=True
         )
-        self._worker_thread.start()
+        self._reader_thread.start()
 
-    def _pipe_worker(self):
+    def _pipe_reader(self):
         while not self._stop_event.is_set():
             try:
-                request = self._request_queue.get(timeout=0.1)
-            except queue.Empty:
-                continue
-
-            if request["type"] == "CLOSE":
-                # Exit worker loop on CLOSE request.
-                break
-
-            try:
-                if request["type"] == "SEND":
-                    data = request["data"]
-                    logger.debug("[%s] Worker: sending => %s", self.name, data)
-                    self._pipe.send(data)
-                    request["result_queue"].put(None)
-
-                elif request["type"] == "RECV":
-                    logger.debug("[%s] Worker: receiving...", self.name)
-                    data = self._pipe.recv()
-                    request["result_queue"].put(data)
-
-                elif request["type"] == "POLL":
-                    timeout = request.get("timeout", 0.0)
-                    logger.debug("[%s] Worker: poll() with timeout: %s", self.name, timeout)
-                    result = self._pipe.poll(timeout)
-                    request["result_queue"].put(result)
-
+                # poll() returns as soon as data arrives, the timeout only
+                # bounds how long close() waits for this thread.
+                if not self._pipe.poll(READER_POLL_TIMEOUT):
+                    continue
+                data = self._pipe.recv()
             except (EOFError, BrokenPipeError, OSError) as e:
                 # When the other end has closed or an error occurs,
-                # log and notify the waiting thread.
-                logger.debug("[%s] Worker: pipe closed or error occurred (%s). Shutting down.", self.name, e)
-                request["result_queue"].put(None)
+                # log and wake all waiting threads.
+                logger.debug("[%s] Reader: pipe closed or error occurred (%s). Shutting down.", self.name, e)
                 break
-
-            except Exception as e:
-                logger.exception("[%s] Worker: unexpected error.", self.name)
-                request["result_queue"].put(e)
+            except Exception:
+                logger.exception("[%s] Reader: unexpected error.", self.name)
                 break
 
-        logger.debug("[%s] Worker: stopping.", self.name)
-        try:
-            self._pipe.close()
-        except Exception as e:
-            logger.debug("[%s] Worker: error during pipe close: %s", self.name, e)
+            if self._dispatch_reply(data):
+                continue
+
+            with self._condition:
+                self._inbox.append(data)
+                self._condition.notify_all()
+
+        logger.debug("[%s] Reader: stopping.", self.name)
+        with self._condition:
+            self._eof = True
+            self._condition.notify_all()
+            pending = list(self._requests.values())
+            self._requests.clear()
+        for future, _ in pending:
+            if not future.done():
+                try:
+                    future.set_exception(EOFError("Pipe closed before reply"))
+                except concurrent.futures.InvalidStateError:
+                    pass
+
+    def _dispatch_reply(self, data):
+        """
+        Completes the future of the request data replies to.
+        Returns False if data is not a reply to a pending request.
+        """
+        if not (isinstance(data, tuple) and len(data) == 2):
+            return False
+        with self._condition:
+            try:
+                pending = self._requests.pop(data[0], None)
+            except TypeError:  # unhashable first element, not a reply
+                return False
+        if pending is None:
+            return False
+        future, on_reply = pending
+        if on_reply:
+            try:
+                on_reply(data[0])
+            except Exception:
+                logger.exception("[%s] Reader: error in reply callback.", self.name)
+        if not future.done():
+            try:
+                future.set_result(data[1])
+            except concurrent.futures.InvalidStateError:
+                pass  # cancelled concurrently
+        return True
 
     def send(self, data):
         """
-        Synchronously asks the worker thread to perform .send().
+        Sends data to the other end of the pipe.
         """
         if self._closed:
             logger.debug("[%s] send() called but pipe is already closed", self.name)
             return
         logger.debug("[%s] send() requested with: %s", self.name, data)
-        result_queue = queue.Queue()
-        request = {
-            "type": "SEND",
-            "data": data,
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        result_queue.get()  # Wait until sending completes.
+        try:
+            with self._send_lock:
+                self._pipe.send(data)
+        except (EOFError, BrokenPipeError, OSError) as e:
+            logger.debug("[%s] send() failed, pipe closed (%s)", self.name, e)
+            return
         logger.debug("[%s] send() completed", self.name)
 
+    def request(self, request_id, data, on_reply=None):
+        """
+        Sends data and returns a concurrent.futures.Future that receives the
+        payload of the (request_id, payload) reply.
+
+        Cancelling the future only abandons the result. on_reply(request_id)
+        is still called once the reply arrives, e.g. to release resources
+        the other end was using for the request.
+        """
+        future = concurrent.futures.Future()
+        with self._condition:
+            if self._closed or self._eof:
+                future.set_exception(EOFError("Pipe is closed"))
+                return future
+            self._requests[request_id] = (future, on_reply)
+        logger.debug("[%s] request() %s", self.name, request_id)
+        try:
+            with self._send_lock:
+                self._pipe.send(data)
+        except (EOFError, BrokenPipeError, OSError) as e:
+            with self._condition:
+                self._requests.pop(request_id, None)
+            future.set_exception(EOFError(f"Pipe closed ({e})"))
+        return future
+
     def recv(self):
         """
-        Synchronously asks the worker to perform .recv() and returns the data.
+        Blocks until a message is available and returns it. Returns None if
+        the pipe is closed and no message is left.
         """
         if self._closed:
             logger.debug("[%s] recv() called but pipe is already closed", self.name)
             return None
         logger.debug("[%s] recv() requested", self.name)
-        result_queue = queue.Queue()
-        request = {
-            "type": "RECV",
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        data = result_queue.get()
+        with self._condition:
+            self._condition.wait_for(lambda: self._inbox or self._eof or self._closed)
+            data = self._inbox.popleft() if self._inbox else None
 
         # Log a preview for huge byte blobs.
         if isinstance(data, tuple) and len(data) == 2 and isinstance(data[1], bytes):
@@ -137,40 +194,49 @@ class ParentPipe:
 
     def poll(self, timeout=0.0):
         """
-        Synchronously checks whether data is available.
-        Returns True if data is ready, or False otherwise.
+        Waits up to timeout seconds for data to become available.
+        Returns True if data is ready, or False otherwise. Returns early with
+        False when wake_waiters() is called, so callers can re-check their
+        own stop conditions.
         """
         if self._closed:
             return False
-        logger.debug("[%s] poll() requested with timeout: %s", self.name, timeout)
-        result_queue = queue.Queue()
-        request = {
-            "type": "POLL",
-            "timeout": timeout,
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        try:
-            # Use a slightly longer timeout to give the worker a chance.
-            result = result_queue.get(timeout=timeout + 0.1)
-        except queue.Empty:
-            result = False
+        with self._condition:
+            generation = self._wake_generation
+            self._condition.wait_for(
+                lambda: self._inbox or self._eof or self._closed
+                or self._wake_generation != generation,
+                timeout)
+            result = bool(self._inbox)
         logger.debug("[%s] poll() returning => %s", self.name, result)
         return result
 
+    def wake_waiters(self):
+        """
+        Wakes all threads currently blocked in poll(), e.g. after an abort
+        was requested.
+        """
+        with self._condition:
+            self._wake_generation += 1
+            self._condition.notify_all()
+
     def close(self):
         """
-        Closes the pipe and stops the worker thread. The _closed flag makes
+        Closes the pipe and stops the reader thread. The _closed flag makes
         sure no further operations are attempted.
         """
         if self._closed:
             return
         logger.debug("[%s] close() called", self.name)
-        self._closed = True
-        stop_request = {"type": "CLOSE", "result_queue": queue.Queue()}
-        self._request_queue.put(stop_request)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
         self._stop_event.set()
-        self._worker_thread.join()
+        self._reader_thread.join()
+        try:
+            self._pipe.close()
+        except Exception as e:
+            logger.debug("[%s] error during pipe close: %s", self.name, e)
         logger.debug("[%s] closed", self.name)
 
 
@@ -0,0 +1,109 @@
+"""
+Shared memory transport for audio sent to the transcription worker.
+
+Sending a float32 numpy array through a multiprocessing pipe pickles and
+copies the whole clip across the process boundary. SharedAudioPool
+instead keeps a fixed number of audio slots in one shared memory block.
+The parent writes a clip into a free slot once and only sends a small
+SharedAudioDescriptor (pool, slot, offset, length) through the pipe. The
+worker attaches to the block by the pool spec the descriptor carries and
+reads a zero-copy numpy view.
+
+A slot stays reserved until the parent releases it, which it does once
+the worker replied to the request that used it or the request failed.
+"""
+
+from multiprocessing import shared_memory
+from collections import namedtuple
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger("realtimestt")
+
+SHARED_AUDIO_SLOTS = 4
+
+# Requests a single recorder can have in flight at once: a final, an
+# early and a realtime transcription.
+SHARED_AUDIO_SLOTS_PER_RECORDER = 3
+
+SharedAudioDescriptor = namedtuple("SharedAudioDescriptor", ["pool", "slot", "offset", "length"])
+
+
+class SharedAudioPool:
+    """
+    A pool of fixed size float32 audio slots in one shared memory block.
+    """
+    def __init__(self, slot_samples, num_slots=SHARED_AUDIO_SLOTS, name=None):
+        """
+        Creates a new pool (name=None) or attaches to an existing one.
+
+        Args:
+            slot_samples (int): Maximum number of samples per slot.
+            num_slots (int): Number of slots in the pool.
+            name (str, optional): Name of an existing shared memory block
+              to attach to.
+        """
+        self.slot_samples = int(slot_samples)
+        self.num_slots = int(num_slots)
+        self.owner = name is None
+        size = self.slot_samples * self.num_slots * np.dtype(np.float32).itemsize
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self._samples = np.ndarray(
+            (self.num_slots * self.slot_samples,), dtype=np.float32, buffer=self._shm.buf)
+        self._free_slots = list(range(self.num_slots))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def attach(cls, spec):
+        """Attaches to the pool described by spec() of the owning pool."""
+        name, slot_samples, num_slots = spec
+        return cls(slot_samples, num_slots, name=name)
+
+    def spec(self):
+        """Returns the (name, slot_samples, num_slots) needed by attach()."""
+        return (self.name, self.slot_samples, self.num_slots)
+
+    def write(self, audio):
+        """
+        Copies audio into a free slot.
+
+        Returns:
+            SharedAudioDescriptor or None if the clip does not fit into a
+            slot or all slots are in use. Callers then send the array itself.
+        """
+        length = len(audio)
+        if length > self.slot_samples:
+            return None
+        with self._lock:
+            if not self._free_slots:
+                return None
+            slot = self._free_slots.pop()
+        offset = slot * self.slot_samples
+        self._samples[offset:offset + length] = audio
+        return SharedAudioDescriptor(self.spec(), slot, offset, length)
+
+    def view(self, descriptor):
+        """Returns a zero-copy view of the audio a descriptor points to."""
+        offset = descriptor.offset
+        return self._samples[offset:offset + descriptor.length]
+
+    def release(self, descriptor):
+        """Makes the slot of descriptor available for the next write."""
+        with self._lock:
+            if descriptor.slot not in self._free_slots:
+                self._free_slots.append(descriptor.slot)
+
+    def close(self):
+        """Detaches from the shared memory block and removes it if owned."""
+        self._samples = None
+        try:
+            self._shm.close()
+            if self.owner:
+                self._shm.unlink()
+        except (BufferError, FileNotFoundError, OSError) as e:
+            logger.debug(f"Error closing shared audio memory: {e}")
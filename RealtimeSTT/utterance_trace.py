@@ -0,0 +1,136 @@
+"""
+Latency timeline of single utterances.
+
+The recorder keeps one UtteranceTrace per recording and stamps it with
+time.monotonic() as the utterance passes the stages of the pipeline:
+
+- speech_start: first audio chunk WebRTC VAD flags as speech
+- vad_start: voice activity confirmed, recording starts (on_vad_start)
+- turn_detection_start: speech ended, the silence countdown started
+  (on_turn_detection_start). Speech resuming and ending again moves it.
+- early_request: the early transcription request was sent
+- recording_stop: stop() was called
+- final_request: the final transcription request was sent (missing when
+  the early transcription was used)
+- decode_start / decode_end: the transcription worker decoded the audio
+  that produced the final text
+- result: the final text is handed to the caller
+
+The end of speech is turn_detection_start, or recording_stop if the
+recording was stopped by hand. The time from there to result is the
+latency a voice agent waits for, the value to tune
+post_speech_silence_duration and early_transcription_on_silence with.
+
+Finished traces are passed to the on_utterance_trace callback of the
+recorder and/or appended to a JSON lines file (utterance_trace_file).
+"""
+
+import collections
+import threading
+import json
+import math
+import time
+
+TRACE_STAGES = (
+    "speech_start",
+    "vad_start",
+    "turn_detection_start",
+    "early_request",
+    "recording_stop",
+    "final_request",
+    "decode_start",
+    "decode_end",
+    "result",
+)
+DEFAULT_PERCENTILES = (50, 90, 99)
+# Latencies kept for the percentiles of a LatencyStats
+DEFAULT_LATENCY_WINDOW = 1000
+
+
+class UtteranceTrace:
+    """Monotonic timestamps of the stages of one utterance."""
+    def __init__(self, utterance_id):
+        self.utterance_id = utterance_id
+        self.stages = {}
+        self.status = None
+        # Wall clock time of the trace's creation, to find it in logs
+        self.created = time.time()
+
+    def mark(self, stage, timestamp=None):
+        """Stamps a stage. A stage marked again keeps the later time."""
+        self.stages[stage] = time.monotonic() if timestamp is None else timestamp
+
+    def end_of_speech(self):
+        return self.stages.get("turn_detection_start", self.stages.get("recording_stop"))
+
+    def latency(self):
+        """Seconds from the end of speech to the final text, or None."""
+        end_of_speech, result = self.end_of_speech(), self.stages.get("result")
+        if end_of_speech is None or result is None:
+            return None
+        return result - end_of_speech
+
+    def to_dict(self):
+        """The trace as a JSON serializable record."""
+        origin = min(self.stages.values(), default=0.0)
+        latency = self.latency()
+        return {
+            "utterance_id": self.utterance_id,
+            "status": self.status,
+            "created": round(self.created, 3),
+            "stages": {stage: round(timestamp, 6) for stage, timestamp in
+                       sorted(self.stages.items(), key=lambda item: item[1])},
+            # The same, in seconds since the first stage
+            "offsets": {stage: round(timestamp - origin, 4) for stage, timestamp in
+                        sorted(self.stages.items(), key=lambda item: item[1])},
+            "end_of_speech_latency": None if latency is None else round(latency, 4),
+        }
+
+
+class JsonlTraceSink:
+    """Appends trace records to a file, one JSON object per line."""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, record):
+        line = json.dumps(record)
+        with self.lock:
+            if self.file:
+                self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+class LatencyStats:
+    """Percentiles over the latest `window` latencies (thread-safe)."""
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        self.latencies = collections.deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+            self.count += 1
+
+    def percentiles(self, points=DEFAULT_PERCENTILES):
+        """
+        Returns {"count": ..., "window": ..., "p50": ..., ...} in seconds
+        (nearest rank, None while there are no latencies).
+        """
+        with self.lock:
+            latencies, count = sorted(self.latencies), self.count
+        result = {"count": count, "window": len(latencies)}
+        for point in points:
+            if latencies:
+                index = min(len(latencies) - 1, max(0, math.ceil(point / 100 * len(latencies)) - 1))
+                result[f"p{point:g}"] = round(latencies[index], 4)
+            else:
+                result[f"p{point:g}"] = None
+        return result
@@ -0,0 +1,194 @@
+"""
+Long-lived Silero VAD worker thread.
+
+The recorder hands audio chunks to submit() without waiting. The worker
+drains everything pending in one go, cuts it into the 512 sample windows
+Silero expects and runs them back to back. The speech probability of
+the batch is then published together with the capture time of its newest
+chunk. Readers get it through latest() or the on_probability callback,
+without blocking on inference.
+
+The input queue is bounded: if inference falls behind, the oldest
+pending chunks are dropped so the published probability always refers
+to recent audio. submit(wait=True) instead blocks until the chunk has
+been processed and its probability published, for audio fed faster than
+real time on the audio clock: no chunk is dropped and every decision
+refers to the chunk just submitted.
+"""
+
+import collections
+import threading
+import logging
+import time
+import numpy as np
+
+from . import metrics
+
+logger = logging.getLogger("realtimestt")
+
+SILERO_SAMPLE_RATE = 16000
+SILERO_WINDOW_SAMPLES = 512
+INIT_MAX_PENDING_CHUNKS = 8
+INT16_MAX_ABS_VALUE = 32768.0
+
+
+class SileroVADWorker:
+    """
+    Runs Silero VAD inference on a dedicated thread.
+    """
+    def __init__(self, model, sample_rate=SILERO_SAMPLE_RATE,
+                 on_probability=None, max_pending_chunks=INIT_MAX_PENDING_CHUNKS):
+        """
+        Args:
+            model: The loaded Silero VAD model (torch or onnx wrapper).
+            sample_rate (int): Sample rate of the submitted 16 bit chunks.
+              Audio at other rates than 16000 Hz is resampled.
+            on_probability (callable, optional): Called from the worker
+              thread with (probability, timestamp) for every processed
+              batch. Never called for audio submitted before the last
+              clear() or reset() once that returned, the call holds the
+              worker's lock, so it must not wait for other threads using
+              the worker.
+            max_pending_chunks (int): Number of chunks queued at most before
+              the oldest ones are dropped.
+        """
+        self.model = model
+        self.sample_rate = sample_rate
+        self.on_probability = on_probability
+        self._pending = collections.deque(maxlen=max_pending_chunks)
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._reset_requested = False
+        self._latest = None
+        self._stopped = False
+        # Sequence numbers of the last submitted and the last processed
+        # (or cleared) chunk, for submit(wait=True)
+        self._submitted = 0
+        self._processed = 0
+        self.dropped_chunks = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, chunk, timestamp=None, wait=False):
+        """
+        Queues a chunk of 16 bit audio bytes for inference. With wait=True
+        returns only once the chunk was processed and on_probability was
+        called (or the chunk was cleared, or the worker stopped).
+        """
+        with self._condition:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped_chunks += 1
+                metrics.DROPPED_CHUNKS.labels("silero_vad").inc()
+            self._submitted += 1
+            sequence = self._submitted
+            self._pending.append((chunk, timestamp or time.time()))
+            self._condition.notify_all()
+            if wait:
+                self._condition.wait_for(
+                    lambda: self._processed >= sequence or self._stopped)
+
+    def latest(self):
+        """
+        Returns (probability, timestamp) of the last processed batch, or
+        None if no audio was processed since the last clear() or reset().
+        """
+        return self._latest
+
+    def clear(self):
+        """Drops pending audio and forgets the last probability."""
+        with self._condition:
+            self._pending.clear()
+            self._remainder = np.zeros(0, dtype=np.float32)
+            self._generation += 1
+            self._latest = None
+            self._processed = self._submitted
+            self._condition.notify_all()
+
+    def reset(self):
+        """Like clear(), also resets the model state before the next batch."""
+        with self._condition:
+            self._reset_requested = True
+        self.clear()
+
+    def stop(self):
+        """Stops the worker thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self.thread.join()
+
+    def _to_windows(self, chunks, generation):
+        """
+        Converts chunks to float32 16 kHz audio cut into full windows,
+        continuing the samples left over by the previous batch. Returns
+        None if the chunks were cleared in the meantime.
+        """
+        pcm_data = np.frombuffer(b"".join(chunks), dtype=np.int16)
+        if self.sample_rate != SILERO_SAMPLE_RATE:
+            from scipy import signal
+            pcm_data = signal.resample_poly(pcm_data, SILERO_SAMPLE_RATE, self.sample_rate)
+        audio = pcm_data.astype(np.float32) / INT16_MAX_ABS_VALUE
+        # clear() resets the remainder under the lock as well
+        with self._condition:
+            if generation != self._generation:
+                return None
+            audio = np.concatenate((self._remainder, audio))
+            usable = len(audio) - len(audio) % SILERO_WINDOW_SAMPLES
+            self._remainder = audio[usable:]
+        return audio[:usable].reshape(-1, SILERO_WINDOW_SAMPLES)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                chunks, timestamps = zip(*self._pending)
+                self._pending.clear()
+                sequence = self._submitted
+                generation = self._generation
+                reset, self._reset_requested = self._reset_requested, False
+
+            try:
+                self._process(chunks, timestamps, generation, reset)
+            finally:
+                with self._condition:
+                    self._processed = max(self._processed, sequence)
+                    self._condition.notify_all()
+
+    def _process(self, chunks, timestamps, generation, reset):
+        import torch
+
+        try:
+            if reset:
+                self.model.reset_states()
+            windows = self._to_windows(chunks, generation)
+            if windows is None or not len(windows):
+                return
+            # Silero is stateful, consecutive windows of one stream
+            # run back to back instead of side by side in a batch
+            start = time.perf_counter()
+            with torch.inference_mode():
+                windows = torch.from_numpy(windows)
+                probability = max(
+                    self.model(window, SILERO_SAMPLE_RATE).item() for window in windows)
+            metrics.VAD_INFERENCE.labels("silero").observe(
+                (time.perf_counter() - start) / len(windows))
+        except Exception as e:
+            logger.error(f"Error in Silero VAD worker: {e}", exc_info=True)
+            return
+
+        # Publishing under the lock keeps a clear() from slipping in
+        # between the check and the callback
+        with self._condition:
+            if generation != self._generation:
+                # Audio submitted before a clear() or reset()
+                return
+            self._latest = (probability, timestamps[-1])
+            if self.on_probability:
+                try:
+                    self.on_probability(probability, timestamps[-1])
+                except Exception as e:
+                    logger.error(f"Error in Silero VAD probability callback: {e}", exc_info=True)
@@ -0,0 +1,145 @@
+"""
+Outbound message queue and sender task of one data connection.
+
+Sending to all data clients from a single task let one slow or stalled
+client delay the messages of everyone else. Every connection now has its
+own ClientSender: messages are queued without blocking and a sender task
+per connection writes them to its websocket.
+
+When a client falls behind (more than max_depth messages queued), queued
+messages that a newer one supersedes (realtime updates) are dropped down
+to the newest. Other messages (fullSentence, events) are never
+dropped. A client whose oldest queued message is older than max_lag
+seconds, or that is stuck in a single send for as long, is disconnected:
+put() checks the queue, the sender task gives every send only the lag
+its message has left, so a stalled client of a quiet session is
+disconnected as well.
+"""
+
+import collections
+import asyncio
+import time
+
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_MAX_LAG = 10.0
+# Close code for clients that do not keep up
+SLOW_CLIENT_CLOSE_CODE = 1008
+
+
+class ClientSender:
+    """
+    Queue and sender task of one websocket. put() must be called on the
+    event loop of the websocket (use loop.call_soon_threadsafe from other
+    threads).
+    """
+    def __init__(self, websocket, max_depth=DEFAULT_MAX_DEPTH, max_lag=DEFAULT_MAX_LAG, on_send=None):
+        self.websocket = websocket
+        self.max_depth = max_depth
+        self.max_lag = max_lag
+        self.on_send = on_send
+        # (message, coalesce, enqueue time)
+        self.queue = collections.deque()
+        self.ready = asyncio.Event()
+        self.task = None
+        self.closed = False
+        # Start of the send in progress, None while idle
+        self.sending_since = None
+
+        # Statistics
+        self.sent = 0
+        self.coalesced = 0
+        self.max_queued = 0
+        self.last_send_seconds = 0.0
+        self.disconnected_for_lag = False
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    def put(self, message, coalesce=False):
+        """
+        Queues a message.
+
+        Args:
+            coalesce (bool): The message supersedes queued messages with
+              coalesce=True (realtime updates), which are dropped while the
+              client is behind.
+        """
+        if self.closed:
+            return
+        now = time.monotonic()
+        if len(self.queue) >= self.max_depth:
+            self._coalesce()
+        if self.lag(now) > self.max_lag:
+            self.disconnect()
+            return
+        self.queue.append((message, coalesce, now))
+        self.max_queued = max(self.max_queued, len(self.queue))
+        self.ready.set()
+
+    def _coalesce(self):
+        # Keep every message that can not be coalesced and the newest one
+        # that can
+        newest = next((entry for entry in reversed(self.queue) if entry[1]), None)
+        kept = collections.deque(entry for entry in self.queue if not entry[1] or entry is newest)
+        self.coalesced += len(self.queue) - len(kept)
+        self.queue = kept
+
+    def lag(self, now=None):
+        """Age of the oldest queued or in flight message in seconds."""
+        now = time.monotonic() if now is None else now
+        oldest = self.queue[0][2] if self.queue else now
+        if self.sending_since is not None:
+            oldest = min(oldest, self.sending_since)
+        return now - oldest
+
+    def disconnect(self):
+        """Drops the queue and closes a client that does not keep up."""
+        if self.closed:
+            return
+        self.disconnected_for_lag = True
+        self.close()
+        asyncio.ensure_future(self.websocket.close(SLOW_CLIENT_CLOSE_CODE, "Client too slow"))
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.ready.set()
+
+    async def run(self):
+        while not self.closed:
+            if not self.queue:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            message, _, queued_time = self.queue.popleft()
+            if self.on_send:
+                self.on_send(message)
+            self.sending_since = time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send(message),
+                    max(self.max_lag - (self.sending_since - queued_time), 0))
+            except asyncio.TimeoutError:
+                self.disconnect()
+                break
+            except Exception:
+                # The connection is closed (or broken), the data handler
+                # cleans up the session
+                self.close()
+                break
+            finally:
+                self.last_send_seconds = time.monotonic() - self.sending_since
+                self.sending_since = None
+            self.sent += 1
+
+    def stats(self):
+        return {
+            "queued": len(self.queue),
+            "max_queued": self.max_queued,
+            "lag": round(self.lag(), 3),
+            "last_send_seconds": round(self.last_send_seconds, 4),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "disconnected_for_lag": self.disconnected_for_lag,
+        }
@@ -25,7 +25,7 @@ stt-server [OPTIONS]
     - `-d, --data, --data_port`: WebSocket data port; default 8012.
     - `-w, --wake_words`: Wake word(s) to trigger listening; default "".
     - `-D, --debug`: Enable debug logging.
-    - `-W, --write`: Save audio to WAV file.
+    - `-W, --write`: Save audio to WAV files, one per session.
     - `-s, --silence_timing`: Enable dynamic silence duration for sentence detection; default True. 
     - `-b, --batch, --batch_size`: Batch size for inference; default 16.
     - `--root, --download_root`: Specifies the root path were the Whisper models are downloaded to.
@@ -65,6 +65,11 @@ stt-server [OPTIONS]
     - `--suppress_tokens`: Suppress tokens during transcription.
     - `--allowed_latency_limit`: Allowed latency limit for real-time transcription.
     - `--faster_whisper_vad_filter`: Enable VAD filter for Faster Whisper; default False.
+    - `--send_queue_depth`: Queued messages per data client before realtime updates are coalesced; default 64.
+    - `--send_max_lag`: Seconds a data client may fall behind before it is disconnected; default 10.
+    - `--metrics_port`: Serve Prometheus metrics on http://127.0.0.1:PORT/metrics; default off.
+    - `--trace_file`: Append the latency trace of every utterance to this JSON lines file; default off.
+    - `--adaptive_qos`: Degrade the realtime transcription of a session under load and recover as it drops; default off.
 
 
 ### WebSocket Interface:
@@ -72,10 +77,26 @@ The server supports two WebSocket connections:
 1. **Control WebSocket**: Used to send and receive commands, such as setting parameters or calling recorder methods.
 2. **Data WebSocket**: Used to send audio data for transcription and receive real-time transcription updates.
 
-The server will broadcast real-time transcription updates to all connected clients on the data WebSocket.
+Every data connection is a separate session with its own recorder (voice activity detection and recording state), while all sessions share one set of loaded transcription models. Each client only receives the transcription updates of its own audio. After connecting, the server sends `{"type": "session", "session_id": "..."}` on the data WebSocket. Control commands can pass this `session_id` to address a session; it may be omitted while only one session is connected.
+
+Every data client has its own outbound queue, so a slow client does not delay the others. While a client is behind, queued `realtime` updates are coalesced to the newest; other messages are never dropped, and a client that stays behind for `--send_max_lag` seconds is disconnected. The control command `{"command": "send_stats"}` returns the queue statistics of every session (or of the given `session_id`).
+
+Every utterance gets a latency trace with the time of each pipeline stage, from the first speech frame to the delivery of the final text (see `RealtimeSTT.utterance_trace`). The control command `{"command": "latency_stats"}` returns the percentiles of the end of speech to final text latency over all sessions and per session; `--trace_file` writes the traces, tagged with their `session_id`.
+
+With `--adaptive_qos` every session's recorder lowers its realtime transcription quality step by step while the realtime decodes run slower than real time or its audio queue fills up (longer pause, beam size 1, the `tiny` model, no realtime updates) and raises it again as the load drops (see `RealtimeSTT.qos`). Every change is sent to the client as `{"type": "qos_change", "level": "beam_1", "previous_level": "longer_pause", "direction": "degrade", ...}` and counted in the `realtimestt_qos_changes_total` metric.
+
+Events that carry audio (`transcription_start`) are sent in the format the client asks for with the `audio_events` query parameter of the data WebSocket URL, e.g. `ws://127.0.0.1:8012?audio_events=int16`:
+- `json` (default): the legacy JSON message with base64 encoded float32 samples in `audio_bytes_base64`.
+- `int16` / `float32`: a binary message with a typed header and the raw samples (see `RealtimeSTT.protocol`).
+- `none`: the JSON event without audio.
+
+Audio is sent to the data WebSocket as binary messages. By default every message starts with a 4 byte little-endian length and JSON metadata (`{"sampleRate": 48000}`) followed by 16-bit PCM. Alternatively the client sends the stream parameters once as a text message, `{"type": "audio_format", "sample_rate": 48000, "format": "int16", "channels": 1}` (format `int16` or `float32`), and then plain PCM in binary messages. The server confirms with `{"type": "audio_format", "status": "success"}`. The message can be repeated when the parameters change.
+
+With PyAV installed (`pip install av`) the format can also be a compressed stream, which the server decodes per session: `opus` (raw Opus packets, one per message), `ogg_opus` (an Ogg Opus stream) or `flac` (a native FLAC stream), see `RealtimeSTT.audio_codec`.
 """
 
 from .install_packages import check_and_install_packages
+from .client_sender import ClientSender
 from difflib import SequenceMatcher
 from collections import deque
 from datetime import datetime
@@ -92,7 +113,6 @@ send_recorded_chunk = False
 log_incoming_chunks = False
 silence_timing = False
 writechunks = False
-wav_file = None
 
 hard_break_even_on_background_noise = 3.0
 hard_break_even_on_background_noise_min_texts = 3
@@ -100,12 +120,14 @@ hard_break_even_on_background_noise_min_similarity = 0.99
 hard_break_even_on_background_noise_min_chars = 15
 
 
-text_time_deque = deque()
 loglevel = logging.WARNING
 
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 
+# Longest wait for a session's recorder to acknowledge abort() on disconnect
+SESSION_ABORT_TIMEOUT = 1.0
+
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -150,23 +172,28 @@ print(f"{bcolors.BOLD}{bcolors.OKCYAN}Starting server, please wait...{bcolors.EN
 from colorama import init, Fore, Style
 init()
 
-from RealtimeSTT import AudioToTextRecorder
-from scipy.signal import resample
-import numpy as np
+from RealtimeSTT import AudioToTextRecorder, TranscriptionEngine
+from RealtimeSTT.resampler import ensure_resampler
+from RealtimeSTT import protocol, audio_codec, metrics
+from RealtimeSTT.utterance_trace import JsonlTraceSink, LatencyStats
 import websockets
 import threading
 import logging
 import wave
 import json
 import time
+import uuid
+import os
 
 global_args = None
-recorder = None
+transcription_engine = None
+engine_config = {}
 recorder_config = {}
-recorder_ready = threading.Event()
-recorder_thread = None
-stop_recorder = False
-prev_text = ""
+engine_ready = threading.Event()
+sessions = {}
+# End of speech to final text latency of all sessions
+latency_stats = LatencyStats()
+trace_sink = None
 
 # Define allowed methods and parameters for security
 allowed_methods = [
@@ -192,11 +219,85 @@ allowed_parameters = [
     'use_wake_words',
 ]
 
+ACTIVE_SESSIONS = metrics.Gauge("active_sessions", "Connected data sessions.")
+ACTIVE_SESSIONS.set_function(lambda: len(sessions))
+SEND_LAG = metrics.Gauge(
+    "send_lag_seconds", "Largest age of a queued or in flight message of a data client.")
+SEND_LAG.set_function(
+    lambda: max((session.sender.lag() for session in list(sessions.values())), default=0.0))
+SEND_QUEUE_DEPTH = metrics.Gauge(
+    "send_queue_depth", "Largest outbound queue of a data client, in messages.")
+SEND_QUEUE_DEPTH.set_function(
+    lambda: max((len(session.sender.queue) for session in list(sessions.values())), default=0))
+SLOW_CLIENTS = metrics.Counter(
+    "slow_client_disconnects_total", "Data clients disconnected for falling behind.")
+
 # Queues and connections for control and data
 control_connections = set()
 data_connections = set()
 control_queue = asyncio.Queue()
-audio_queue = asyncio.Queue()
+
+
+class Session:
+    """
+    One data connection with its own recorder on top of the shared
+    transcription engine.
+    """
+    def __init__(self, websocket, loop, audio_events=protocol.DEFAULT_AUDIO_EVENT_MODE):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.loop = loop
+        self.audio_events = audio_events
+        self.recorder = None
+        self.recorder_thread = None
+        self.recorder_ready = threading.Event()
+        self.stop_recorder = threading.Event()
+        self.prev_text = ""
+        self.text_time_deque = deque()
+        self.wav_file = None
+        self.resampler = None
+        # Set by the audio_format handshake, binary messages are raw PCM then
+        self.stream_format = None
+        # Streaming decoder of a compressed stream format
+        self.decoder = None
+        self.sender = ClientSender(
+            websocket, global_args.send_queue_depth, global_args.send_max_lag,
+            on_send=log_sent_message)
+
+    def send(self, message, coalesce=False):
+        """
+        Queues a message for this session's client (thread-safe). Queued
+        messages with coalesce=True are dropped down to the newest while
+        the client is behind.
+        """
+        self.loop.call_soon_threadsafe(self.sender.put, message, coalesce)
+
+    def wav_filename(self):
+        root, ext = os.path.splitext(writechunks)
+        return f"{root}_{self.id[:8]}{ext or '.wav'}"
+
+    def close(self):
+        """Shuts down the recorder of this session. Blocks until done."""
+        self.stop_recorder.set()
+        if self.recorder:
+            # The recorder thread may be between two text() calls, in which
+            # case nothing acknowledges the abort; shutdown() ends any
+            # text() call started after it
+            if not self.recorder.abort(timeout=SESSION_ABORT_TIMEOUT):
+                debug_print(f"Recorder of session {self.id} did not acknowledge the abort")
+            self.recorder.stop()
+            self.recorder.shutdown()
+        if self.recorder_thread:
+            self.recorder_thread.join()
+        if self.wav_file:
+            self.wav_file.close()
+            self.wav_file = None
+        self.close_decoder()
+
+    def close_decoder(self):
+        if self.decoder:
+            self.decoder.close()
+            self.decoder = None
 
 def preprocess_text(text):
     # Remove leading whitespaces
@@ -221,6 +322,12 @@ def preprocess_text(text):
     
     return text
 
+def log_sent_message(message):
+    if extended_logging:
+        timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        shown = f"<binary frame, {len(message)} bytes>" if isinstance(message, bytes) else message
+        print(f"  [{timestamp}] Sending message: {bcolors.OKBLUE}{shown}{bcolors.ENDC}\n", flush=True, end="")
+
 def debug_print(message):
     if debug_logging:
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
@@ -244,9 +351,8 @@ def format_timestamp_ns(timestamp_ns: int) -> str:
 
     return formatted_timestamp
 
-def text_detected(text, loop):
-    global prev_text
-
+def text_detected(text, session):
+    recorder = session.recorder
     text = preprocess_text(text)
 
     if silence_timing:
@@ -266,7 +372,7 @@ def text_detected(text, loop):
 
         if ends_with_ellipsis(text):
             recorder.post_speech_silence_duration = global_args.mid_sentence_detection_pause
-        elif sentence_end(text) and sentence_end(prev_text) and not ends_with_ellipsis(prev_text):
+        elif sentence_end(text) and sentence_end(session.prev_text) and not ends_with_ellipsis(session.prev_text):
             recorder.post_speech_silence_duration = global_args.end_of_sentence_detection_pause
         else:
             recorder.post_speech_silence_duration = global_args.unknown_sentence_detection_pause
@@ -274,6 +380,7 @@ def text_detected(text, loop):
 
         # Append the new text with its timestamp
         current_time = time.time()
+        text_time_deque = session.text_time_deque
         text_time_deque.append((current_time, text))
 
         # Remove texts older than hard_break_even_on_background_noise seconds
@@ -292,16 +399,16 @@ def text_detected(text, loop):
             if similarity > hard_break_even_on_background_noise_min_similarity and len(first_text) > hard_break_even_on_background_noise_min_chars:
                 recorder.stop()
                 recorder.clear_audio_queue()
-                prev_text = ""
+                session.prev_text = ""
 
-    prev_text = text
+    session.prev_text = text
 
-    # Put the message in the audio queue to be sent to clients
+    # Put the message in the audio queue to be sent to the session's client
     message = json.dumps({
         'type': 'realtime',
         'text': text
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message, coalesce=True)
 
     # Get current timestamp in HH:MM:SS.nnn format
     timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
@@ -311,69 +418,88 @@ def text_detected(text, loop):
     else:
         print(f"\r[{timestamp}] {bcolors.OKCYAN}{text}{bcolors.ENDC}", flush=True, end='')
 
-def on_recording_start(loop):
+def on_recording_start(session):
     message = json.dumps({
         'type': 'recording_start'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_recording_stop(loop):
+def on_recording_stop(session):
     message = json.dumps({
         'type': 'recording_stop'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_vad_detect_start(loop):
+def on_vad_detect_start(session):
     message = json.dumps({
         'type': 'vad_detect_start'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_vad_detect_stop(loop):
+def on_vad_detect_stop(session):
     message = json.dumps({
         'type': 'vad_detect_stop'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_wakeword_detected(loop):
+def on_wakeword_detected(session):
     message = json.dumps({
         'type': 'wakeword_detected'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_wakeword_detection_start(loop):
+def on_wakeword_detection_start(session):
     message = json.dumps({
         'type': 'wakeword_detection_start'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
-def on_wakeword_detection_end(loop):
+def on_wakeword_detection_end(session):
     message = json.dumps({
         'type': 'wakeword_detection_end'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
-
-def on_transcription_start(_audio_bytes, loop):
-    bytes_b64 = base64.b64encode(_audio_bytes.tobytes()).decode('utf-8')
-    message = json.dumps({
-        'type': 'transcription_start',
-        'audio_bytes_base64': bytes_b64
-    })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
-
-def on_turn_detection_start(loop):
+    session.send(message)
+
+def on_transcription_start(_audio_bytes, session):
+    if session.audio_events in ('int16', 'float32'):
+        session.send(protocol.encode_audio_frame(
+            'transcription_start', _audio_bytes, session.audio_events))
+        return
+    message = {'type': 'transcription_start'}
+    if session.audio_events == 'json':
+        message['audio_format'] = 'float32'
+        message['audio_bytes_base64'] = base64.b64encode(_audio_bytes.tobytes()).decode('utf-8')
+    session.send(json.dumps(message))
+
+def on_turn_detection_start(session):
     print("&&& stt_server on_turn_detection_start")
     message = json.dumps({
         'type': 'start_turn_detection'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
+
+def on_utterance_trace(record, session):
+    latency = record["end_of_speech_latency"]
+    if record["status"] == "success" and latency is not None:
+        latency_stats.add(latency)
+    if trace_sink:
+        trace_sink.write(dict(record, session_id=session.id))
+    if extended_logging:
+        print(f"  [{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Utterance {record['utterance_id']} "
+              f"{record['status']}, end of speech latency: {latency}")
+
+def on_qos_change(event, session):
+    session.send(json.dumps(dict(event, type='qos_change')))
+    if extended_logging:
+        print(f"  [{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Session {session.id} realtime QoS "
+              f"{event['direction']}: {event['previous_level']} -> {event['level']}")
 
-def on_turn_detection_stop(loop):
+def on_turn_detection_stop(session):
     print("&&& stt_server on_turn_detection_stop")
     message = json.dumps({
         'type': 'stop_turn_detection'
     })
-    asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+    session.send(message)
 
 
 # def on_realtime_transcription_update(text, loop):
@@ -383,7 +509,7 @@ def on_turn_detection_stop(loop):
 #         'type': 'realtime_update',
 #         'text': text
 #     })
-#     asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+#     session.send(message)
 
 # def on_recorded_chunk(chunk, loop):
 #     if send_recorded_chunk:
@@ -392,7 +518,7 @@ def on_turn_detection_stop(loop):
 #             'type': 'recorded_chunk',
 #             'bytes': bytes_b64
 #         })
-#         asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+#         session.send(message)
 
 # Define the server's arguments
 def parse_arguments():
@@ -426,7 +552,7 @@ def parse_arguments():
 
     parser.add_argument('--debug_websockets', action='store_true', help='Enable debug logging for detailed server websocket operations')
 
-    parser.add_argument('-W', '--write', metavar='FILE', help='Save received audio to a WAV file')
+    parser.add_argument('-W', '--write', metavar='FILE', help='Save received audio to WAV files, one per session with the session id appended to the file name')
     
     parser.add_argument('-b', '--batch', '--batch_size', type=int, default=16, help='Batch size for inference. This parameter controls the number of audio chunks processed in parallel during transcription. Default is 16.')
 
@@ -538,6 +664,21 @@ def parse_arguments():
 
     parser.add_argument('--logchunks', action='store_true', help='Enable logging of incoming audio chunks (periods)')
 
+    parser.add_argument('--send_queue_depth', type=int, default=64,
+                        help='Messages queued for a data client before its realtime updates are coalesced. Default is 64.')
+
+    parser.add_argument('--send_max_lag', type=float, default=10.0,
+                        help='Seconds a data client may fall behind before it is disconnected. Default is 10.')
+
+    parser.add_argument('--metrics_port', type=int, default=None,
+                        help='Serve Prometheus metrics on this local HTTP port. Default is off.')
+
+    parser.add_argument('--trace_file', type=str, default=None,
+                        help='Append the latency trace of every utterance to this JSON lines file. Default is off.')
+
+    parser.add_argument('--adaptive_qos', action='store_true',
+                        help='Degrade the realtime transcription of a session step by step while it cannot keep up (longer pause, beam size 1, the tiny model, no realtime updates) and recover as the load drops. Default is off.')
+
     # Parse arguments
     args = parser.parse_args()
 
@@ -568,25 +709,37 @@ def parse_arguments():
 
     return args
 
-def _recorder_thread(loop):
-    global recorder, stop_recorder
+def _engine_thread():
+    global transcription_engine
     print(f"{bcolors.OKGREEN}Initializing RealtimeSTT server with parameters:{bcolors.ENDC}")
-    for key, value in recorder_config.items():
+    for key, value in {**engine_config, **recorder_config}.items():
         print(f"    {bcolors.OKBLUE}{key}{bcolors.ENDC}: {value}")
-    recorder = AudioToTextRecorder(**recorder_config)
+    transcription_engine = TranscriptionEngine(**engine_config)
     print(f"{bcolors.OKGREEN}{bcolors.BOLD}RealtimeSTT initialized{bcolors.ENDC}")
-    recorder_ready.set()
-    
+    engine_ready.set()
+
+def _recorder_thread(session):
+    try:
+        session.recorder = AudioToTextRecorder(
+            **recorder_config,
+            **session_callbacks(session),
+            transcription_engine=transcription_engine,
+        )
+    except Exception as e:
+        print(f"{bcolors.FAIL}Could not create recorder for session {session.id}: {e}{bcolors.ENDC}")
+        return
+    finally:
+        session.recorder_ready.set()
+    debug_print(f"Recorder for session {session.id} initialized")
+
     def process_text(full_sentence):
-        global prev_text
-        prev_text = ""
+        session.prev_text = ""
         full_sentence = preprocess_text(full_sentence)
         message = json.dumps({
             'type': 'fullSentence',
             'text': full_sentence
         })
-        # Use the passed event loop here
-        asyncio.run_coroutine_threadsafe(audio_queue.put(message), loop)
+        session.send(message)
 
         timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
 
@@ -595,12 +748,32 @@ def _recorder_thread(loop):
         else:
             print(f"\r[{timestamp}] {bcolors.BOLD}Sentence:{bcolors.ENDC} {bcolors.OKGREEN}{full_sentence}{bcolors.ENDC}\n")
     try:
-        while not stop_recorder:
-            recorder.text(process_text)
+        while not session.stop_recorder.is_set():
+            session.recorder.text(process_text)
     except KeyboardInterrupt:
         print(f"{bcolors.WARNING}Exiting application due to keyboard interrupt{bcolors.ENDC}")
 
+def feed_session_audio(session, chunk, sample_rate):
+    """Records (with --writechunks) and feeds 16-bit mono PCM to the session's recorder."""
+    if writechunks:
+        if not session.wav_file:
+            session.wav_file = wave.open(session.wav_filename(), 'wb')
+            session.wav_file.setnchannels(CHANNELS)
+            session.wav_file.setsampwidth(pyaudio.get_sample_size(FORMAT))
+            session.wav_file.setframerate(sample_rate)
+
+        session.wav_file.writeframes(chunk)
+
+    if sample_rate != 16000:
+        resampled_chunk = decode_and_resample(session, chunk, sample_rate, 16000)
+        if extended_logging:
+            debug_print(f"Resampled chunk size: {len(resampled_chunk)} bytes")
+        session.recorder.feed_audio(resampled_chunk)
+    else:
+        session.recorder.feed_audio(chunk)
+
 def decode_and_resample(
+        session,
         audio_data,
         original_sample_rate,
         target_sample_rate):
@@ -609,27 +782,66 @@ def decode_and_resample(
     if original_sample_rate == target_sample_rate:
         return audio_data
 
-    audio_np = np.frombuffer(audio_data, dtype=np.int16)
-
-    # Calculate the number of samples after resampling
-    num_original_samples = len(audio_np)
-    num_target_samples = int(num_original_samples * target_sample_rate /
-                                original_sample_rate)
-
-    # Resample the audio
-    resampled_audio = resample(audio_np, num_target_samples)
+    # The session's resampler keeps its filter state between chunks
+    session.resampler = ensure_resampler(
+        session.resampler, original_sample_rate, target_sample_rate)
+    return session.resampler.process(audio_data).tobytes()
+
+def resolve_session(command_data):
+    """
+    Returns the session a control command addresses, or None and an error
+    message. Without a session_id the only connected session is used.
+    """
+    session_id = command_data.get("session_id")
+    if session_id is not None:
+        session = sessions.get(session_id)
+        if session is None:
+            return None, f"Unknown session {session_id}"
+    elif len(sessions) == 1:
+        session = next(iter(sessions.values()))
+    elif not sessions:
+        return None, "No active session"
+    else:
+        return None, "session_id is required when several sessions are connected"
+    if not session.recorder_ready.is_set():
+        return None, f"Recorder of session {session.id} not ready"
+    return session, None
+
+def send_stats(session_id=None):
+    """Outbound queue statistics per session, for the send_stats command."""
+    if session_id is not None and session_id not in sessions:
+        return {"status": "error", "message": f"Unknown session {session_id}"}
+    return {
+        "status": "success",
+        "send_stats": {
+            session.id: session.sender.stats()
+            for session in list(sessions.values())
+            if session_id is None or session.id == session_id
+        },
+    }
 
-    return resampled_audio.astype(np.int16).tobytes()
+def get_latency_stats(session_id=None):
+    """End of speech latency percentiles, for the latency_stats command."""
+    if session_id is not None and session_id not in sessions:
+        return {"status": "error", "message": f"Unknown session {session_id}"}
+    return {
+        "status": "success",
+        "latency_stats": latency_stats.percentiles(),
+        "sessions": {
+            session.id: session.recorder.latency_percentiles()
+            for session in list(sessions.values())
+            if session.recorder and (session_id is None or session.id == session_id)
+        },
+    }
 
 async def control_handler(websocket):
     debug_print(f"New control connection from {websocket.remote_address}")
     print(f"{bcolors.OKGREEN}Control client connected{bcolors.ENDC}")
-    global recorder
     control_connections.add(websocket)
     try:
         async for message in websocket:
             debug_print(f"Received control message: {message[:200]}...")
-            if not recorder_ready.is_set():
+            if not engine_ready.is_set():
                 print(f"{bcolors.WARNING}Recorder not ready{bcolors.ENDC}")
                 continue
             if isinstance(message, str):
@@ -637,6 +849,18 @@ async def control_handler(websocket):
                 try:
                     command_data = json.loads(message)
                     command = command_data.get("command")
+                    if command == "send_stats":
+                        await websocket.send(json.dumps(send_stats(command_data.get("session_id"))))
+                        continue
+                    if command == "latency_stats":
+                        await websocket.send(json.dumps(get_latency_stats(command_data.get("session_id"))))
+                        continue
+                    session, error = resolve_session(command_data)
+                    if error:
+                        print(f"{bcolors.WARNING}{error} ({command}){bcolors.ENDC}")
+                        await websocket.send(json.dumps({"status": "error", "message": error}))
+                        continue
+                    recorder = session.recorder
                     if command == "set_parameter":
                         parameter = command_data.get("parameter")
                         value = command_data.get("value")
@@ -716,10 +940,60 @@ async def control_handler(websocket):
     finally:
         control_connections.remove(websocket)
 
+async def handle_data_text(session, message):
+    """Handles text messages on a data connection (the audio_format handshake)."""
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict) or data.get('type') != protocol.AUDIO_FORMAT_MESSAGE:
+        print(f"{bcolors.WARNING}Received unknown text message on data connection{bcolors.ENDC}")
+        return
+    try:
+        stream_format = protocol.parse_audio_format(data)
+        decoder = None
+        if stream_format.sample_format in protocol.COMPRESSED_FORMATS:
+            decoder = audio_codec.create_decoder(stream_format, 16000)
+    except (protocol.ProtocolError, ImportError) as e:
+        await session.websocket.send(json.dumps({
+            'type': protocol.AUDIO_FORMAT_MESSAGE, 'status': 'error', 'message': str(e)}))
+        return
+    # A new stream starts, decoded output of the previous one is dropped
+    session.close_decoder()
+    session.stream_format = stream_format
+    session.decoder = decoder
+    debug_print(f"Session {session.id} streams {stream_format}")
+    await session.websocket.send(json.dumps({
+        'type': protocol.AUDIO_FORMAT_MESSAGE, 'status': 'success'}))
+
+def request_path(websocket):
+    """Path and query of the websocket handshake request."""
+    request = getattr(websocket, 'request', None)
+    return getattr(request, 'path', None) or getattr(websocket, 'path', '')
+
 async def data_handler(websocket):
-    global writechunks, wav_file
     print(f"{bcolors.OKGREEN}Data client connected{bcolors.ENDC}")
+    loop = asyncio.get_running_loop()
+    if not engine_ready.is_set():
+        # Recorders share the engine, without it a recorder would load
+        # models of its own
+        debug_print("Data client waits for the transcription models to load")
+        await loop.run_in_executor(None, engine_ready.wait)
+    session = Session(websocket, loop, protocol.parse_audio_events(request_path(websocket)))
+    session.recorder_thread = threading.Thread(target=_recorder_thread, args=(session,))
+    session.recorder_thread.start()
+    await loop.run_in_executor(None, session.recorder_ready.wait)
+    if session.recorder is None:
+        await websocket.close()
+        return
+    sessions[session.id] = session
     data_connections.add(websocket)
+    await websocket.send(json.dumps({
+        'type': 'session',
+        'session_id': session.id
+    }))
+    session.sender.start()
+    debug_print(f"Session {session.id} started")
     try:
         while True:
             message = await websocket.recv()
@@ -728,6 +1002,23 @@ async def data_handler(websocket):
                     debug_print(f"Received audio chunk (size: {len(message)} bytes)")
                 elif log_incoming_chunks:
                     print(".", end='', flush=True)
+                stream_format = session.stream_format
+                if session.decoder is not None:
+                    # Compressed stream, decoded to 16 kHz PCM off the event loop
+                    try:
+                        pcm = await loop.run_in_executor(None, session.decoder.decode, message)
+                    except Exception as e:
+                        print(f"{bcolors.WARNING}Could not decode {stream_format.sample_format} audio: {e}{bcolors.ENDC}")
+                        continue
+                    if pcm:
+                        feed_session_audio(session, pcm, 16000)
+                    continue
+                if stream_format is not None:
+                    # Raw PCM in the format of the audio_format handshake
+                    feed_session_audio(session, protocol.decode_pcm(message, stream_format),
+                                       stream_format.sample_rate)
+                    continue
+
                 # Handle binary message (audio data)
                 metadata_length = int.from_bytes(message[:4], byteorder='little')
                 metadata_json = message[4:4+metadata_length].decode('utf-8')
@@ -742,59 +1033,74 @@ async def data_handler(websocket):
 
                 if extended_logging:
                     debug_print(f"Processing audio chunk with sample rate {sample_rate}")
-                chunk = message[4+metadata_length:]
-
-                if writechunks:
-                    if not wav_file:
-                        wav_file = wave.open(writechunks, 'wb')
-                        wav_file.setnchannels(CHANNELS)
-                        wav_file.setsampwidth(pyaudio.get_sample_size(FORMAT))
-                        wav_file.setframerate(sample_rate)
-
-                    wav_file.writeframes(chunk)
-
-                if sample_rate != 16000:
-                    resampled_chunk = decode_and_resample(chunk, sample_rate, 16000)
-                    if extended_logging:
-                        debug_print(f"Resampled chunk size: {len(resampled_chunk)} bytes")
-                    recorder.feed_audio(resampled_chunk)
-                else:
-                    recorder.feed_audio(chunk)
+                feed_session_audio(session, message[4+metadata_length:], sample_rate)
             else:
-                print(f"{bcolors.WARNING}Received non-binary message on data connection{bcolors.ENDC}")
+                await handle_data_text(session, message)
     except websockets.exceptions.ConnectionClosed as e:
         print(f"{bcolors.WARNING}Data client disconnected: {e}{bcolors.ENDC}")
     finally:
-        data_connections.remove(websocket)
-        recorder.clear_audio_queue()  # Ensure audio queue is cleared if client disconnects
-
-async def broadcast_audio_messages():
-    while True:
-        message = await audio_queue.get()
-        for conn in list(data_connections):
-            try:
-                timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-
-                if extended_logging:
-                    print(f"  [{timestamp}] Sending message: {bcolors.OKBLUE}{message}{bcolors.ENDC}\n", flush=True, end="")
-                await conn.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                data_connections.remove(conn)
-
-# Helper function to create event loop bound closures for callbacks
-def make_callback(loop, callback):
+        data_connections.discard(websocket)
+        sessions.pop(session.id, None)
+        if session.sender.disconnected_for_lag:
+            SLOW_CLIENTS.inc()
+        session.sender.close()
+        # Shut down the session's recorder, the shared engine keeps running
+        await loop.run_in_executor(None, session.close)
+        debug_print(f"Session {session.id} closed")
+
+# Helper function to create session bound closures for callbacks
+def make_callback(session, callback):
     def inner_callback(*args, **kwargs):
-        callback(*args, **kwargs, loop=loop)
+        callback(*args, **kwargs, session=session)
     return inner_callback
 
+def session_callbacks(session):
+    return {
+        'on_realtime_transcription_update': make_callback(session, text_detected),
+        'on_recording_start': make_callback(session, on_recording_start),
+        'on_recording_stop': make_callback(session, on_recording_stop),
+        'on_vad_detect_start': make_callback(session, on_vad_detect_start),
+        'on_vad_detect_stop': make_callback(session, on_vad_detect_stop),
+        'on_wakeword_detected': make_callback(session, on_wakeword_detected),
+        'on_wakeword_detection_start': make_callback(session, on_wakeword_detection_start),
+        'on_wakeword_detection_end': make_callback(session, on_wakeword_detection_end),
+        'on_transcription_start': make_callback(session, on_transcription_start),
+        'on_turn_detection_start': make_callback(session, on_turn_detection_start),
+        'on_turn_detection_stop': make_callback(session, on_turn_detection_stop),
+        'on_utterance_trace': make_callback(session, on_utterance_trace),
+        'on_qos_change': make_callback(session, on_qos_change),
+        # 'on_recorded_chunk': make_callback(session, on_recorded_chunk),
+    }
+
 async def main_async():            
-    global stop_recorder, recorder_config, global_args
+    global engine_config, recorder_config, global_args, trace_sink
     args = parse_arguments()
     global_args = args
+    if args.trace_file:
+        trace_sink = JsonlTraceSink(args.trace_file)
 
-    # Get the event loop here and pass it to the recorder thread
     loop = asyncio.get_event_loop()
 
+    # The transcription models are loaded once and shared by all sessions
+    engine_config = {
+        'model': args.model,
+        'download_root': args.root,
+        'realtime_model_type': (
+            args.rt_model
+            if args.enable_realtime_transcription and not args.use_main_model_for_realtime
+            else None),
+        'batch_size': args.batch,
+        'realtime_batch_size': args.realtime_batch_size,
+        'beam_size': args.beam_size,
+        'initial_prompt': args.initial_prompt,
+        'compute_type': args.compute_type,
+        'gpu_device_index': args.gpu_device_index,
+        'device': args.device,
+        'suppress_tokens': args.suppress_tokens,
+        'faster_whisper_vad_filter': args.faster_whisper_vad_filter,
+    }
+
+    # Every session creates its own recorder with these parameters
     recorder_config = {
         'model': args.model,
         'download_root': args.root,
@@ -830,19 +1136,6 @@ async def main_async():
         'spinner': False,
         'use_microphone': False,
 
-        'on_realtime_transcription_update': make_callback(loop, text_detected),
-        'on_recording_start': make_callback(loop, on_recording_start),
-        'on_recording_stop': make_callback(loop, on_recording_stop),
-        'on_vad_detect_start': make_callback(loop, on_vad_detect_start),
-        'on_vad_detect_stop': make_callback(loop, on_vad_detect_stop),
-        'on_wakeword_detected': make_callback(loop, on_wakeword_detected),
-        'on_wakeword_detection_start': make_callback(loop, on_wakeword_detection_start),
-        'on_wakeword_detection_end': make_callback(loop, on_wakeword_detection_end),
-        'on_transcription_start': make_callback(loop, on_transcription_start),
-        'on_turn_detection_start': make_callback(loop, on_turn_detection_start),
-        'on_turn_detection_stop': make_callback(loop, on_turn_detection_stop),
-
-        # 'on_recorded_chunk': make_callback(loop, on_recorded_chunk),
         'no_log_file': True,  # Disable logging to file
         'use_extended_logging': args.use_extended_logging,
         'level': loglevel,
@@ -853,6 +1146,7 @@ async def main_async():
         'suppress_tokens': args.suppress_tokens,
         'allowed_latency_limit': args.allowed_latency_limit,
         'faster_whisper_vad_filter': args.faster_whisper_vad_filter,
+        'adaptive_qos': args.adaptive_qos,
     }
 
     try:
@@ -861,18 +1155,17 @@ async def main_async():
         data_server = await websockets.serve(data_handler, "localhost", args.data)
         print(f"{bcolors.OKGREEN}Control server started on {bcolors.OKBLUE}ws://localhost:{args.control}{bcolors.ENDC}")
         print(f"{bcolors.OKGREEN}Data server started on {bcolors.OKBLUE}ws://localhost:{args.data}{bcolors.ENDC}")
+        if args.metrics_port:
+            metrics.start_http_server(args.metrics_port)
+            print(f"{bcolors.OKGREEN}Metrics served on {bcolors.OKBLUE}http://127.0.0.1:{args.metrics_port}/metrics{bcolors.ENDC}")
 
-        # Start the broadcast and recorder threads
-        broadcast_task = asyncio.create_task(broadcast_audio_messages())
-
-        recorder_thread = threading.Thread(target=_recorder_thread, args=(loop,))
-        recorder_thread.start()
-        recorder_ready.wait()
+        # Load the transcription models
+        await loop.run_in_executor(None, _engine_thread)
 
         print(f"{bcolors.OKGREEN}Server started. Press Ctrl+C to stop the server.{bcolors.ENDC}")
 
         # Run server tasks
-        await asyncio.gather(control_server.wait_closed(), data_server.wait_closed(), broadcast_task)
+        await asyncio.gather(control_server.wait_closed(), data_server.wait_closed())
     except OSError as e:
         print(f"{bcolors.FAIL}Error: Could not start server on specified ports. It’s possible another instance of the server is already running, or the ports are being used by another application.{bcolors.ENDC}")
     except KeyboardInterrupt:
@@ -883,17 +1176,18 @@ async def main_async():
         print(f"{bcolors.OKGREEN}Server shutdown complete.{bcolors.ENDC}")
 
 async def shutdown_procedure():
-    global stop_recorder, recorder_thread
-    if recorder:
-        stop_recorder = True
-        recorder.abort()
-        recorder.stop()
-        recorder.shutdown()
-        print(f"{bcolors.OKGREEN}Recorder shut down{bcolors.ENDC}")
-
-        if recorder_thread:
-            recorder_thread.join()
-            print(f"{bcolors.OKGREEN}Recorder thread finished{bcolors.ENDC}")
+    if sessions:
+        for session in list(sessions.values()):
+            session.close()
+        sessions.clear()
+        print(f"{bcolors.OKGREEN}Recorders shut down{bcolors.ENDC}")
+
+    if transcription_engine:
+        transcription_engine.shutdown()
+        print(f"{bcolors.OKGREEN}Transcription engine shut down{bcolors.ENDC}")
+
+    if trace_sink:
+        trace_sink.close()
 
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
     for task in tasks:
@@ -0,0 +1,61 @@
+"""
+Compares the per-tick cost of building the realtime transcription input
+the old way (joining all recorded frames and converting them to float32)
+with taking a view of the incrementally filled AudioArena.
+
+The arena's per-tick cost must stay flat while the utterance grows.
+
+Usage: python tests/benchmark_audio_arena.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+
+from RealtimeSTT.audio_buffer import AudioArena
+
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 512
+REALTIME_PROCESSING_PAUSE = 0.2
+INT16_MAX_ABS_VALUE = 32768.0
+
+
+def join_and_convert(frames):
+    audio_array = np.frombuffer(b''.join(frames), dtype=np.int16)
+    return audio_array.astype(np.float32) / INT16_MAX_ABS_VALUE
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    chunk = rng.integers(-3000, 3000, CHUNK_SAMPLES, dtype=np.int16).tobytes()
+    chunks_per_tick = int(SAMPLE_RATE * REALTIME_PROCESSING_PAUSE / CHUNK_SAMPLES)
+
+    frames = []
+    arena = AudioArena()
+    append_time = 0.0
+    print(f"{'utterance':>10} {'join+convert':>14} {'arena view':>12} {'append/chunk':>14}")
+    for seconds in (1, 5, 10, 20, 30, 60):
+        while len(frames) * CHUNK_SAMPLES < seconds * SAMPLE_RATE:
+            for _ in range(chunks_per_tick):
+                frames.append(chunk)
+                start = time.perf_counter()
+                arena.append(chunk)
+                append_time += time.perf_counter() - start
+
+        repeats = 20
+        start = time.perf_counter()
+        for _ in range(repeats):
+            old_audio = join_and_convert(frames)
+        old_tick = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            new_audio = arena.view()
+        new_tick = (time.perf_counter() - start) / repeats
+
+        assert np.array_equal(old_audio, new_audio)
+        print(f"{seconds:>9}s {old_tick * 1e3:>12.3f}ms {new_tick * 1e6:>10.2f}us "
+              f"{append_time / len(frames) * 1e6:>12.2f}us")
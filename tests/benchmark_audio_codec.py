@@ -0,0 +1,60 @@
+"""
+Measures bitrate and server side decode cost of the compressed data
+websocket formats for capacity planning. A 48 kHz stream is encoded in
+64 ms chunks like AudioToTextRecorderClient sends it, then decoded with
+the per session decoder the server uses (to 16 kHz mono PCM).
+
+- kbit/s: uplink bitrate of the stream (raw 16 bit PCM for comparison)
+- decode cpu: CPU time per second of audio
+- streams/core: concurrent streams one core can decode in real time
+
+Needs PyAV (pip install av).
+
+Usage: python tests/benchmark_audio_codec.py [--seconds 30] [--rate 48000]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+from scipy import signal
+
+from RealtimeSTT import audio_codec, protocol
+
+CHUNK_SECONDS = 0.064
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--rate', type=int, default=48000)
+    args = parser.parse_args()
+
+    # Speech band noise with a syllable like envelope
+    rng = np.random.default_rng(0)
+    samples = int(args.rate * args.seconds)
+    noise = signal.lfilter(*signal.butter(4, [100 / (args.rate / 2), 4000 / (args.rate / 2)], btype='band'),
+                           rng.normal(0, 8000, samples))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * np.arange(samples) / args.rate)
+    audio = np.clip(noise * envelope, -32768, 32767).astype(np.int16)
+    chunk = int(args.rate * CHUNK_SECONDS)
+    chunks = [audio[start:start + chunk].tobytes() for start in range(0, len(audio), chunk)]
+
+    print(f"{'format':>9} {'kbit/s':>8} {'decode cpu':>11} {'streams/core':>13}")
+    print(f"{'pcm':>9} {args.rate * 16 / 1000:>8.0f} {'-':>11} {'-':>13}")
+    for codec in protocol.COMPRESSED_FORMATS:
+        encoder = audio_codec.StreamEncoder(codec, args.rate)
+        messages = [message for pcm in chunks for message in encoder.encode(pcm)] + encoder.close()
+
+        decoder = audio_codec.create_decoder(protocol.StreamFormat(args.rate, codec, 1))
+        start = time.process_time()
+        decoded = sum(len(decoder.decode(message)) for message in messages)
+        decoded += len(decoder.close())
+        cpu = (time.process_time() - start) / args.seconds
+        assert decoded > 0.95 * args.seconds * 16000 * 2, decoded
+
+        kbits = sum(len(message) for message in messages) * 8 / args.seconds / 1000
+        print(f"{codec:>9} {kbits:>8.0f} {cpu * 1e3:>9.2f}ms {1 / cpu:>13.0f}")
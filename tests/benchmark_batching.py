@@ -0,0 +1,77 @@
+"""
+Measures throughput and latency of the transcription worker's batching
+mode at 1, 4 and 16 concurrent streams.
+
+Every stream submits one clip at the same time. Sequential mode
+transcribes the clips one after another (batching disabled), batched
+mode runs all of them through transcribe_batched in shared forward
+passes, as the worker does with transcription_batch_window_ms > 0.
+
+Usage: python tests/benchmark_batching.py [--model tiny] [--device cpu] [--compute_type default]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import statistics
+import time
+import numpy as np
+import soundfile as sf
+import faster_whisper
+
+from RealtimeSTT.audio_recorder import transcribe_batched
+
+STREAMS = (1, 4, 16)
+
+
+def load_clips(count):
+    """Returns count different clips cut from the warmup audio."""
+    warmup_path = os.path.join(os.path.dirname(__file__), '..', 'RealtimeSTT', 'warmup_audio.wav')
+    clip, _ = sf.read(warmup_path, dtype='float32')
+    rng = np.random.default_rng(0)
+    return [(clip + rng.normal(0, 0.001, len(clip))).astype(np.float32) for _ in range(count)]
+
+
+def sequential(model, clips):
+    latencies = []
+    start = time.perf_counter()
+    for clip in clips:
+        segments, _ = model.transcribe(clip, language="en", beam_size=5)
+        " ".join(segment.text for segment in segments)
+        latencies.append(time.perf_counter() - start)
+    return time.perf_counter() - start, latencies
+
+
+def batched(pipeline, clips):
+    start = time.perf_counter()
+    transcribe_batched(pipeline, clips, "en", beam_size=5)
+    elapsed = time.perf_counter() - start
+    return elapsed, [elapsed] * len(clips)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--compute_type', default='default')
+    args = parser.parse_args()
+
+    model = faster_whisper.WhisperModel(args.model, device=args.device, compute_type=args.compute_type)
+    pipeline = faster_whisper.BatchedInferencePipeline(model=model)
+
+    # Warm up both paths
+    warmup = load_clips(2)
+    sequential(model, warmup)
+    batched(pipeline, warmup)
+
+    print(f"{'streams':>7} {'mode':>10} {'audio s/s':>10} {'p50 latency':>12} {'max latency':>12}")
+    for streams in STREAMS:
+        clips = load_clips(streams)
+        audio_seconds = sum(len(clip) for clip in clips) / 16000
+        for mode, run in (("sequential", lambda: sequential(model, clips)),
+                          ("batched", lambda: batched(pipeline, clips))):
+            elapsed, latencies = run()
+            print(f"{streams:>7} {mode:>10} {audio_seconds / elapsed:>10.1f} "
+                  f"{statistics.median(latencies) * 1e3:>10.0f}ms {max(latencies) * 1e3:>10.0f}ms")
@@ -0,0 +1,66 @@
+"""
+Compares the previous bytearray accumulation of feed_audio and
+_audio_data_worker (buffer += data; buffer = buffer[n:] per frame) with
+AudioChunker for incoming chunks of different sizes.
+
+Both variants copy every frame into the bytes object put on the audio
+queue, so the difference is the re-slicing of the remaining buffer.
+
+Usage: python tests/benchmark_chunker.py [--seconds 60]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+
+from RealtimeSTT.audio_buffer import AudioChunker
+
+FRAME_BYTES = 2 * 512
+# 10 ms, 64 ms, 1 s of 16 kHz int16 audio, 10 s in one message
+CHUNK_BYTES = (320, 2048, 32000, 320000)
+
+
+def bytearray_slicing(chunks):
+    frames = []
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= FRAME_BYTES:
+            to_process = buffer[:FRAME_BYTES]
+            buffer = buffer[FRAME_BYTES:]
+            frames.append(bytes(to_process))
+    return frames
+
+
+def chunker(chunks):
+    frames = []
+    audio_chunker = AudioChunker(FRAME_BYTES)
+    for chunk in chunks:
+        for frame in audio_chunker.feed(chunk):
+            frames.append(bytes(frame))
+    return frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=60)
+    args = parser.parse_args()
+
+    stream = np.random.default_rng(0).integers(
+        -32768, 32767, int(16000 * args.seconds), dtype=np.int16).tobytes()
+
+    print(f"{'chunk':>8} {'bytearray':>11} {'chunker':>11} {'speedup':>8}")
+    for chunk_bytes in CHUNK_BYTES:
+        chunks = [stream[start:start + chunk_bytes] for start in range(0, len(stream), chunk_bytes)]
+        timings = []
+        for method in (bytearray_slicing, chunker):
+            start = time.perf_counter()
+            frames = method(chunks)
+            timings.append(time.perf_counter() - start)
+            assert b"".join(frames) == stream[:len(frames) * FRAME_BYTES]
+        print(f"{chunk_bytes:>7}B {timings[0] * 1e3:>9.1f}ms {timings[1] * 1e3:>9.1f}ms "
+              f"{timings[0] / timings[1]:>7.1f}x")
@@ -0,0 +1,95 @@
+"""
+Feeds one WAV file through AudioToTextRecorder.feed_audio three times and
+compares where the recordings start and stop:
+
+- wall clock, fed at real time (live operation)
+- audio clock (clock="audio"), fed at real time
+- audio clock, fed as fast as the recorder takes it
+
+On the audio clock the boundaries (seconds into the file) are identical
+however fast the audio is fed; on the wall clock they shift with the
+scheduling of the threads. Reports the boundaries, the largest deviation
+from the fast audio clock run and the wall time of every run.
+
+Usage: python tests/benchmark_clock.py FILE.wav [--silence 2.0]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import threading
+import time
+import wave
+
+import numpy as np
+
+from RealtimeSTT import AudioToTextRecorder
+
+CHUNK_SECONDS = 0.032
+
+
+def run(audio, rate, clock, paced, silence):
+    boundaries = []
+    origin = []
+
+    def mark(kind):
+        boundaries.append((kind, recorder.clock.time() - origin[0]))
+
+    recorder = AudioToTextRecorder(
+        model="tiny", device="cpu", compute_type="int8", language="en",
+        use_microphone=False, spinner=False, no_log_file=True, clock=clock,
+        on_recording_start=lambda: mark("start"),
+        on_recording_stop=lambda: mark("stop"),
+    )
+
+    def transcribe():
+        while recorder.is_running:
+            recorder.text()
+
+    threading.Thread(target=transcribe, daemon=True).start()
+    audio = np.concatenate((audio, np.zeros(int(rate * silence), dtype=np.int16)))
+    chunk = int(rate * CHUNK_SECONDS)
+    origin.append(recorder.clock.time())
+    start = time.monotonic()
+    for index, position in enumerate(range(0, len(audio), chunk)):
+        if paced:
+            delay = start + index * CHUNK_SECONDS - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            while recorder.audio_queue.qsize() >= recorder.allowed_latency_limit // 2:
+                time.sleep(0.001)
+        recorder.feed_audio(audio[position:position + chunk], rate)
+    while recorder.audio_queue.qsize() or recorder.is_recording:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    recorder.shutdown()
+    return boundaries, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file')
+    parser.add_argument('--silence', type=float, default=2.0)
+    args = parser.parse_args()
+
+    with wave.open(args.file, "rb") as wav:
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+
+    runs = {name: run(audio, rate, clock, paced, args.silence) for name, clock, paced in (
+        ("audio fast", "audio", False),
+        ("audio realtime", "audio", True),
+        ("wall realtime", "wall", True))}
+    reference = runs["audio fast"][0]
+    print(f"{'run':>15} {'wall':>8} {'boundaries':>10} {'max deviation':>14}")
+    for name, (boundaries, elapsed) in runs.items():
+        if len(boundaries) == len(reference):
+            deviation = f"{max((abs(a[1] - b[1]) for a, b in zip(boundaries, reference)), default=0) * 1e3:.1f}ms"
+        else:
+            deviation = "different"
+        print(f"{name:>15} {elapsed:>7.2f}s {len(boundaries):>10} {deviation:>14}")
+    print("audio fast: " + ", ".join(f"{kind} {at:.3f}s" for kind, at in reference))
@@ -0,0 +1,75 @@
+"""
+Measures the per chunk CPU cost of the data websocket audio framing on
+the client (building the message) and on the server (extracting the PCM
+before feed_audio), for the length prefixed JSON metadata of every chunk
+and for raw PCM after an audio_format handshake.
+
+Usage: python tests/benchmark_data_framing.py [--chunk 1024] [--chunks 100000]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import struct
+import time
+import numpy as np
+
+from RealtimeSTT import protocol
+
+SAMPLE_RATE = 48000
+
+
+def legacy_client(audio_data):
+    metadata_json = json.dumps({"sampleRate": SAMPLE_RATE})
+    return struct.pack('<I', len(metadata_json)) + metadata_json.encode('utf-8') + audio_data
+
+
+def legacy_server(message, stream_format):
+    metadata_length = int.from_bytes(message[:4], byteorder='little')
+    metadata = json.loads(message[4:4+metadata_length].decode('utf-8'))
+    return message[4+metadata_length:], metadata['sampleRate']
+
+
+def raw_client(audio_data):
+    return audio_data
+
+
+def raw_server(message, stream_format):
+    return protocol.decode_pcm(message, stream_format), stream_format.sample_rate
+
+
+def measure(function, messages, stream_format=None):
+    start = time.process_time()
+    if stream_format is None:
+        for message in messages:
+            function(message)
+    else:
+        for message in messages:
+            function(message, stream_format)
+    return (time.process_time() - start) / len(messages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunk', type=int, default=1024, help="samples per chunk")
+    parser.add_argument('--chunks', type=int, default=100000)
+    args = parser.parse_args()
+
+    audio_data = np.random.default_rng(0).integers(
+        -32768, 32767, args.chunk, dtype=np.int16).tobytes()
+    chunks = [audio_data] * args.chunks
+    stream_format = protocol.parse_audio_format(
+        json.loads(protocol.audio_format_message(SAMPLE_RATE)))
+
+    print(f"{'framing':>14} {'client/chunk':>13} {'server/chunk':>13} {'overhead':>9}")
+    for name, client, server in (("legacy json", legacy_client, legacy_server),
+                                 ("raw pcm", raw_client, raw_server)):
+        messages = [client(audio_data)] * args.chunks
+        assert server(messages[0], stream_format) == (audio_data, SAMPLE_RATE)
+        client_cost = measure(client, chunks)
+        server_cost = measure(server, messages, stream_format)
+        print(f"{name:>14} {client_cost * 1e6:>11.2f}us {server_cost * 1e6:>11.2f}us "
+              f"{len(messages[0]) - len(audio_data):>8}B")
@@ -0,0 +1,109 @@
+"""
+Measures the CPU time N recorders use while nothing is said.
+
+Each recorder runs text() in a thread, with realtime transcription on, and
+is measured in two phases:
+
+- idle: no audio arrives at all (a muted or paused source)
+- silence: silence is fed with feed_audio() at real time pace, so the
+  recording worker and the VADs process every chunk
+
+The workers block on conditions, queues and pipes while they wait, so
+the idle phase should stay close to 0% CPU. Reports the CPU time of this
+process as a share of one core (on Linux the transcription workers are
+threads of it) and the number of voluntary context switches, a measure
+of how often the threads woke up.
+
+Usage: python tests/benchmark_idle_cpu.py [--recorders 4] [--seconds 10] [--model tiny]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from RealtimeSTT import AudioToTextRecorder
+
+CHUNK_SECONDS = 0.032
+
+
+def context_switches():
+    if resource is None:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw
+
+
+def measure(seconds, feed=None):
+    cpu, switches, wall = time.process_time(), context_switches(), time.monotonic()
+    if feed:
+        feed(seconds)
+    else:
+        time.sleep(seconds)
+    wall = time.monotonic() - wall
+    return (time.process_time() - cpu) / wall, (context_switches() - switches) / wall
+
+
+def feed_silence(recorders):
+    def feed(seconds):
+        chunk = np.zeros(int(16000 * CHUNK_SECONDS), dtype=np.int16)
+        start = time.monotonic()
+        for index in range(int(seconds / CHUNK_SECONDS)):
+            delay = start + index * CHUNK_SECONDS - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            for recorder in recorders:
+                recorder.feed_audio(chunk)
+    return feed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recorders', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    recorders = [AudioToTextRecorder(
+        model=args.model,
+        realtime_model_type=args.model,
+        device=args.device,
+        compute_type="int8",
+        language="en",
+        use_microphone=False,
+        enable_realtime_transcription=True,
+        spinner=False,
+        no_log_file=True,
+    ) for _ in range(args.recorders)]
+
+    def transcribe(recorder):
+        while recorder.is_running:
+            recorder.text()
+
+    for recorder in recorders:
+        threading.Thread(target=transcribe, args=(recorder,), daemon=True).start()
+    time.sleep(2.0)  # let the threads settle
+
+    try:
+        results = {
+            "idle": measure(args.seconds),
+            "silence": measure(args.seconds, feed_silence(recorders)),
+        }
+    finally:
+        for recorder in recorders:
+            recorder.shutdown()
+
+    print(f"{args.recorders} recorders, {args.seconds:.0f} s per phase")
+    print(f"{'phase':>8} {'cpu':>8} {'per recorder':>13} {'wakeups/s':>10}")
+    for phase, (cpu, switches) in results.items():
+        print(f"{phase:>8} {cpu * 100:>7.2f}% {cpu * 100 / args.recorders:>12.2f}% {switches:>10.0f}")
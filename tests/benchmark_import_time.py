@@ -0,0 +1,84 @@
+"""
+Measures the import cost of RealtimeSTT entry points with
+python -X importtime, each in a fresh interpreter.
+
+For every scenario it prints the total import time and the slowest
+top-level packages it pulled in, and checks that no heavy backend
+(torch, faster_whisper, ...) is imported where it is not needed. Pass
+--max-ms to fail when a scenario gets slower than the given budget.
+
+Usage: python tests/benchmark_import_time.py [--max-ms 500] [--repeats 3]
+"""
+
+import sys
+import os
+
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY_MODULES = ("torch", "faster_whisper", "ctranslate2", "openwakeword",
+                 "pvporcupine", "scipy", "halo", "soundfile")
+
+# (name, statement, heavy modules allowed to be imported)
+SCENARIOS = (
+    ("import RealtimeSTT", "import RealtimeSTT", ()),
+    ("client class", "from RealtimeSTT import AudioToTextRecorderClient", ()),
+    ("recorder class", "from RealtimeSTT import AudioToTextRecorder", ()),
+)
+
+
+def import_times(statement):
+    """
+    Runs statement with -X importtime and returns the total time in ms
+    and the cumulative time per top-level package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # Top-level entries are not indented
+        if name == name.lstrip():
+            packages[name] = packages.get(name, 0) + int(cumulative) / 1000
+    return sum(packages.values()), packages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, help="fail if a scenario takes longer")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':>16} {'median':>9}  slowest packages")
+    for name, statement, allowed in SCENARIOS:
+        try:
+            runs = [import_times(statement) for _ in range(args.repeats)]
+        except RuntimeError as e:
+            print(f"{name:>16} {'skipped':>9}  {e}")
+            continue
+        total = statistics.median(total for total, _ in runs)
+        packages = runs[-1][1]
+        slowest = sorted(packages.items(), key=lambda item: -item[1])[:4]
+        print(f"{name:>16} {total:>7.1f}ms  "
+              + ", ".join(f"{package} {ms:.0f}ms" for package, ms in slowest))
+
+        heavy = sorted(package for package in packages
+                       if package.split(".")[0] in HEAVY_MODULES
+                       and package.split(".")[0] not in allowed)
+        if heavy:
+            print(f"{'':>16} unexpected imports: {', '.join(heavy)}")
+            failed = True
+        if args.max_ms is not None and total > args.max_ms:
+            print(f"{'':>16} over budget of {args.max_ms:.0f}ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
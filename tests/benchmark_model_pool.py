@@ -0,0 +1,62 @@
+"""
+Measures startup time and memory of N transcription engines with and
+without model sharing.
+
+Unshared mode gives every engine its own ModelPool, which is what every
+recorder did before model pooling. Shared mode takes all engines from one
+pool, as recorders do by default now. The engines use different
+beam sizes to show that decoding options do not prevent sharing.
+
+Usage: python tests/benchmark_model_pool.py [--engines 4] [--model tiny] [--device cpu]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+from RealtimeSTT.audio_recorder import TranscriptionEngine
+from RealtimeSTT.model_pool import ModelPool, rss_bytes
+
+
+def start_engines(count, model, device, shared):
+    pool = ModelPool() if shared else None
+    engines = []
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    for index in range(count):
+        engines.append(TranscriptionEngine(
+            model=model,
+            device=device,
+            beam_size=1 + index,
+            realtime_model_type=model,
+            model_pool=pool if shared else ModelPool(),
+        ))
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+    report = [entry for engine in engines for entry in engine.memory_report()]
+    for engine in engines:
+        engine.shutdown()
+    return elapsed, rss_after - rss_before, report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engines', type=int, default=4)
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} {'engines':>8} {'startup':>9} {'rss growth':>11} {'models':>7}")
+    for shared in (False, True):
+        elapsed, rss_growth, report = start_engines(args.engines, args.model, args.device, shared)
+        models = len({entry['key'] for entry in report}) if shared else len(report)
+        print(f"{'shared' if shared else 'unshared':>9} {args.engines:>8} {elapsed:>8.1f}s "
+              f"{rss_growth / 2**20:>9.0f}MB {models:>7}")
+        if shared:
+            for entry in report[:models]:
+                memory = entry['memory_bytes']
+                memory = f"{memory / 2**20:.0f}MB" if memory is not None else "n/a"
+                print(f"    {entry['key'][0]:>13} {entry['key'][1]:>10} {memory:>8}")
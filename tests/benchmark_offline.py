@@ -0,0 +1,69 @@
+"""
+Measures how much faster than real time AudioToTextRecorder.transcribe_file()
+gets through a recording: the segmentation alone (OfflineSegmenter on
+the audio clock) and the whole run with the utterances transcribed in
+batches of different sizes. Feeding the same file with feed_audio()
+takes as long as the file.
+
+Usage: python tests/benchmark_offline.py FILE.wav [--model tiny] [--device cpu] [--batch-requests 1 4 16]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+import numpy as np
+import soundfile as sf
+
+from RealtimeSTT import AudioToTextRecorder
+from RealtimeSTT.resampler import StreamingResampler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file')
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--batch-requests', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    audio_seconds = sf.info(args.file).duration
+    recorder = AudioToTextRecorder(
+        model=args.model,
+        device=args.device,
+        compute_type=args.compute_type,
+        language=args.language,
+        use_microphone=False,
+        spinner=False,
+        no_log_file=True,
+    )
+    try:
+        audio, rate = sf.read(args.file, dtype="int16", always_2d=True)
+        audio = audio.mean(axis=1).astype(np.int16)
+        if rate != 16000:
+            resampler = StreamingResampler(rate, 16000)
+            audio = np.concatenate((resampler.process(audio), resampler.flush()))
+
+        segmenter = recorder._create_offline_segmenter()
+        start = time.perf_counter()
+        utterances = len(segmenter.feed(audio)) + len(segmenter.flush())
+        segmentation = time.perf_counter() - start
+        recorder.offline_silero_vad_models.append(segmenter.silero_model)
+
+        print(f"{audio_seconds:.1f} s of audio")
+        print(f"{'batch requests':>22} {'wall':>9} {'speed':>8} {'utterances':>11}")
+        print(f"{'segmentation only':>22} {segmentation:>8.2f}s {audio_seconds / segmentation:>7.0f}x {utterances:>11}")
+        for batch_requests in args.batch_requests:
+            start = time.perf_counter()
+            results = list(recorder.transcribe_file(args.file, batch_requests))
+            elapsed = time.perf_counter() - start
+            print(f"{batch_requests:>22} {elapsed:>8.2f}s {audio_seconds / elapsed:>7.1f}x {len(results):>11}")
+        for result in results[:5]:
+            print(f"  [{result.start:7.2f} - {result.end:7.2f}] {result.text}")
+    finally:
+        recorder.shutdown()
@@ -0,0 +1,65 @@
+"""
+Compares the message size and the encode + decode time of the
+transcription_start audio as base64 JSON (audio_events=json) with the
+binary frames (audio_events=int16 / float32) for utterances of different
+lengths.
+
+Decoding includes the conversion to the normalized float32 array the
+client passes to on_transcription_start.
+
+Usage: python tests/benchmark_protocol.py [--repeat 20]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import base64
+import json
+import time
+import numpy as np
+
+from RealtimeSTT import protocol
+
+UTTERANCE_SECONDS = (1, 5, 30)
+
+
+def json_roundtrip(audio):
+    message = json.dumps({
+        'type': 'transcription_start',
+        'audio_format': 'float32',
+        'audio_bytes_base64': base64.b64encode(audio.tobytes()).decode('utf-8')
+    })
+    data = json.loads(message)
+    decoded = np.frombuffer(base64.b64decode(data['audio_bytes_base64']), dtype=np.float32)
+    return message, decoded
+
+
+def frame_roundtrip(sample_format):
+    def roundtrip(audio):
+        message = protocol.encode_audio_frame('transcription_start', audio, sample_format)
+        frame = protocol.decode_audio_frame(message)
+        return message, protocol.convert_samples(frame.audio, 'float32')
+    return roundtrip
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'seconds':>7} {'format':>8} {'size':>10} {'vs raw':>7} {'roundtrip':>10} {'max error':>10}")
+    for seconds in UTTERANCE_SECONDS:
+        audio = np.clip(rng.normal(0, 0.2, 16000 * seconds), -1, 1).astype(np.float32)
+        for name, roundtrip in (("json", json_roundtrip),
+                                ("int16", frame_roundtrip("int16")),
+                                ("float32", frame_roundtrip("float32"))):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                message, decoded = roundtrip(audio)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            error = np.max(np.abs(decoded - audio))
+            print(f"{seconds:>7} {name:>8} {len(message) / 1024:>8.0f}kB "
+                  f"{len(message) / audio.nbytes:>6.2f}x {elapsed * 1e3:>8.2f}ms {error:>10.1e}")
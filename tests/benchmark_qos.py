@@ -0,0 +1,82 @@
+"""
+Drives the adaptive QoS controller (RealtimeSTT.qos) through a simulated
+load spike and compares it with a controller without hysteresis.
+
+The simulated machine decodes with a real-time factor of
+load * cost(level) (with noise); the realtime pause at the longer_pause
+level takes some contention off. While the factor is above 1 the audio
+queue fills up, below 1 it drains. Reports the level timeline, the
+number of level changes, the time spent per level and the peak queue
+fill of each controller. No models are needed.
+
+Usage: python tests/benchmark_qos.py [--load 0.6 2.5 0.6] [--seconds 30] [--seed 0]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import collections
+import importlib.util
+import random
+
+# Load the module directly, the package imports the model libraries
+spec = importlib.util.spec_from_file_location(
+    "qos", os.path.join(os.path.dirname(__file__), '..', 'RealtimeSTT', 'qos.py'))
+qos = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(qos)
+
+# Real-time factor per unit of load of the realtime decodes at each level
+COST = {"normal": 0.8, "longer_pause": 0.65, "beam_1": 0.4, "smaller_model": 0.2, "disabled": 0.0}
+STEP = 0.1
+DECODE_AUDIO_SECONDS = 3.0
+
+
+def simulate(controller, profile, seconds, seed):
+    rng = random.Random(seed)
+    now = [0.0]
+    controller.time_source = lambda: now[0]
+    fill, peak = 0.0, 0.0
+    timeline, residence = [], collections.Counter()
+    for load in profile:
+        for _ in range(int(seconds / STEP)):
+            now[0] += STEP
+            factor = load * COST[controller.level_name] * rng.uniform(0.8, 1.2)
+            if controller.level_name != "disabled":
+                controller.observe_decode(factor * DECODE_AUDIO_SECONDS, DECODE_AUDIO_SECONDS)
+            fill = min(1.0, max(0.0, fill + (factor - 1) * STEP / 5))
+            peak = max(peak, fill)
+            controller.update(fill)
+            residence[controller.level_name] += STEP
+            timeline.append(controller.level)
+    return controller.changes, residence, peak, timeline
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--load', type=float, nargs='+', default=[0.6, 2.5, 0.6],
+                        help='load of each phase, 1 is what the normal level just keeps up with')
+    parser.add_argument('--seconds', type=float, default=30.0, help='length of each phase')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    controllers = {
+        "hysteresis": qos.QoSController(),
+        "no hysteresis": qos.QoSController(
+            recover_realtime_factor=1.0, recover_queue_fill=0.5,
+            degrade_after=0, recover_after=0, max_recover_after=0),
+    }
+    print(f"load phases {args.load}, {args.seconds:.0f} s each")
+    print(f"{'controller':>14} {'changes':>8} {'peak fill':>10}  " +
+          " ".join(f"{level:>13}" for level in qos.QOS_LEVELS))
+    timelines = {}
+    for name, controller in controllers.items():
+        changes, residence, peak, timelines[name] = simulate(
+            controller, args.load, args.seconds, args.seed)
+        print(f"{name:>14} {changes:>8} {peak:>10.2f}  " +
+              " ".join(f"{residence[level]:>12.1f}s" for level in qos.QOS_LEVELS))
+    print("levels per second (0 normal .. 4 disabled):")
+    per_second = int(1 / STEP)
+    for name, timeline in timelines.items():
+        print(f"{name:>14} " + "".join(str(level) for level in timeline[::per_second]))
@@ -0,0 +1,359 @@
+"""
+Replays a corpus of WAV files through AudioToTextRecorder.feed_audio
+(use_microphone=False) and measures the recorder end to end, for
+comparing performance between commits.
+
+The corpus is a directory of WAV files (16 bit PCM, any rate, mono or
+stereo), each with its reference transcript next to it in a .txt file
+of the same name. Files are replayed one after another, every file
+followed by --silence seconds of silence so the recorder detects the end
+of speech.
+
+- --pace realtime feeds the audio at the speed it was recorded, like a
+  microphone. --pace fast feeds it as fast as the recorder takes it
+  (keeping its audio queue below half of allowed_latency_limit), with
+  the recorder on the audio clock (clock="audio") so the segmentation
+  is the same as at real time.
+- latency: end of speech to final text percentiles from the utterance
+  traces (on_utterance_trace)
+- realtime cadence: time between realtime updates within an utterance
+- cpu per audio second: CPU time of the process (and of worker
+  processes that exited) per second of replayed audio, model loading
+  excluded
+- peak rss: maximum resident set size of the process and its children
+- wer: word error rate of the final texts against the references
+  (lowercased, punctuation removed)
+- early transcriptions: with --early-transcription-on-silence, how
+  many early texts were reused as the final text, cancelled because
+  speech resumed or stale
+
+Runs on a CPU only machine with the tiny model by default. The report is
+printed and written as JSON (--report) with a summary and per file
+results.
+
+Usage: python tests/benchmark_replay.py CORPUS_DIR [--pace realtime|fast] [--model tiny] [--realtime] [--report replay.json]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import datetime
+import glob
+import json
+import platform
+import re
+import statistics
+import subprocess
+import threading
+import time
+import wave
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from RealtimeSTT import AudioToTextRecorder
+from RealtimeSTT import metrics
+from RealtimeSTT.utterance_trace import LatencyStats
+
+CHUNK_SECONDS = 0.032
+# Longest wait for the final texts of a file after its trailing silence
+FINAL_TIMEOUT = 60.0
+
+
+def read_wav(path):
+    """Returns (int16 samples, mono, sample rate) of a 16 bit PCM WAV file."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16 bit PCM is supported")
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        channels, rate = wav.getnchannels(), wav.getframerate()
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return audio, rate
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as file:
+                reference = file.read().strip()
+        corpus.append((path, reference))
+    return corpus
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word level edit distance (substitutions, deletions, insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for index, word in enumerate(reference, 1):
+        current = [index]
+        for column, other in enumerate(hypothesis, 1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1,
+                               previous[column - 1] + (word != other)))
+        previous = current
+    return previous[-1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 4) if values else None
+
+
+def cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # Kilobytes on Linux, bytes on macOS
+    unit = 1 if platform.system() == "Darwin" else 1024
+    peak = sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return round(peak * unit / 2 ** 20, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Replay:
+    """Feeds the corpus and collects texts, traces and realtime updates."""
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.finals = []
+        self.traces = []
+        self.recordings_started = 0
+        self.finals_done = 0
+        self.update_times = []
+        self.update_intervals = []
+        self.updates_per_utterance = []
+        self.running = True
+
+        self.recorder = AudioToTextRecorder(
+            model=args.model,
+            realtime_model_type=args.realtime_model,
+            device=args.device,
+            compute_type=args.compute_type,
+            language=args.language,
+            use_microphone=False,
+            spinner=False,
+            no_log_file=True,
+            enable_realtime_transcription=args.realtime,
+            post_speech_silence_duration=args.post_speech_silence_duration,
+            early_transcription_on_silence=args.early_transcription_on_silence,
+            on_recording_start=self.on_recording_start,
+            on_realtime_transcription_update=self.on_realtime_update,
+            on_utterance_trace=self.on_utterance_trace,
+            clock="audio" if args.pace == "fast" else "wall",
+        )
+        self.transcriber = threading.Thread(target=self.transcribe, daemon=True)
+        self.transcriber.start()
+
+    def on_recording_start(self):
+        with self.lock:
+            self.recordings_started += 1
+            if self.update_times:
+                self.updates_per_utterance.append(len(self.update_times))
+            self.update_times = []
+
+    def on_realtime_update(self, text):
+        now = time.monotonic()
+        with self.lock:
+            if self.update_times:
+                self.update_intervals.append(now - self.update_times[-1])
+            self.update_times.append(now)
+
+    def on_utterance_trace(self, record):
+        with self.lock:
+            self.traces.append(record)
+
+    def transcribe(self):
+        while self.running:
+            text = self.recorder.text()
+            with self.lock:
+                if text:
+                    self.finals.append(text)
+                self.finals_done += 1
+
+    def queue_depth(self):
+        try:
+            return self.recorder.audio_queue.qsize()
+        except NotImplementedError:  # macOS
+            return 0
+
+    def feed(self, audio, rate, paced):
+        chunk = int(rate * CHUNK_SECONDS)
+        limit = max(1, self.recorder.allowed_latency_limit // 2)
+        start = time.monotonic()
+        for index, position in enumerate(range(0, len(audio), chunk)):
+            if paced:
+                delay = start + index * CHUNK_SECONDS - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                while self.queue_depth() >= limit:
+                    time.sleep(0.001)
+            self.recorder.feed_audio(audio[position:position + chunk], rate)
+
+    def wait_for_finals(self):
+        deadline = time.monotonic() + FINAL_TIMEOUT
+        while time.monotonic() < deadline:
+            with self.lock:
+                done = self.finals_done >= self.recordings_started
+            if done and not self.recorder.is_recording:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def replay_file(self, path, reference):
+        audio, rate = read_wav(path)
+        silence = np.zeros(int(rate * self.args.silence), dtype=np.int16)
+        with self.lock:
+            self.finals = []
+            first_trace = len(self.traces)
+        self.feed(audio, rate, self.args.pace == "realtime")
+        self.feed(silence, rate, self.args.pace == "realtime")
+        complete = self.wait_for_finals()
+        with self.lock:
+            hypothesis = " ".join(self.finals)
+            traces = self.traces[first_trace:]
+
+        result = {
+            "file": os.path.basename(path),
+            "audio_seconds": round(len(audio) / rate, 3),
+            "hypothesis": hypothesis,
+            "reference": reference,
+            "utterances": len(traces),
+            "complete": complete,
+            "latencies": [trace["end_of_speech_latency"] for trace in traces
+                          if trace["status"] == "success" and trace["end_of_speech_latency"] is not None],
+        }
+        if reference is not None:
+            reference_words = normalize_words(reference)
+            result["reference_words"] = len(reference_words)
+            result["word_errors"] = word_errors(reference_words, normalize_words(hypothesis))
+        return result
+
+    def shutdown(self):
+        self.running = False
+        self.recorder.abort()
+        self.recorder.shutdown()
+
+
+def summarize(results, update_intervals, updates_per_utterance, audio_seconds, cpu, wall):
+    latencies = LatencyStats(window=max(1, sum(len(r["latencies"]) for r in results)))
+    for result in results:
+        for latency in result["latencies"]:
+            latencies.add(latency)
+    reference_words = sum(r.get("reference_words", 0) for r in results)
+    errors = sum(r.get("word_errors", 0) for r in results)
+    return {
+        "files": len(results),
+        "incomplete_files": sum(not r["complete"] for r in results),
+        "utterances": sum(r["utterances"] for r in results),
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "end_of_speech_latency": latencies.percentiles(),
+        "realtime_update_interval": {
+            "count": len(update_intervals),
+            "p50": percentile(update_intervals, 0.5),
+            "p90": percentile(update_intervals, 0.9),
+            "mean_updates_per_utterance": (
+                round(statistics.mean(updates_per_utterance), 2) if updates_per_utterance else None),
+        },
+        "cpu_seconds_per_audio_second": round(cpu / audio_seconds, 4) if audio_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "wer": round(errors / reference_words, 4) if reference_words else None,
+        "early_transcriptions": {
+            outcome: int(metrics.EARLY_TRANSCRIPTIONS.labels(outcome).get())
+            for outcome in ("reused", "speech_resumed", "stale")},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('corpus', help='Directory with .wav files and .txt reference transcripts')
+    parser.add_argument('--pace', choices=('realtime', 'fast'), default='realtime')
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--realtime', action='store_true', help='Enable realtime transcription')
+    parser.add_argument('--realtime-model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--post-speech-silence-duration', type=float, default=0.6)
+    parser.add_argument('--early-transcription-on-silence', type=float, default=0)
+    parser.add_argument('--silence', type=float, default=1.5,
+                        help='Seconds of silence fed after every file')
+    parser.add_argument('--report', default='replay_report.json')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No .wav files in {args.corpus}")
+
+    replay = Replay(args)
+    results = []
+    cpu_start, wall_start = cpu_seconds(), time.monotonic()
+    try:
+        for path, reference in corpus:
+            results.append(replay.replay_file(path, reference))
+            result = results[-1]
+            print(f"{result['file']}: {result['utterances']} utterances, "
+                  f"{result.get('word_errors', '-')}/{result.get('reference_words', '-')} word errors")
+        wall = time.monotonic() - wall_start
+        with replay.lock:
+            update_intervals = list(replay.update_intervals)
+            updates_per_utterance = list(replay.updates_per_utterance)
+    finally:
+        replay.shutdown()
+    cpu = cpu_seconds() - cpu_start
+
+    audio_seconds = sum(result["audio_seconds"] for result in results)
+    summary = summarize(results, update_intervals, updates_per_utterance, audio_seconds, cpu, wall)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "summary": summary,
+        "files": results,
+    }
+    with open(args.report, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    latency = summary["end_of_speech_latency"]
+    cadence = summary["realtime_update_interval"]
+    early = summary["early_transcriptions"]
+    print(f"\n{'metric':>34} {'value':>10}")
+    for name, value in (
+            ("latency p50 / p90 / p99 (ms)", "/".join(
+                "-" if latency[p] is None else f"{latency[p] * 1e3:.0f}" for p in ("p50", "p90", "p99"))),
+            ("realtime update interval p50 (ms)", "-" if cadence["p50"] is None else f"{cadence['p50'] * 1e3:.0f}"),
+            ("cpu per audio second (s)", summary["cpu_seconds_per_audio_second"]),
+            ("peak rss (MB)", summary["peak_rss_mb"]),
+            ("wer", summary["wer"]),
+            ("early reused / resumed / stale", f"{early['reused']}/{early['speech_resumed']}/{early['stale']}"),
+            ("audio / wall seconds", f"{audio_seconds:.1f}/{wall:.1f}")):
+        print(f"{name:>34} {str(value):>10}")
+    print(f"Report written to {args.report}")
@@ -0,0 +1,66 @@
+"""
+Compares chunk-by-chunk resampling of a 44.1 kHz and a 48 kHz stream to
+16 kHz with the previous per-chunk methods and StreamingResampler.
+
+For every method it reports the throughput (seconds of audio resampled
+per second) and the error against resampling the whole stream at once,
+which shows the artifacts at chunk boundaries.
+
+Usage: python tests/benchmark_resampler.py [--chunk 1024] [--seconds 30]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+from scipy import signal
+
+from RealtimeSTT.resampler import StreamingResampler
+
+TARGET_RATE = 16000
+INPUT_RATES = (44100, 48000)
+
+
+def fft_resample(chunks, rate):
+    """feed_audio, _audio_data_worker and the server before"""
+    return [signal.resample(chunk, int(len(chunk) * TARGET_RATE / rate)) for chunk in chunks]
+
+
+def filtfilt_resample_poly(chunks, rate):
+    """AudioInput.resample_audio before"""
+    b, a = signal.butter(5, (TARGET_RATE / 2) / (rate / 2), btype='low')
+    return [signal.resample_poly(signal.filtfilt(b, a, chunk), TARGET_RATE, rate) for chunk in chunks]
+
+
+def streaming(chunks, rate):
+    resampler = StreamingResampler(rate, TARGET_RATE)
+    return [resampler.process(chunk) for chunk in chunks] + [resampler.flush()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunk', type=int, default=1024)
+    parser.add_argument('--seconds', type=float, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rate':>6} {'method':>22} {'throughput':>12} {'max error':>10}")
+    for rate in INPUT_RATES:
+        # Band limited noise, so the reference has no aliasing of its own
+        audio = signal.lfilter(*signal.butter(4, 6000 / (rate / 2)),
+                               rng.normal(0, 3000, int(rate * args.seconds))).astype(np.float32)
+        chunks = [audio[start:start + args.chunk] for start in range(0, len(audio), args.chunk)]
+        reference = signal.resample_poly(audio.astype(np.float64), TARGET_RATE, rate)
+
+        for name, method in (("fft resample", fft_resample),
+                             ("filtfilt + resample_poly", filtfilt_resample_poly),
+                             ("StreamingResampler", streaming)):
+            start = time.perf_counter()
+            output = np.concatenate(method(chunks, rate))
+            elapsed = time.perf_counter() - start
+            length = min(len(output), len(reference))
+            error = np.max(np.abs(output[:length] - reference[:length])) / np.max(np.abs(reference))
+            print(f"{rate:>6} {name:>22} {args.seconds / elapsed:>10.0f}x {error:>10.4f}")
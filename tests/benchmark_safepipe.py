@@ -0,0 +1,105 @@
+"""
+Measures ParentPipe round trip latency against an echo child process:
+
+- sequential: send() followed by recv()
+- poll loop: send() followed by the poll(0.1)/recv() loop that
+  perform_final_transcription uses, with a 20 ms simulated transcription
+- contended: the same round trip while another thread is blocked in a long
+  poll() on the same pipe (as the realtime worker does)
+
+Pass --baseline path/to/safepipe.py to compare with another implementation.
+
+Usage: python tests/benchmark_safepipe.py [--baseline old_safepipe.py]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import importlib.util
+import multiprocessing as mp
+import statistics
+import threading
+import time
+
+REPEATS = 200
+WORK_SECONDS = 0.02
+
+
+def echo_worker(conn):
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        delay, payload = message
+        if delay:
+            time.sleep(delay)
+        conn.send(payload)
+
+
+def load_safepipe(path=None):
+    if path is None:
+        from RealtimeSTT import safepipe
+        return safepipe
+    spec = importlib.util.spec_from_file_location("baseline_safepipe", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sequential(pipe):
+    start = time.perf_counter()
+    pipe.send((0, "ping"))
+    pipe.recv()
+    return time.perf_counter() - start
+
+
+def poll_loop(pipe):
+    start = time.perf_counter()
+    pipe.send((WORK_SECONDS, "ping"))
+    while not pipe.poll(0.1):
+        pass
+    pipe.recv()
+    return time.perf_counter() - start - WORK_SECONDS
+
+
+def contended(pipe):
+    # Another thread waits in poll() without expecting data in time
+    blocker = threading.Thread(target=pipe.poll, args=(0.05,))
+    blocker.start()
+    time.sleep(0.001)
+    latency = sequential(pipe)
+    blocker.join()
+    return latency
+
+
+def run(safepipe):
+    parent, child = safepipe.SafePipe()
+    process = mp.Process(target=echo_worker, args=(child,))
+    process.start()
+    results = {}
+    for name, scenario, repeats in (("sequential", sequential, REPEATS),
+                                    ("poll loop", poll_loop, REPEATS // 4),
+                                    ("contended", contended, REPEATS // 4)):
+        latencies = [scenario(parent) for _ in range(repeats)]
+        results[name] = (statistics.median(latencies), max(latencies))
+    parent.send(None)
+    process.join()
+    parent.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', help="path to another safepipe.py to compare with")
+    args = parser.parse_args()
+
+    implementations = [("current", load_safepipe())]
+    if args.baseline:
+        implementations.insert(0, ("baseline", load_safepipe(args.baseline)))
+
+    print(f"{'':>10} {'scenario':>11} {'median':>10} {'max':>10}")
+    for label, module in implementations:
+        for name, (median, worst) in run(module).items():
+            print(f"{label:>10} {name:>11} {median * 1e3:>8.3f}ms {worst * 1e3:>8.3f}ms")
@@ -0,0 +1,113 @@
+"""
+Simulates the server's outbound messages to several data clients, one of
+which is slow, and compares the previous single broadcast task (one
+queue, awaiting every send in turn) with one ClientSender per client.
+
+Every client gets realtime updates at 20 Hz and a fullSentence every
+second. Reports the delivery latency of the fast clients and what the
+slow client received.
+
+Usage: python tests/benchmark_send_queue.py [--clients 8] [--slow-send-ms 200] [--seconds 5]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from RealtimeSTT_server.client_sender import ClientSender
+
+UPDATE_INTERVAL = 0.05
+SENTENCE_EVERY = 20
+
+
+class SimulatedClient:
+    """Websocket stand-in whose send takes a fixed time."""
+    def __init__(self, send_seconds):
+        self.send_seconds = send_seconds
+        self.latencies = []
+        self.received = {"realtime": 0, "fullSentence": 0}
+        self.closed = False
+
+    async def send(self, message):
+        kind, created = message
+        await asyncio.sleep(self.send_seconds)
+        self.latencies.append(time.monotonic() - created)
+        self.received[kind] += 1
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+
+
+async def produce(put, seconds):
+    for index in range(int(seconds / UPDATE_INTERVAL)):
+        kind = "fullSentence" if index % SENTENCE_EVERY == SENTENCE_EVERY - 1 else "realtime"
+        put((kind, time.monotonic()), kind == "realtime")
+        await asyncio.sleep(UPDATE_INTERVAL)
+
+
+async def broadcast(clients, seconds):
+    queue = asyncio.Queue()
+
+    async def sender():
+        while True:
+            client, message = await queue.get()
+            await client.send(message)
+
+    def put(message, coalesce):
+        for client in clients:
+            queue.put_nowait((client, message))
+
+    task = asyncio.ensure_future(sender())
+    await produce(put, seconds)
+    await asyncio.sleep(1.0)
+    task.cancel()
+
+
+async def per_client(clients, seconds, max_lag):
+    senders = [ClientSender(client, max_depth=16, max_lag=max_lag) for client in clients]
+    for sender in senders:
+        sender.start()
+
+    def put(message, coalesce):
+        for sender in senders:
+            sender.put(message, coalesce)
+
+    await produce(put, seconds)
+    await asyncio.sleep(1.0)
+    for sender in senders:
+        sender.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float("nan")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--slow-send-ms', type=float, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--max-lag', type=float, default=2.0)
+    args = parser.parse_args()
+
+    sentences = int(args.seconds / UPDATE_INTERVAL) // SENTENCE_EVERY
+    print(f"{'scenario':>12} {'fast p50':>9} {'fast p99':>9} {'slow realtime':>14} "
+          f"{'slow sentences':>15} {'slow disconnected':>18}")
+    for name in ("broadcast", "per client"):
+        clients = [SimulatedClient(0.0005) for _ in range(args.clients - 1)]
+        clients.append(SimulatedClient(args.slow_send_ms / 1000))
+        if name == "broadcast":
+            asyncio.run(broadcast(clients, args.seconds))
+        else:
+            asyncio.run(per_client(clients, args.seconds, args.max_lag))
+        fast = [latency for client in clients[:-1] for latency in client.latencies]
+        slow = clients[-1]
+        print(f"{name:>12} {statistics.median(fast) * 1e3:>7.1f}ms {percentile(fast, 0.99) * 1e3:>7.1f}ms "
+              f"{slow.received['realtime']:>14} {slow.received['fullSentence']:>9}/{sentences:<5} "
+              f"{str(slow.closed):>18}")
@@ -0,0 +1,71 @@
+"""
+Compares the round trip latency of sending audio to a child process the
+old way (pickling the float32 array through a multiprocessing pipe) with
+writing it into a SharedAudioPool slot and sending only the descriptor.
+
+The child process mimics the transcription worker: it resolves the audio
+(a zero-copy view for descriptors), touches it and replies.
+
+Usage: python tests/benchmark_shared_memory.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import multiprocessing as mp
+import time
+import numpy as np
+
+from RealtimeSTT.shared_audio import SharedAudioPool, SharedAudioDescriptor
+
+SAMPLE_RATE = 16000
+CLIP_SECONDS = (1, 10, 60)
+REPEATS = 50
+
+
+def echo_worker(conn, spec):
+    pool = SharedAudioPool.attach(spec)
+    while True:
+        audio = conn.recv()
+        if audio is None:
+            break
+        if isinstance(audio, SharedAudioDescriptor):
+            audio = pool.view(audio)
+        conn.send(float(audio[-1]))
+    audio = None
+    pool.close()
+
+
+def measure(conn, audio, pool=None):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        if pool:
+            descriptor = pool.write(audio)
+            conn.send(descriptor)
+            conn.recv()
+            pool.release(descriptor)
+        else:
+            conn.send(audio)
+            conn.recv()
+    return (time.perf_counter() - start) / REPEATS
+
+
+if __name__ == '__main__':
+    pool = SharedAudioPool(max(CLIP_SECONDS) * SAMPLE_RATE)
+    parent_conn, child_conn = mp.Pipe()
+    process = mp.Process(target=echo_worker, args=(child_conn, pool.spec()))
+    process.start()
+
+    rng = np.random.default_rng(0)
+    print(f"{'clip':>5} {'pipe (pickle)':>14} {'shared memory':>14} {'speedup':>8}")
+    for seconds in CLIP_SECONDS:
+        audio = rng.uniform(-1, 1, seconds * SAMPLE_RATE).astype(np.float32)
+        pipe_time = measure(parent_conn, audio)
+        shm_time = measure(parent_conn, audio, pool)
+        print(f"{seconds:>4}s {pipe_time * 1e3:>12.3f}ms {shm_time * 1e3:>12.3f}ms "
+              f"{pipe_time / shm_time:>7.1f}x")
+
+    parent_conn.send(None)
+    process.join()
+    pool.close()
@@ -0,0 +1,84 @@
+"""
+Measures per-update realtime transcription latency over a 60 second
+synthetic utterance, once decoding the full recording on every update
+(the default) and once with the sliding window used by
+realtime_sliding_window=True.
+
+With the full decode the latency grows with the utterance, with the
+sliding window it stays bounded by realtime_max_window_seconds.
+
+Usage: python tests/benchmark_sliding_window.py [--model tiny] [--device cpu]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+import soundfile as sf
+import faster_whisper
+
+from RealtimeSTT.audio_recorder import RealtimeWindow
+
+SAMPLE_RATE = 16000
+UTTERANCE_SECONDS = 60
+UPDATE_EVERY_SECONDS = 2.0
+
+
+def synthetic_utterance(seconds):
+    """Tiles the warmup clip with short pauses into one long utterance."""
+    warmup_path = os.path.join(os.path.dirname(__file__), '..', 'RealtimeSTT', 'warmup_audio.wav')
+    clip, _ = sf.read(warmup_path, dtype='float32')
+    pause = np.zeros(int(0.3 * SAMPLE_RATE), dtype=np.float32)
+    parts = []
+    while sum(len(p) for p in parts) < seconds * SAMPLE_RATE:
+        parts.extend([clip, pause])
+    return np.concatenate(parts)[:seconds * SAMPLE_RATE]
+
+
+def run(model, audio, max_window_seconds=None):
+    window = RealtimeWindow(SAMPLE_RATE, max_window_seconds) if max_window_seconds else None
+    latencies = []
+    step = int(UPDATE_EVERY_SECONDS * SAMPLE_RATE)
+    for end in range(step, len(audio) + 1, step):
+        start_t = time.perf_counter()
+        if window:
+            segments, _ = model.transcribe(
+                audio[window.committed_samples:end],
+                language="en", beam_size=1,
+                initial_prompt=window.prompt())
+            window.update([(s.start, s.end, s.text) for s in segments],
+                          end - window.committed_samples)
+        else:
+            segments, _ = model.transcribe(audio[:end], language="en", beam_size=1)
+            " ".join(s.text for s in segments)
+        latencies.append(time.perf_counter() - start_t)
+    return latencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--max_window_seconds', type=float, default=15.0)
+    args = parser.parse_args()
+
+    model = faster_whisper.WhisperModel(args.model, device=args.device)
+    audio = synthetic_utterance(UTTERANCE_SECONDS)
+
+    full = run(model, audio)
+    windowed = run(model, audio, args.max_window_seconds)
+
+    print(f"{'audio':>6} {'full decode':>12} {'sliding window':>15}")
+    for i, (f, w) in enumerate(zip(full, windowed)):
+        print(f"{(i + 1) * UPDATE_EVERY_SECONDS:>5.0f}s {f * 1e3:>10.0f}ms {w * 1e3:>13.0f}ms")
+    print(f"max    {max(full) * 1e3:>10.0f}ms {max(windowed) * 1e3:>13.0f}ms")
+
+    # The windowed latency over the last quarter must not exceed the
+    # latency seen while the utterance was still shorter than the window.
+    warm = windowed[1:int(args.max_window_seconds / UPDATE_EVERY_SECONDS)]
+    late = windowed[-len(windowed) // 4:]
+    bound = 2 * max(warm)
+    print(f"bounded: {max(late) <= bound} (late max {max(late) * 1e3:.0f}ms, bound {bound * 1e3:.0f}ms)")
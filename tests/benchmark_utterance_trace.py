@@ -0,0 +1,108 @@
+"""
+Measures what the utterance latency traces cost per utterance (stamping
+the stages, building the record, writing it to a JSON lines file) and
+summarizes a trace file written by a recorder (utterance_trace_file) or
+the server (--trace_file): the median time between consecutive stages
+and the end of speech to final text latency percentiles.
+
+Without --trace-file, traces with made up stage times are summarized.
+
+Usage: python tests/benchmark_utterance_trace.py [--trace-file traces.jsonl] [--utterances 10000]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import collections
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from RealtimeSTT.utterance_trace import TRACE_STAGES, JsonlTraceSink, LatencyStats, UtteranceTrace
+
+# Made up stage gaps in seconds (mean, jitter) of the synthetic traces
+SYNTHETIC_GAPS = {
+    "vad_start": (0.15, 0.05),
+    "turn_detection_start": (2.0, 1.5),
+    "recording_stop": (0.6, 0.0),
+    "final_request": (0.002, 0.001),
+    "decode_start": (0.01, 0.01),
+    "decode_end": (0.3, 0.2),
+    "result": (0.003, 0.002),
+}
+
+
+def synthetic_trace(utterance_id, rng):
+    trace = UtteranceTrace(utterance_id)
+    now = time.monotonic()
+    trace.mark("speech_start", now)
+    for stage in TRACE_STAGES[1:]:
+        if stage in SYNTHETIC_GAPS:
+            mean, jitter = SYNTHETIC_GAPS[stage]
+            now += max(0.0, rng.gauss(mean, jitter))
+            trace.mark(stage, now)
+    trace.status = "success"
+    return trace
+
+
+def summarize(records):
+    gaps = collections.defaultdict(list)
+    stats = LatencyStats(window=len(records) or 1)
+    statuses = collections.Counter(record["status"] for record in records)
+    for record in records:
+        stages = [stage for stage in TRACE_STAGES if stage in record["stages"]]
+        for previous, stage in zip(stages, stages[1:]):
+            gaps[(previous, stage)].append(record["stages"][stage] - record["stages"][previous])
+        if record["status"] == "success" and record["end_of_speech_latency"] is not None:
+            stats.add(record["end_of_speech_latency"])
+
+    print(f"{len(records)} utterances, " + ", ".join(f"{count} {status}" for status, count in statuses.items()))
+    print(f"{'from':>22} {'to':>22} {'median':>9} {'count':>7}")
+    for (previous, stage), values in sorted(gaps.items(), key=lambda item: TRACE_STAGES.index(item[0][1])):
+        print(f"{previous:>22} {stage:>22} {statistics.median(values) * 1e3:>7.1f}ms {len(values):>7}")
+    percentiles = stats.percentiles()
+    print("end of speech to final text: " + ", ".join(
+        f"{name} {value * 1e3:.0f}ms" for name, value in percentiles.items()
+        if name.startswith("p") and value is not None))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace-file', type=str, default=None)
+    parser.add_argument('--utterances', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        sink = JsonlTraceSink(os.path.join(directory, "traces.jsonl"))
+        traces = [synthetic_trace(index, rng) for index in range(args.utterances)]
+
+        start = time.perf_counter()
+        for trace in traces:
+            for stage in TRACE_STAGES:
+                trace.mark(stage)
+        mark = (time.perf_counter() - start) / args.utterances
+        start = time.perf_counter()
+        records = [trace.to_dict() for trace in traces]
+        to_dict = (time.perf_counter() - start) / args.utterances
+        start = time.perf_counter()
+        for record in records:
+            sink.write(record)
+        write = (time.perf_counter() - start) / args.utterances
+        sink.close()
+
+    print(f"{'per utterance':>28} {'cost':>9}")
+    print(f"{f'mark() x {len(TRACE_STAGES)}':>28} {mark * 1e6:>7.1f}us")
+    print(f"{'to_dict()':>28} {to_dict * 1e6:>7.1f}us")
+    print(f"{'JsonlTraceSink.write()':>28} {write * 1e6:>7.1f}us")
+    print()
+
+    if args.trace_file:
+        with open(args.trace_file, encoding="utf-8") as file:
+            summarize([json.loads(line) for line in file if line.strip()])
+    else:
+        summarize([synthetic_trace(index, rng).to_dict() for index in range(args.utterances)])
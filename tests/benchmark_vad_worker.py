@@ -0,0 +1,97 @@
+"""
+Compares the old Silero VAD scheduling (a new thread per chunk, skipped
+while the previous one is still running) with SileroVADWorker.
+
+Feeds the warmup audio as 512 sample chunks paced like a microphone
+(32 ms per chunk) and reports per scenario:
+
+- capture cost: time the capture loop spends per chunk to hand it off
+- threads: number of threads started
+- evaluated: share of the audio Silero actually saw
+- latency: time from submitting a chunk to its probability being published
+
+Usage: python tests/benchmark_vad_worker.py [--onnx] [--seconds 10]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import statistics
+import threading
+import time
+import numpy as np
+import soundfile as sf
+import torch
+
+from RealtimeSTT.vad_worker import SileroVADWorker
+
+CHUNK_SAMPLES = 512
+CHUNK_SECONDS = CHUNK_SAMPLES / 16000
+
+
+def load_chunks(seconds):
+    warmup_path = os.path.join(os.path.dirname(__file__), '..', 'RealtimeSTT', 'warmup_audio.wav')
+    audio, _ = sf.read(warmup_path, dtype='int16')
+    audio = np.tile(audio, int(seconds * 16000 / len(audio)) + 1)[:int(seconds * 16000)]
+    usable = len(audio) - len(audio) % CHUNK_SAMPLES
+    return [chunk.tobytes() for chunk in audio[:usable].reshape(-1, CHUNK_SAMPLES)]
+
+
+def thread_per_chunk(model, chunks):
+    state = {"working": False, "evaluated": 0}
+    latencies = []
+
+    def is_silero_speech(chunk, submitted):
+        audio = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+        model(torch.from_numpy(audio), 16000).item()
+        latencies.append(time.perf_counter() - submitted)
+        state["evaluated"] += 1
+        state["working"] = False
+
+    handoff, threads = [], 0
+    for chunk in chunks:
+        start = time.perf_counter()
+        if not state["working"]:
+            state["working"] = True
+            threading.Thread(target=is_silero_speech, args=(chunk, start)).start()
+            threads += 1
+        handoff.append(time.perf_counter() - start)
+        time.sleep(max(0, CHUNK_SECONDS - (time.perf_counter() - start)))
+    time.sleep(0.1)
+    return handoff, threads, state["evaluated"] / len(chunks), latencies
+
+
+def worker(model, chunks):
+    latencies = []
+    worker = SileroVADWorker(
+        model, on_probability=lambda probability, timestamp: latencies.append(time.time() - timestamp))
+    model.reset_states()
+    handoff = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        worker.submit(chunk)
+        handoff.append(time.perf_counter() - start)
+        time.sleep(max(0, CHUNK_SECONDS - (time.perf_counter() - start)))
+    time.sleep(0.1)
+    worker.stop()
+    evaluated = 1 - worker.dropped_chunks / len(chunks)
+    return handoff, 1, evaluated, latencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--onnx', action='store_true')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad",
+                              verbose=False, onnx=args.onnx)
+    chunks = load_chunks(args.seconds)
+
+    print(f"{'scenario':>16} {'capture cost':>13} {'threads':>8} {'evaluated':>10} {'p50 latency':>12}")
+    for name, run in (("thread per chunk", thread_per_chunk), ("worker", worker)):
+        handoff, threads, evaluated, latencies = run(model, chunks)
+        print(f"{name:>16} {statistics.median(handoff) * 1e6:>11.1f}us {threads:>8} "
+              f"{evaluated * 100:>9.0f}% {statistics.median(latencies) * 1e3:>10.2f}ms")
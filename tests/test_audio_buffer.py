@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from RealtimeSTT.audio_buffer import AudioArena, AudioChunker, INT16_MAX_ABS_VALUE
+
+
+def pcm(values):
+    return np.asarray(values, dtype=np.int16).tobytes()
+
+
+def test_arena_converts_int16_chunks_once():
+    arena = AudioArena(initial_capacity=4)
+    arena.append(pcm([0, 16384, -32768]))
+    arena.append(np.array([32767], dtype=np.int16))
+    expected = np.array([0, 16384, -32768, 32767]) / INT16_MAX_ABS_VALUE
+    assert len(arena) == 4
+    assert arena.view().dtype == np.float32
+    np.testing.assert_allclose(arena.view(), expected)
+
+
+def test_arena_copies_float_chunks_as_they_are():
+    arena = AudioArena()
+    arena.append(np.array([0.5, -0.25], dtype=np.float32))
+    np.testing.assert_array_equal(arena.view(), [0.5, -0.25])
+
+
+def test_arena_grows_and_keeps_old_views_valid():
+    arena = AudioArena(initial_capacity=2)
+    arena.append(pcm([1, 2]))
+    before = arena.view()
+    arena.extend([pcm([3, 4, 5]), pcm([6])])
+    assert arena.capacity >= 6
+    np.testing.assert_array_equal(before * INT16_MAX_ABS_VALUE, [1, 2])
+    np.testing.assert_array_equal(arena.view() * INT16_MAX_ABS_VALUE, [1, 2, 3, 4, 5, 6])
+
+
+def test_arena_view_is_zero_copy():
+    arena = AudioArena(initial_capacity=8)
+    arena.append(pcm([1, 2, 3]))
+    assert np.shares_memory(arena.view(), arena.view(1))
+    np.testing.assert_array_equal(arena.view(1) * INT16_MAX_ABS_VALUE, [2, 3])
+    assert len(arena.view(10)) == 0
+
+
+def test_arena_drop_front():
+    arena = AudioArena()
+    arena.append(pcm([1, 2, 3]))
+    assert arena.drop_front(2) == 2
+    np.testing.assert_array_equal(arena.view() * INT16_MAX_ABS_VALUE, [3])
+    assert arena.drop_front(5) == 1
+    assert len(arena) == 0
+
+
+def test_arena_clear_and_detach_leave_handed_out_audio_unchanged():
+    arena = AudioArena(initial_capacity=4)
+    arena.append(pcm([1, 2]))
+    view = arena.view()
+    arena.clear()
+    arena.append(pcm([7, 8]))
+    np.testing.assert_array_equal(view * INT16_MAX_ABS_VALUE, [1, 2])
+
+    detached = arena.detach()
+    assert len(arena) == 0
+    arena.append(pcm([9, 9]))
+    np.testing.assert_array_equal(detached * INT16_MAX_ABS_VALUE, [7, 8])
+
+
+def test_chunker_buffers_until_a_frame_is_complete():
+    chunker = AudioChunker(4)
+    assert chunker.feed(b"ab") == []
+    assert len(chunker) == 2
+    frames = chunker.feed(b"cdefghij")
+    assert [bytes(frame) for frame in frames] == [b"abcd", b"efgh"]
+    assert len(chunker) == 2
+    assert chunker.drain() == b"ij"
+    assert len(chunker) == 0
+
+
+def test_chunker_hands_out_views_of_fed_data_when_empty():
+    chunker = AudioChunker(4)
+    data = bytearray(b"abcdefgh")
+    frames = chunker.feed(data)
+    assert [bytes(frame) for frame in frames] == [b"abcd", b"efgh"]
+    data[0:1] = b"z"
+    assert bytes(frames[0]) == b"zbcd"
+
+
+def test_chunker_accepts_arrays():
+    chunker = AudioChunker(4)
+    frames = chunker.feed(np.array([1, 2, 3], dtype=np.int16))
+    assert [bytes(frame) for frame in frames] == [np.array([1, 2], dtype=np.int16).tobytes()]
+    assert chunker.drain() == np.array([3], dtype=np.int16).tobytes()
+
+
+@pytest.mark.parametrize("sizes", [[1] * 40, [3, 5, 7, 2, 9, 1, 13], [6, 6, 6, 6, 6, 6, 4]])
+def test_chunker_reassembles_the_stream_across_ring_wraps(sizes):
+    chunker = AudioChunker(5, capacity=10)
+    stream = bytes(range(sum(sizes)))
+    received = b""
+    position = 0
+    for size in sizes:
+        frames = chunker.feed(stream[position:position + size])
+        position += size
+        assert all(len(frame) == 5 for frame in frames)
+        # Frames are only valid until the next feed()
+        received += b"".join(bytes(frame) for frame in frames)
+    received += chunker.drain()
+    assert received == stream
@@ -0,0 +1,107 @@
+import asyncio
+
+from RealtimeSTT_server.client_sender import ClientSender, SLOW_CLIENT_CLOSE_CODE
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.sent = []
+        self.close_code = None
+        self.unblock = asyncio.Event()
+
+    async def send(self, message):
+        if self.send_delay is None:
+            await self.unblock.wait()  # stuck until unblocked
+        else:
+            await asyncio.sleep(self.send_delay)
+        self.sent.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+
+
+def test_messages_are_sent_in_order():
+    async def scenario():
+        websocket = FakeWebSocket()
+        sender = ClientSender(websocket)
+        sender.start()
+        for index in range(5):
+            sender.put(f"message {index}", coalesce=index % 2 == 0)
+        await asyncio.sleep(0.05)
+        sender.close()
+        await sender.task
+        return websocket, sender
+
+    websocket, sender = asyncio.run(scenario())
+    assert websocket.sent == [f"message {index}" for index in range(5)]
+    assert sender.stats()["sent"] == 5
+    assert sender.stats()["coalesced"] == 0
+
+
+def test_behind_client_drops_superseded_realtime_updates():
+    async def scenario():
+        websocket = FakeWebSocket()
+        # Not started, messages pile up as if the client was slow
+        sender = ClientSender(websocket, max_depth=4)
+        sender.put("realtime 1", coalesce=True)
+        sender.put("full sentence 1")
+        sender.put("realtime 2", coalesce=True)
+        sender.put("realtime 3", coalesce=True)
+        sender.put("realtime 4", coalesce=True)
+        sender.put("full sentence 2")
+        sender.start()
+        await asyncio.sleep(0.05)
+        sender.close()
+        await sender.task
+        return websocket, sender
+
+    websocket, sender = asyncio.run(scenario())
+    # The fifth message found the queue full: realtime 1 and 2 were
+    # dropped, the newest queued update and the new message are kept
+    assert websocket.sent == ["full sentence 1", "realtime 3", "realtime 4", "full sentence 2"]
+    assert sender.coalesced == 2
+    assert not sender.disconnected_for_lag
+
+
+def test_client_with_old_queued_messages_is_disconnected():
+    async def scenario():
+        websocket = FakeWebSocket()
+        sender = ClientSender(websocket, max_lag=0.05)
+        sender.put("full sentence 1")
+        await asyncio.sleep(0.1)
+        sender.put("full sentence 2")
+        await asyncio.sleep(0)
+        return websocket, sender
+
+    websocket, sender = asyncio.run(scenario())
+    assert sender.closed and sender.disconnected_for_lag
+    assert len(sender.queue) == 0
+    assert websocket.close_code == SLOW_CLIENT_CLOSE_CODE
+
+
+def test_client_stuck_in_a_send_is_disconnected_without_further_messages():
+    async def scenario():
+        websocket = FakeWebSocket(send_delay=None)
+        sender = ClientSender(websocket, max_lag=0.1)
+        sender.start()
+        sender.put("full sentence")
+        await asyncio.wait_for(sender.task, 2)
+        await asyncio.sleep(0)
+        return websocket, sender
+
+    websocket, sender = asyncio.run(scenario())
+    assert sender.disconnected_for_lag
+    assert websocket.sent == []
+    assert websocket.close_code == SLOW_CLIENT_CLOSE_CODE
+
+
+def test_put_after_close_is_ignored():
+    async def scenario():
+        sender = ClientSender(FakeWebSocket())
+        sender.close()
+        sender.put("message")
+        return sender
+
+    sender = asyncio.run(scenario())
+    assert len(sender.queue) == 0
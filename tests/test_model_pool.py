@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from RealtimeSTT.model_pool import ModelPool
+
+
+class Loader:
+    """Factory and close callback recording loads and evictions."""
+    def __init__(self):
+        self.loaded = []
+        self.closed = []
+
+    def factory(self, name, delay=0):
+        def load():
+            time.sleep(delay)
+            self.loaded.append(name)
+            return object()
+        return load
+
+    def acquire(self, pool, name, delay=0):
+        return pool.acquire(name, self.factory(name, delay), close=lambda model: self.closed.append(name))
+
+
+def refcounts(pool):
+    return {entry["key"]: entry["refcount"] for entry in pool.memory_report()}
+
+
+def test_same_key_shares_one_model():
+    pool, loader = ModelPool(), Loader()
+    first = loader.acquire(pool, "tiny")
+    second = loader.acquire(pool, "tiny")
+    assert first.resource is second.resource
+    assert loader.loaded == ["tiny"]
+    assert refcounts(pool) == {"tiny": 2}
+
+    first.release()
+    first.release()  # release() of a handle is idempotent
+    assert refcounts(pool) == {"tiny": 1}
+    assert loader.closed == []
+    second.release()
+    assert loader.closed == ["tiny"]
+    assert refcounts(pool) == {}
+
+
+def test_handle_is_a_context_manager():
+    pool, loader = ModelPool(), Loader()
+    with loader.acquire(pool, "tiny") as model:
+        assert model is not None
+        assert refcounts(pool) == {"tiny": 1}
+    assert loader.closed == ["tiny"]
+
+
+def test_least_recently_used_idle_models_are_evicted():
+    pool, loader = ModelPool(max_idle_models=2), Loader()
+    for name in ["a", "b", "c"]:
+        loader.acquire(pool, name).release()
+        time.sleep(0.01)
+    assert loader.closed == ["a"]
+
+    # Reusing b makes c the least recently used idle model
+    loader.acquire(pool, "b").release()
+    time.sleep(0.01)
+    loader.acquire(pool, "d").release()
+    assert loader.closed == ["a", "c"]
+    assert loader.loaded == ["a", "b", "c", "d"]
+    assert set(refcounts(pool)) == {"b", "d"}
+
+
+def test_models_in_use_are_never_evicted():
+    pool, loader = ModelPool(max_idle_models=0), Loader()
+    handle = loader.acquire(pool, "a")
+    loader.acquire(pool, "b").release()
+    assert loader.closed == ["b"]
+    assert refcounts(pool) == {"a": 1}
+    handle.release()
+
+
+def test_idle_timeout_evicts_on_next_acquire():
+    pool, loader = ModelPool(max_idle_models=5, idle_timeout=0.05), Loader()
+    loader.acquire(pool, "a").release()
+    assert loader.closed == []
+    time.sleep(0.1)
+    loader.acquire(pool, "b").release()
+    assert loader.closed == ["a"]
+
+
+def test_clear_unloads_idle_models_only():
+    pool, loader = ModelPool(max_idle_models=5), Loader()
+    handle = loader.acquire(pool, "a")
+    loader.acquire(pool, "b").release()
+    pool.clear()
+    assert loader.closed == ["b"]
+    assert refcounts(pool) == {"a": 1}
+    handle.release()
+
+
+def test_concurrent_acquires_load_once():
+    pool, loader = ModelPool(), Loader()
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(loader.acquire(pool, "a", delay=0.1)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.loaded == ["a"]
+    assert len({id(handle.resource) for handle in handles}) == 1
+    assert refcounts(pool) == {"a": 4}
+
+
+def test_failed_load_is_raised_and_not_pooled():
+    pool = ModelPool()
+
+    def fail():
+        raise RuntimeError("no such model")
+
+    with pytest.raises(RuntimeError):
+        pool.acquire("a", fail)
+    assert refcounts(pool) == {}
+    assert pool.acquire("a", object).resource is not None
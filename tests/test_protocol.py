@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+import pytest
+
+from RealtimeSTT.protocol import (
+    HEADER, ProtocolError, StreamFormat, audio_format_message, convert_samples,
+    decode_audio_frame, decode_pcm, encode_audio_frame, is_audio_frame,
+    parse_audio_events, parse_audio_format, with_audio_events)
+
+
+@pytest.mark.parametrize("sample_format", ["int16", "float32"])
+def test_frame_round_trip(sample_format):
+    audio = np.array([0.0, 0.5, -0.5, 1.0, -1.0], dtype=np.float32)
+    message = encode_audio_frame("transcription_start", audio, sample_format, 48000, 1)
+    assert is_audio_frame(message)
+
+    frame = decode_audio_frame(message)
+    assert frame.message_type == "transcription_start"
+    assert frame.sample_format == sample_format
+    assert frame.sample_rate == 48000
+    assert frame.channels == 1
+    np.testing.assert_allclose(convert_samples(frame.audio, "float32"), audio, atol=1 / 32768)
+
+
+def test_decoded_audio_is_a_view_of_the_message():
+    message = encode_audio_frame("transcription_start", np.zeros(4, dtype=np.int16), "int16")
+    frame = decode_audio_frame(message)
+    assert len(message) == HEADER.size + 8
+    assert not frame.audio.flags.writeable
+
+
+def test_convert_samples_clips_and_rounds_to_int16():
+    converted = convert_samples(np.array([1.5, -1.5, 0.25], dtype=np.float32), "int16")
+    np.testing.assert_array_equal(converted, [32767, -32768, 8192])
+    int16 = np.array([1, 2], dtype=np.int16)
+    assert convert_samples(int16, "int16") is int16
+
+
+def test_json_and_text_messages_are_not_frames():
+    assert not is_audio_frame('{"type": "realtime"}')
+    assert not is_audio_frame(b"\x10\x00\x00\x00{}")
+
+
+@pytest.mark.parametrize("change, error", [
+    (lambda message: message[:HEADER.size - 1], "shorter than the header"),
+    (lambda message: b"XXXX" + message[4:], "magic"),
+    (lambda message: message[:4] + b"\x09" + message[5:], "version"),
+    (lambda message: message[:5] + b"\x09" + message[6:], "message type"),
+    (lambda message: message[:6] + b"\x09" + message[7:], "sample format"),
+    (lambda message: message[:-1], "header says"),
+])
+def test_malformed_frames_raise_protocol_error(change, error):
+    message = encode_audio_frame("transcription_start", np.zeros(4, dtype=np.float32))
+    with pytest.raises(ProtocolError, match=error):
+        decode_audio_frame(change(message))
+
+
+def test_parse_audio_events():
+    assert parse_audio_events("/?audio_events=int16") == "int16"
+    assert parse_audio_events("ws://host:8012/?foo=1&audio_events=none") == "none"
+    assert parse_audio_events("/?audio_events=mp3") == "json"
+    assert parse_audio_events(None, default="none") == "none"
+
+
+def test_with_audio_events_sets_the_query_parameter():
+    url = with_audio_events("ws://127.0.0.1:8012?foo=1&audio_events=json", "float32")
+    assert parse_audio_events(url) == "float32"
+    assert "foo=1" in url
+    with pytest.raises(ValueError):
+        with_audio_events(url, "mp3")
+
+
+def test_audio_format_message_round_trip():
+    message = json.loads(audio_format_message(48000, "float32", 2))
+    assert message["type"] == "audio_format"
+    assert parse_audio_format(message) == StreamFormat(48000, "float32", 2)
+
+
+def test_audio_format_defaults_and_compressed_formats():
+    assert parse_audio_format({"sample_rate": "16000"}) == StreamFormat(16000, "int16", 1)
+    assert parse_audio_format({"sample_rate": 48000, "format": "opus"}).sample_format == "opus"
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"sample_rate": "fast"},
+    {"sample_rate": 16000, "format": "mp3"},
+    {"sample_rate": 0},
+    {"sample_rate": 16000, "channels": 0},
+])
+def test_invalid_audio_format_raises_protocol_error(data):
+    with pytest.raises(ProtocolError):
+        parse_audio_format(data)
+
+
+def test_decode_pcm_passes_mono_int16_through():
+    message = np.array([1, 2, 3], dtype=np.int16).tobytes()
+    assert decode_pcm(message, StreamFormat(16000, "int16", 1)) is message
+
+
+def test_decode_pcm_downmixes_and_converts():
+    stereo = np.array([100, 300, -100, -300, 7], dtype=np.int16).tobytes()
+    mono = np.frombuffer(decode_pcm(stereo, StreamFormat(16000, "int16", 2)), dtype=np.int16)
+    # The incomplete last frame is dropped
+    np.testing.assert_array_equal(mono, [200, -200])
+
+    floats = np.array([0.5, -0.25], dtype=np.float32).tobytes()
+    converted = np.frombuffer(decode_pcm(floats, StreamFormat(16000, "float32", 1)), dtype=np.int16)
+    np.testing.assert_array_equal(converted, [16384, -8192])
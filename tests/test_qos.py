@@ -0,0 +1,118 @@
+import pytest
+
+from RealtimeSTT.qos import QoSController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def run(controller, clock, queue_fill, seconds, step=0.25):
+    """Updates the controller every step seconds, returns the events."""
+    events = []
+    for _ in range(round(seconds / step)):
+        clock.now += step
+        event = controller.update(queue_fill)
+        if event:
+            events.append(event)
+    return events
+
+
+def test_degrades_one_level_per_degrade_after(clock):
+    controller = QoSController(degrade_after=1.0, time_source=clock)
+    # Pressure counts from the first update that sees it
+    assert run(controller, clock, 0.8, 1.0) == []
+    assert controller.level_name == "normal"
+
+    events = run(controller, clock, 0.8, 0.25)
+    assert [event["level"] for event in events] == ["longer_pause"]
+    assert events[0]["direction"] == "degrade"
+    run(controller, clock, 0.8, 1.25)
+    assert controller.level_name == "beam_1"
+    assert controller.at_least("longer_pause") and not controller.at_least("disabled")
+
+
+def test_stops_at_the_most_degraded_level(clock):
+    controller = QoSController(degrade_after=0.5, time_source=clock)
+    run(controller, clock, 1.0, 10)
+    assert controller.level_name == "disabled"
+    assert controller.changes == 4
+
+
+def test_dead_band_neither_degrades_nor_recovers(clock):
+    controller = QoSController(degrade_after=0.5, recover_after=1.0, time_source=clock)
+    run(controller, clock, 0.8, 0.75)
+    assert controller.level_name == "longer_pause"
+    # Between recover_queue_fill and degrade_queue_fill
+    assert run(controller, clock, 0.3, 10) == []
+    assert controller.level_name == "longer_pause"
+
+
+def test_interrupted_pressure_restarts_the_timer(clock):
+    controller = QoSController(degrade_after=1.0, time_source=clock)
+    run(controller, clock, 0.8, 1.0)
+    run(controller, clock, 0.3, 0.25)
+    assert run(controller, clock, 0.8, 1.0) == []
+    assert controller.level_name == "normal"
+
+
+def test_recovers_after_recover_after_of_relief(clock):
+    controller = QoSController(degrade_after=0.5, recover_after=2.0, time_source=clock)
+    run(controller, clock, 0.8, 0.75)
+    assert run(controller, clock, 0.0, 2.0) == []
+    events = run(controller, clock, 0.0, 0.25)
+    assert [(event["level"], event["direction"]) for event in events] == [("normal", "recover")]
+
+
+def test_failed_recovery_backs_off(clock):
+    events = []
+    controller = QoSController(degrade_after=0.5, recover_after=2.0, max_recover_after=6.0,
+                               on_change=events.append, time_source=clock)
+    run(controller, clock, 0.8, 0.75)
+    run(controller, clock, 0.0, 2.25)
+    assert controller.level_name == "normal"
+
+    # Pressure returns right after the recovery
+    run(controller, clock, 0.8, 0.75)
+    assert controller.snapshot()["recover_after"] == 4.0
+    assert run(controller, clock, 0.0, 4.0) == []
+    run(controller, clock, 0.0, 0.25)
+    assert controller.level_name == "normal"
+
+    run(controller, clock, 0.8, 0.75)
+    assert controller.snapshot()["recover_after"] == 6.0
+    assert [event["direction"] for event in events] == [
+        "degrade", "recover", "degrade", "recover", "degrade"]
+
+
+def test_slow_decodes_are_pressure_until_they_time_out(clock):
+    controller = QoSController(degrade_after=0.5, decode_timeout=2.0, time_source=clock)
+    controller.observe_decode(0.5, 0.5)  # too short to count
+    assert controller.realtime_factor is None
+
+    controller.observe_decode(3.0, 2.0)
+    run(controller, clock, 0.0, 0.75)
+    assert controller.level_name == "longer_pause"
+    # Level changes discard the measured factor
+    assert controller.realtime_factor is None
+
+    controller.observe_decode(3.0, 2.0)
+    clock.now += 2.5
+    assert run(controller, clock, 0.0, 1.0) == []
+    assert controller.level_name == "longer_pause"
+
+
+def test_realtime_factor_is_smoothed(clock):
+    controller = QoSController(smoothing=0.5, time_source=clock)
+    controller.observe_decode(1.0, 2.0)
+    controller.observe_decode(3.0, 2.0)
+    assert controller.realtime_factor == pytest.approx(1.0)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from RealtimeSTT.resampler import StreamingResampler, ensure_resampler
+
+CHUNK_SIZES = [1, 7, 160, 333, 1000, 5000]
+
+
+def resample_in_chunks(resampler, samples, sizes=CHUNK_SIZES):
+    output = []
+    position = 0
+    for size in sizes * 3:
+        output.append(resampler.process(samples[position:position + size]))
+        position += size
+    output.append(resampler.process(samples[position:]))
+    output.append(resampler.flush())
+    return np.concatenate(output)
+
+
+@pytest.mark.parametrize("input_rate, output_rate", [
+    (48000, 16000), (44100, 16000), (22050, 16000), (8000, 16000), (16000, 16000)])
+def test_chunked_output_matches_resample_poly(input_rate, output_rate):
+    samples = np.random.default_rng(0).standard_normal(input_rate // 2).astype(np.float32) * 0.3
+    resampler = StreamingResampler(input_rate, output_rate)
+    resampled = resample_in_chunks(resampler, samples)
+
+    divisor = np.gcd(input_rate, output_rate)
+    expected = resample_poly(samples, output_rate // divisor, input_rate // divisor)
+    assert len(resampled) >= len(expected)
+    np.testing.assert_allclose(resampled[:len(expected)], expected, atol=1e-5)
+
+
+def test_int16_input_gives_rounded_int16_output():
+    samples = (np.sin(np.arange(4800) / 10) * 20000).astype(np.int16)
+    resampler = StreamingResampler(48000, 16000)
+    resampled = np.concatenate([resampler.process(samples.tobytes()), resampler.flush()])
+    assert resampled.dtype == np.int16
+
+    expected = resample_poly(samples.astype(np.float64), 1, 3)
+    np.testing.assert_allclose(resampled[:len(expected)], np.round(expected), atol=1)
+
+
+def test_reset_starts_a_new_stream():
+    samples = np.random.default_rng(1).standard_normal(4410).astype(np.float32)
+    resampler = StreamingResampler(44100, 16000)
+    first = resample_in_chunks(resampler, samples)
+    resampler.reset()
+    np.testing.assert_array_equal(resample_in_chunks(resampler, samples), first)
+
+
+def test_ensure_resampler_reuses_matching_rates():
+    resampler = ensure_resampler(None, 48000, 16000)
+    assert resampler.rates == (48000, 16000)
+    assert ensure_resampler(resampler, 48000, 16000) is resampler
+    assert ensure_resampler(resampler, 44100, 16000).rates == (44100, 16000)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from RealtimeSTT.shared_audio import SharedAudioPool
+
+
+@pytest.fixture
+def pool():
+    pool = SharedAudioPool(slot_samples=100, num_slots=2)
+    yield pool
+    pool.close()
+
+
+def test_write_and_view_through_an_attached_pool(pool):
+    audio = np.linspace(-1, 1, 80, dtype=np.float32)
+    descriptor = pool.write(audio)
+    assert descriptor.pool == pool.spec()
+    assert descriptor.length == 80
+
+    attached = SharedAudioPool.attach(descriptor.pool)
+    try:
+        np.testing.assert_array_equal(attached.view(descriptor), audio)
+    finally:
+        attached.close()
+
+
+def test_write_returns_none_when_full_or_too_long(pool):
+    assert pool.write(np.zeros(101, dtype=np.float32)) is None
+    first = pool.write(np.ones(10, dtype=np.float32))
+    second = pool.write(np.full(10, 2, dtype=np.float32))
+    assert {first.slot, second.slot} == {0, 1}
+    assert pool.write(np.zeros(10, dtype=np.float32)) is None
+
+    pool.release(first)
+    third = pool.write(np.full(10, 3, dtype=np.float32))
+    assert third.slot == first.slot
+    np.testing.assert_array_equal(pool.view(second), np.full(10, 2))
+    np.testing.assert_array_equal(pool.view(third), np.full(10, 3))
+
+
+def test_release_is_idempotent(pool):
+    descriptor = pool.write(np.zeros(10, dtype=np.float32))
+    pool.release(descriptor)
+    pool.release(descriptor)
+    assert pool.write(np.zeros(10, dtype=np.float32)) is not None
+    assert pool.write(np.zeros(10, dtype=np.float32)) is not None
+    assert pool.write(np.zeros(10, dtype=np.float32)) is None
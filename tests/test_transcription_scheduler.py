@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from RealtimeSTT.audio_recorder import (
+    TranscriptionScheduler, TranscriptionRequest, TRANSCRIPTION_PRIORITIES)
+
+
+def make_request(request_id, kind, utterance_id=0):
+    return TranscriptionRequest(
+        request_id, kind, TRANSCRIPTION_PRIORITIES[kind], None, "en", False, utterance_id)
+
+
+def drain(scheduler):
+    ids = []
+    while True:
+        try:
+            ids.append(scheduler.get(timeout=0).request_id)
+        except queue.Empty:
+            return ids
+
+
+def test_get_returns_highest_priority_oldest_first():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "offline"))
+    scheduler.put(make_request(2, "realtime", utterance_id=1))
+    scheduler.put(make_request(3, "final"))
+    scheduler.put(make_request(4, "early", utterance_id=1))
+    scheduler.put(make_request(5, "final"))
+    assert drain(scheduler) == [3, 5, 4, 2, 1]
+
+
+@pytest.mark.parametrize("kind", ["realtime", "early"])
+def test_new_request_supersedes_same_kind_of_same_utterance(kind):
+    scheduler = TranscriptionScheduler()
+    assert scheduler.put(make_request(1, kind, utterance_id=7)) == []
+    scheduler.put(make_request(2, kind, utterance_id=8))
+    dropped = scheduler.put(make_request(3, kind, utterance_id=7))
+    assert [request.request_id for request in dropped] == [1]
+    assert drain(scheduler) == [2, 3]
+    assert scheduler.stats()["kinds"][kind]["dropped"] == 1
+
+
+def test_finals_are_never_coalesced():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "final", utterance_id=7))
+    assert scheduler.put(make_request(2, "final", utterance_id=7)) == []
+    assert drain(scheduler) == [1, 2]
+
+
+def test_other_kinds_of_the_same_utterance_are_kept():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "early", utterance_id=7))
+    assert scheduler.put(make_request(2, "realtime", utterance_id=7)) == []
+    assert drain(scheduler) == [1, 2]
+
+
+def test_cancel_removes_queued_request():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "final"))
+    scheduler.put(make_request(2, "final"))
+    assert scheduler.cancel(1).request_id == 1
+    assert scheduler.cancel(1) is None
+    assert drain(scheduler) == [2]
+
+
+def test_get_times_out_when_empty():
+    scheduler = TranscriptionScheduler()
+    start = time.monotonic()
+    with pytest.raises(queue.Empty):
+        scheduler.get(timeout=0.05)
+    assert time.monotonic() - start >= 0.04
+
+
+def test_get_wakes_up_on_put():
+    scheduler = TranscriptionScheduler()
+    timer = threading.Timer(0.05, scheduler.put, (make_request(1, "final"),))
+    timer.start()
+    try:
+        assert scheduler.get(timeout=5).request_id == 1
+    finally:
+        timer.cancel()
+
+
+def test_get_of_kind_skips_other_kinds():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "final"))
+    # A higher priority request is next in line
+    with pytest.raises(queue.Empty):
+        scheduler.get(timeout=0, kind="realtime")
+    assert scheduler.get(timeout=0, kind="final").request_id == 1
+
+    # Lower priority requests are not returned for a kind
+    scheduler.put(make_request(2, "offline"))
+    with pytest.raises(queue.Empty):
+        scheduler.get(timeout=0, kind="final")
+    assert drain(scheduler) == [2]
+
+
+def test_stats_count_served_and_queued_requests():
+    scheduler = TranscriptionScheduler()
+    scheduler.put(make_request(1, "final"))
+    scheduler.put(make_request(2, "realtime"))
+    scheduler.get(timeout=0)
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 1
+    assert stats["max_queue_depth"] == 2
+    assert stats["kinds"]["final"]["served"] == 1
+    assert stats["kinds"]["realtime"]["queued"] == 1
+    # Stats restart after a reset, the queue itself is kept
+    stats = scheduler.stats()
+    assert stats["kinds"]["final"]["served"] == 0
+    assert stats["max_queue_depth"] == 0
+    assert stats["queue_depth"] == 1
@@ -0,0 +1,63 @@
+import json
+
+from RealtimeSTT.utterance_trace import JsonlTraceSink, LatencyStats, UtteranceTrace
+
+
+def test_percentiles_use_the_nearest_rank():
+    stats = LatencyStats()
+    for latency in range(1, 101):
+        stats.add(latency / 100)
+    assert stats.percentiles() == {"count": 100, "window": 100, "p50": 0.5, "p90": 0.9, "p99": 0.99}
+    assert stats.percentiles((0, 100, 99.9)) == {
+        "count": 100, "window": 100, "p0": 0.01, "p100": 1.0, "p99.9": 1.0}
+
+
+def test_percentiles_of_a_single_and_no_latency():
+    stats = LatencyStats()
+    assert stats.percentiles() == {"count": 0, "window": 0, "p50": None, "p90": None, "p99": None}
+    stats.add(0.25)
+    assert stats.percentiles((50, 99)) == {"count": 1, "window": 1, "p50": 0.25, "p99": 0.25}
+
+
+def test_window_keeps_only_the_latest_latencies():
+    stats = LatencyStats(window=3)
+    for latency in [10.0, 20.0, 1.0, 2.0, 3.0]:
+        stats.add(latency)
+    percentiles = stats.percentiles((100,))
+    assert percentiles["count"] == 5
+    assert percentiles["window"] == 3
+    assert percentiles["p100"] == 3.0
+
+
+def test_trace_latency_runs_from_the_end_of_speech():
+    trace = UtteranceTrace(1)
+    trace.mark("vad_start", 10.0)
+    trace.mark("recording_stop", 13.0)
+    trace.mark("result", 13.5)
+    assert trace.latency() == 0.5
+
+    # Turn detection marks the end of speech before the recording stops
+    trace.mark("turn_detection_start", 12.0)
+    assert trace.latency() == 1.5
+    record = trace.to_dict()
+    assert list(record["stages"]) == ["vad_start", "turn_detection_start", "recording_stop", "result"]
+    assert record["offsets"]["result"] == 3.5
+    assert record["end_of_speech_latency"] == 1.5
+
+
+def test_trace_without_result_has_no_latency():
+    trace = UtteranceTrace(1)
+    trace.mark("recording_stop", 1.0)
+    assert trace.latency() is None
+    assert trace.to_dict()["end_of_speech_latency"] is None
+
+
+def test_jsonl_sink_appends_one_record_per_line(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    sink = JsonlTraceSink(str(path))
+    sink.write({"utterance_id": 1})
+    sink.write({"utterance_id": 2})
+    sink.close()
+    sink.write({"utterance_id": 3})  # ignored after close
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records == [{"utterance_id": 1}, {"utterance_id": 2}]